@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -73,12 +74,44 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default, PostgreSQL when PANEL_DB_ENGINE=postgresql (see the
+# PANEL_DB_* variables below). Move data across with
+# `manage.py transfer_database`.
+
+PANEL_DB_ENGINE = os.environ.get('PANEL_DB_ENGINE', 'sqlite')
+
+if PANEL_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('PANEL_DB_NAME', 'djangopanel'),
+            'USER': os.environ.get('PANEL_DB_USER', 'djangopanel'),
+            'PASSWORD': os.environ.get('PANEL_DB_PASSWORD', ''),
+            'HOST': os.environ.get('PANEL_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('PANEL_DB_PORT', '5432'),
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('PANEL_DB_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Wait for the writer instead of failing with "database is locked"
+                'timeout': 20,
+                # Take the write lock when the transaction starts, so two
+                # transactions can't deadlock upgrading from read to write
+                'transaction_mode': 'IMMEDIATE',
+                # WAL lets readers run alongside the writer (deploy threads
+                # logging while pages load); NORMAL sync is safe with WAL
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            },
+        }
+    }
+
+# Keep connections open between requests / queue jobs.
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('PANEL_DB_CONN_MAX_AGE', 60))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
 
 
 # Password validation
@@ -127,3 +160,110 @@ else:
 STATICFILES_DIRS = [
     BASE_DIR / "panel" / "static",
 ]
+
+
+# Panel
+# Deployment logs are appended in chunks; a chunk is written once either limit is hit.
+PANEL_LOG_FLUSH_LINES = 20
+PANEL_LOG_FLUSH_INTERVAL_MS = 500
+
+# Deploy steps stream their output; only the last PANEL_COMMAND_TAIL_KB of each
+# stream is kept in memory for error messages. Steps running longer than
+# PANEL_DEPLOY_STEP_TIMEOUT seconds are killed (None disables the limit).
+PANEL_COMMAND_TAIL_KB = 64
+PANEL_DEPLOY_STEP_TIMEOUT = 900
+
+# How often the deployment log stream (SSE) checks for new chunks.
+PANEL_LOG_STREAM_POLL_MS = 500
+
+# Deployment queue: at most PANEL_DEPLOY_CONCURRENCY deployments run at once
+# (never more than one per project). Dispatchers also poll the queue every
+# PANEL_DEPLOY_QUEUE_POLL_SECONDS to pick up jobs queued by other processes.
+PANEL_DEPLOY_CONCURRENCY = 2
+PANEL_DEPLOY_QUEUE_POLL_SECONDS = 5
+# Running jobs renew a heartbeat on every poll; jobs whose heartbeat is older
+# than this are taken to be orphaned by a dead worker and requeued.
+PANEL_DEPLOY_LEASE_SECONDS = 60
+# Deployments run in `manage.py deploy_worker` (djangopanel-worker.service).
+# Set PANEL_DEPLOY_IN_WEB_PROCESS=1 to run them inside the web process
+# instead, e.g. with runserver during development.
+PANEL_DEPLOY_IN_WEB_PROCESS = os.environ.get('PANEL_DEPLOY_IN_WEB_PROCESS', '') == '1'
+
+# Panel-wide caches shared by all hosted projects (wheelhouse, pip cache, ...).
+PANEL_CACHE_DIR = Path.home() / '.djangopanel' / 'cache'
+
+# Django cache, shared by the panel workers and the deploy worker process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': PANEL_CACHE_DIR / 'django',
+    }
+}
+# Least recently used wheels are evicted once the wheelhouse grows past this size.
+PANEL_WHEELHOUSE_MAX_MB = 2048
+
+# Deploys fetch only the project branch, this many commits deep.
+PANEL_GIT_DEPTH = 1
+
+# Releases kept per project for rollback (the live release is always kept).
+PANEL_KEEP_RELEASES = 5
+
+# Gunicorn "auto" sizing: memory kept free for the OS, nginx and the panel,
+# and the expected RSS of one worker.
+PANEL_RESERVED_MEMORY_MB = 512
+PANEL_GUNICORN_WORKER_MB = 120
+
+# nginx / systemd reloads requested by concurrent deploys within this window
+# are coalesced into one.
+PANEL_RELOAD_DEBOUNCE_MS = 1000
+
+# File browser: entries returned per page (more are loaded on demand).
+PANEL_FILE_PAGE_SIZE = 200
+
+# Project search index: larger files are indexed by name only.
+PANEL_SEARCH_MAX_FILE_KB = 1024
+
+# Files above this size (or binary files) open in the read-only ranged viewer
+# instead of the editor; the viewer sends at most PANEL_VIEWER_PAGE_KB per request.
+PANEL_EDITOR_MAX_KB = 1024
+PANEL_VIEWER_PAGE_KB = 256
+
+# Web terminal: per-user session cap, idle sessions (no client attached) are
+# hung up after PANEL_TERMINAL_IDLE_SECONDS; scrollback replayed on re-attach.
+# Sessions live in one process: /ws/ must be served by a single worker.
+PANEL_TERMINAL_SHELL = '/bin/bash'
+PANEL_TERMINAL_MAX_SESSIONS = 3
+PANEL_TERMINAL_IDLE_SECONDS = 900
+PANEL_TERMINAL_SCROLLBACK_KB = 256
+
+# Dashboard: projects per page, and how long a rendered page may be reused
+# (pages are also invalidated on every project / deployment state change).
+PANEL_DASHBOARD_PAGE_SIZE = 24
+PANEL_DASHBOARD_CACHE_SECONDS = 10
+
+# Deployment history: logs of finished deployments older than this are
+# stored zlib-compressed; each project keeps this many finished deployments
+# (plus the last successful one and those whose release is still on disk).
+PANEL_LOG_ARCHIVE_DAYS = 7
+PANEL_KEEP_DEPLOYMENTS = 50
+
+# Resource monitoring: the deploy_worker samples each Gunicorn unit's cgroup
+# every PANEL_MONITOR_INTERVAL seconds into fixed-size files under
+# PANEL_CACHE_DIR/metrics (1s, 1m and 1h rollups).
+PANEL_MONITOR_INTERVAL = 1
+
+# Request analytics: every site logs to PANEL_ACCESS_LOG_DIR/<upstream>.access.log
+# with timings; the deploy_worker tails them and keeps the last hour per
+# project and per path prefix (first PANEL_TRAFFIC_PREFIX_DEPTH segments, at
+# most PANEL_TRAFFIC_MAX_PREFIXES per minute).
+PANEL_ACCESS_LOG_DIR = '/var/log/nginx'
+PANEL_TRAFFIC_INTERVAL = 5
+PANEL_TRAFFIC_PREFIX_DEPTH = 1
+PANEL_TRAFFIC_MAX_PREFIXES = 50
+
+# Fleet deploys: projects queued at once per rollout (the deployment queue's
+# PANEL_DEPLOY_CONCURRENCY still caps what actually runs), canaries deployed
+# first, and the share of failed deploys that halts a rollout.
+PANEL_FLEET_PARALLELISM = PANEL_DEPLOY_CONCURRENCY
+PANEL_FLEET_CANARIES = 1
+PANEL_FLEET_MAX_FAILURE_RATE = 0.2
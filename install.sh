@@ -82,7 +82,50 @@ After=network.target
 User=$USER
 Group=www-data
 WorkingDirectory=$INSTALL_DIR
-ExecStart=$INSTALL_DIR/venv/bin/gunicorn --workers 3 --bind 127.0.0.1:8000 config.wsgi:application
+# Optional PANEL_DB_* settings (e.g. PANEL_DB_ENGINE=postgresql)
+EnvironmentFile=-$INSTALL_DIR/.env
+ExecStart=$INSTALL_DIR/venv/bin/gunicorn --workers 3 --worker-class uvicorn.workers.UvicornWorker --bind 127.0.0.1:8000 config.asgi:application
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+# Web terminal: PTY sessions live in memory, so /ws/ is served by one single
+# worker process (reconnects must land where the shell is running)
+cat <<EOF | sudo tee /etc/systemd/system/djangopanel-terminal.service
+[Unit]
+Description=Django Panel Web Terminal
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=$INSTALL_DIR
+# Optional PANEL_DB_* settings (e.g. PANEL_DB_ENGINE=postgresql)
+EnvironmentFile=-$INSTALL_DIR/.env
+ExecStart=$INSTALL_DIR/venv/bin/gunicorn --workers 1 --worker-class uvicorn.workers.UvicornWorker --bind 127.0.0.1:8001 config.asgi:application
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+# Deployment queue worker (resumes queued deployments after a restart)
+cat <<EOF | sudo tee /etc/systemd/system/djangopanel-worker.service
+[Unit]
+Description=Django Panel Deployment Worker
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=$INSTALL_DIR
+# Rotated nginx logs are root/www-data:adm 0640; adm lets the worker read the sites' access logs
+SupplementaryGroups=adm
+# Optional PANEL_DB_* settings (e.g. PANEL_DB_ENGINE=postgresql)
+EnvironmentFile=-$INSTALL_DIR/.env
+ExecStart=$INSTALL_DIR/venv/bin/python manage.py deploy_worker
 Restart=always
 
 [Install]
@@ -90,8 +133,8 @@ WantedBy=multi-user.target
 EOF
 
 sudo systemctl daemon-reload
-sudo systemctl enable djangopanel
-sudo systemctl restart djangopanel
+sudo systemctl enable djangopanel djangopanel-terminal djangopanel-worker
+sudo systemctl restart djangopanel djangopanel-terminal djangopanel-worker
 
 # 6. Nginx Setup
 echo "Configuring Nginx..."
@@ -108,6 +151,17 @@ server {
         proxy_set_header X-Forwarded-Proto \$scheme;
     }
 
+    # Web terminal (WebSocket), always the single-worker terminal service
+    location /ws/ {
+        proxy_pass http://127.0.0.1:8001;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade \$http_upgrade;
+        proxy_set_header Connection "upgrade";
+        proxy_set_header Host \$host;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_read_timeout 1h;
+    }
+
     location /static/ {
         alias /var/www/djangopanel/static/;
     }
@@ -0,0 +1,462 @@
+"""
+Offline benchmarks of the panel's hot paths (`manage.py benchmark`).
+
+Everything runs in a throwaway workspace: a separate test database, a temp
+PANEL_CACHE_DIR and projects directory, local bare git repos, and shims on
+PATH for sudo / systemctl / nginx plus a fake pip and python in each
+project's virtualenv. Real git, the real deploy pipeline, ORM, views and
+PTYs are exercised; nothing outside the workspace is touched.
+
+Each section returns plain dicts so a run can be dumped as JSON and
+compared with another one.
+"""
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+SECTIONS = ('deploy', 'pages', 'files', 'terminal')
+
+SUDO_SHIM = """#!/bin/sh
+# Pretends every privileged command succeeds (systemctl is-active included)
+exit 0
+"""
+
+PIP_SHIM = """#!/bin/sh
+echo "Looking in links: (benchmark)"
+echo "Requirement already satisfied: gunicorn"
+exit 0
+"""
+
+PYTHON_SHIM = """#!/bin/sh
+# Stands in for `python manage.py migrate|collectstatic` of the deployed app
+case "$2" in
+    migrate) echo "Operations to perform:"; echo "  Apply all migrations: (benchmark)"; echo "No migrations to apply." ;;
+    collectstatic) echo "0 static files copied to '/var/www/benchmark/static', 128 unmodified." ;;
+esac
+exit 0
+"""
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def timing_stats(samples):
+    """Summary of a list of durations in seconds, reported in milliseconds."""
+    if not samples:
+        return {'n': 0}
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'mean_ms': _ms(statistics.fmean(ordered)),
+        'p50_ms': _ms(ordered[len(ordered) // 2]),
+        'p95_ms': _ms(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]),
+        'max_ms': _ms(ordered[-1]),
+    }
+
+
+def _write_script(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    path.chmod(0o755)
+
+
+class Workspace:
+    """
+    Sets up (and tears down) the isolated environment the benchmarks run in.
+
+    Used as a context manager; `root` is the temp directory holding the
+    shims, bare repos, projects, cache and (for SQLite) the database.
+    """
+
+    def __init__(self, keep=False):
+        self.keep = keep
+        self.root = None
+        self._old_db_name = None
+        self._overrides = None
+        self._saved = {}
+
+    def __enter__(self):
+        from .services import DeployService
+
+        self.root = Path(tempfile.mkdtemp(prefix='panel-bench-'))
+        bin_dir = self.root / 'bin'
+        for name in ('sudo', 'systemctl', 'nginx', 'journalctl'):
+            _write_script(bin_dir / name, SUDO_SHIM)
+        self.repo_url = self._make_repo()
+
+        self._saved = {'PATH': os.environ.get('PATH', ''), 'BASE_DIR': DeployService.BASE_DIR}
+        os.environ['PATH'] = f"{bin_dir}{os.pathsep}{self._saved['PATH']}"
+        DeployService.BASE_DIR = self.root / 'projects'
+        DeployService.BASE_DIR.mkdir()
+        # The test Client talks to 'testserver', which has to be an allowed host
+        setup_test_environment()
+        self._overrides = override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            PANEL_CACHE_DIR=self.root / 'cache',
+            PANEL_ACCESS_LOG_DIR=str(self.root / 'logs'),
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': str(self.root / 'cache' / 'django'),
+            }},
+        )
+        self._overrides.enable()
+
+        if connection.vendor == 'sqlite':
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = str(self.root / 'bench.sqlite3')
+        self._old_db_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        return self
+
+    def __exit__(self, *exc):
+        from .services import DeployService
+
+        # Background search indexing started by the deploys must finish first
+        for thread in threading.enumerate():
+            if thread.name.startswith('search-index'):
+                thread.join(timeout=30)
+        connections.close_all()
+        connection.creation.destroy_test_db(self._old_db_name, verbosity=0)
+        self._overrides.disable()
+        teardown_test_environment()
+        DeployService.BASE_DIR = self._saved['BASE_DIR']
+        os.environ['PATH'] = self._saved['PATH']
+        if not self.keep:
+            shutil.rmtree(self.root, ignore_errors=True)
+        return False
+
+    def _make_repo(self):
+        """A bare repo with a small Django-shaped app on `main`."""
+        src = self.root / 'src'
+        (src / 'app' / 'templates').mkdir(parents=True)
+        (src / 'manage.py').write_text("# benchmark app\n")
+        for i in range(50):
+            (src / 'app' / f"module_{i}.py").write_text(f"def handler_{i}(request):\n    return {i}\n" * 20)
+            (src / 'app' / 'templates' / f"page_{i}.html").write_text(f"<h1>Page {i}</h1>\n" * 10)
+        bare = self.root / 'repo.git'
+        git = ['git', '-c', 'init.defaultBranch=main', '-c', 'user.name=bench', '-c', 'user.email=bench@localhost']
+        subprocess.run(git + ['init', '--quiet', str(src)], check=True)
+        subprocess.run(git + ['-C', str(src), 'add', '-A'], check=True)
+        subprocess.run(git + ['-C', str(src), 'commit', '--quiet', '-m', 'benchmark'], check=True)
+        subprocess.run(['git', 'clone', '--quiet', '--bare', str(src), str(bare)], check=True)
+        return str(bare)
+
+    def seed_venv(self, project, deployment):
+        """
+        Pre-creates the virtualenv the deploy will pick for `deployment`
+        (the app has no requirements.txt, so it is per release) with fake
+        pip / python, leaving the pip, migrate and collectstatic steps to run.
+        """
+        from .services import ReleaseService
+        # An existing project dir without releases/ would be taken for a legacy checkout
+        ReleaseService.releases_dir(project).mkdir(parents=True, exist_ok=True)
+        venv_bin = ReleaseService.venvs_dir(project) / f"release-{deployment.id}" / 'bin'
+        _write_script(venv_bin / 'pip', PIP_SHIM)
+        _write_script(venv_bin / 'python', PYTHON_SHIM)
+
+
+def bench_deploy(ws, projects=8, concurrency=4, rounds=2):
+    """Deploy throughput with `projects` apps deployed `concurrency` at a time, plus DB writes per deploy."""
+    from .models import Deployment, DeploymentStep, Project
+    from .services import DeployService
+
+    apps = [
+        Project.objects.create(name=f"bench{i}", domain=f"bench{i}.test", repo_url=ws.repo_url, port=20000 + i)
+        for i in range(projects)
+    ]
+    counters = {}
+
+    def run(project, deployment):
+        count = {'queries': 0, 'writes': 0}
+
+        def counter(execute, sql, params, many, context):
+            count['queries'] += 1
+            if sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+                count['writes'] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                ok, _ = DeployService.deploy(project, deployment)
+        finally:
+            connection.close()
+        counters[deployment.id] = count
+        return ok, time.perf_counter() - started
+
+    rounds_out = []
+    deployment_ids = []
+    for round_number in range(rounds):
+        jobs = []
+        for project in apps:
+            deployment = Deployment.objects.create(project=project, status='in_progress')
+            ws.seed_venv(project, deployment)
+            jobs.append((project, deployment))
+            deployment_ids.append(deployment.id)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda job: run(*job), jobs))
+        wall = time.perf_counter() - started
+        rounds_out.append({
+            'round': round_number + 1,
+            'wall_s': round(wall, 3),
+            'deploys_per_minute': round(len(jobs) / wall * 60, 1),
+            'failed': sum(1 for ok, _ in results if not ok),
+            'deploy': timing_stats([duration for _, duration in results]),
+        })
+
+    steps = {}
+    for name, duration in DeploymentStep.objects.filter(
+        deployment_id__in=deployment_ids
+    ).exclude(status='skipped').values_list('name', 'duration'):
+        steps.setdefault(name, []).append(duration)
+
+    log_writes = []
+    for deployment in Deployment.objects.filter(id__in=deployment_ids).prefetch_related('log_chunks'):
+        text = deployment.logs
+        chunks = list(deployment.log_chunks.all())
+        log_writes.append({
+            'lines': text.count("\n") + 1 if text else 0,
+            'log_bytes': len(text.encode()),
+            'stored_bytes': sum(len(chunk.content.encode()) for chunk in chunks),
+            'chunk_inserts': len(chunks),
+            **counters.get(deployment.id, {}),
+        })
+
+    def mean(key):
+        values = [entry[key] for entry in log_writes if key in entry]
+        return round(statistics.fmean(values), 1) if values else None
+
+    return {
+        'projects': projects,
+        'concurrency': concurrency,
+        'rounds': rounds_out,
+        'steps': {name: timing_stats(values) for name, values in steps.items()},
+        'log_writes': {
+            'deployments': len(log_writes),
+            'lines_per_deploy': mean('lines'),
+            'chunk_inserts_per_deploy': mean('chunk_inserts'),
+            'db_writes_per_deploy': mean('writes'),
+            'queries_per_deploy': mean('queries'),
+            'lines_per_insert': round(mean('lines') / mean('chunk_inserts'), 1) if mean('chunk_inserts') else None,
+            # Stored log bytes per byte of log text: 1.0 means nothing is rewritten
+            'byte_amplification': round(
+                sum(e['stored_bytes'] for e in log_writes) / max(sum(e['log_bytes'] for e in log_writes), 1), 3
+            ),
+        },
+    }
+
+
+def bench_pages(ws, projects=1000, deployments=100000, samples=20):
+    """Dashboard / project page latency and query counts on a large history."""
+    import random
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+    from .models import Deployment, Project
+    from .services import DashboardService
+
+    started = time.perf_counter()
+    Project.objects.bulk_create(
+        Project(name=f"site{i}", domain=f"site{i}.test", repo_url=ws.repo_url, port=30000 + i)
+        for i in range(projects)
+    )
+    ids = list(Project.objects.filter(name__startswith='site').values_list('id', flat=True))
+    statuses = ['success'] * 8 + ['failed', 'pending']
+    log = "\n".join(f"step {n}: ok" for n in range(20))
+    rng = random.Random(0)
+    batch = []
+    for i in range(deployments):
+        batch.append(Deployment(
+            project_id=ids[i % len(ids)], status=rng.choice(statuses),
+            release=str(i), commit=f"{i:040x}", legacy_logs=log,
+        ))
+        if len(batch) == 5000:
+            Deployment.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Deployment.objects.bulk_create(batch)
+    setup = time.perf_counter() - started
+
+    client = Client()
+
+    def measure(url, before=None, count=samples):
+        durations, queries = [], []
+        for _ in range(count):
+            if before:
+                before()
+            with CaptureQueriesContext(connection) as captured:
+                t0 = time.perf_counter()
+                response = client.get(url)
+                durations.append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                return {'error': f"GET {url} returned {response.status_code}"}
+            queries.append(len(captured))
+        return {**timing_stats(durations), 'queries': max(queries)}
+
+    middle = max(projects // getattr(settings, 'PANEL_DASHBOARD_PAGE_SIZE', 24) // 2, 1)
+    sample_ids = rng.sample(ids, min(samples, len(ids)))
+    detail = [measure(reverse('project_detail', args=[pid]), count=1) for pid in sample_ids]
+    history = [measure(reverse('project_deployments', args=[pid]), count=1) for pid in sample_ids]
+
+    def merge(results):
+        errors = [r['error'] for r in results if 'error' in r]
+        if errors:
+            return {'n': len(results), 'errors': len(errors), 'error': errors[0]}
+        return {
+            'n': len(results),
+            'p50_ms': sorted(r['p50_ms'] for r in results)[len(results) // 2],
+            'max_ms': max(r['max_ms'] for r in results),
+            'queries': max(r['queries'] for r in results),
+        }
+
+    results = {
+        'projects': projects,
+        'deployments': deployments,
+        'setup_s': round(setup, 2),
+        'dashboard_cold': measure(reverse('dashboard'), before=DashboardService.invalidate),
+        'dashboard_cold_middle_page': measure(f"{reverse('dashboard')}?page={middle}", before=DashboardService.invalidate),
+    }
+    client.get(reverse('dashboard'))
+    return {
+        **results,
+        'dashboard_cached': measure(reverse('dashboard')),
+        'project_detail': merge(detail),
+        'project_deployments': merge(history),
+    }
+
+
+def bench_files(ws, entries=100000, repeats=5):
+    """FileService.list_files on one directory with `entries` files."""
+    from .models import Project
+    from .services import FileService
+
+    project = Project.objects.create(name='benchfiles', domain='benchfiles.test', repo_url=ws.repo_url, port=29999)
+    big = ws.root / 'projects' / project.name / 'big'
+    big.mkdir(parents=True)
+    started = time.perf_counter()
+    for i in range(entries):
+        with open(big / f"file_{i:06d}.txt", 'wb') as f:
+            f.write(b'x' * (i % 4096))
+    setup = time.perf_counter() - started
+
+    results = {'entries': entries, 'setup_s': round(setup, 2)}
+    for label, kwargs in (
+        ('name', {'sort': 'name'}),
+        ('size_desc', {'sort': 'size', 'desc': True}),
+        ('mtime', {'sort': 'mtime'}),
+        ('name_deep_page', {'sort': 'name', 'offset': entries // 2}),
+    ):
+        durations = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            listing, error = FileService.list_files(project, 'big', **kwargs)
+            durations.append(time.perf_counter() - t0)
+            if error:
+                raise RuntimeError(error)
+        results[label] = {**timing_stats(durations), 'first_ms': _ms(durations[0]), 'page_items': len(listing['items'])}
+    return results
+
+
+def bench_terminal(ws, rounds=50):
+    """Round trip of a command typed into a web terminal session (PTY write -> output)."""
+    from .models import Project
+    from .services import ReleaseService, TerminalManager
+
+    project = Project.objects.filter(name__startswith='bench').first() or Project.objects.create(
+        name='benchterm', domain='benchterm.test', repo_url=ws.repo_url, port=29998
+    )
+    ReleaseService.root(project).mkdir(parents=True, exist_ok=True)
+    session, error = TerminalManager.open(project, 'benchmark', None)
+    if error:
+        raise RuntimeError(error)
+
+    output = []
+    arrived = threading.Condition()
+
+    def listener(data):
+        with arrived:
+            if data is not None:
+                output.append(data.decode('utf-8', 'replace'))
+            arrived.notify_all()
+
+    def wait_for(marker, timeout=10):
+        deadline = time.monotonic() + timeout
+        with arrived:
+            while marker not in "".join(output):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or session.exited:
+                    raise RuntimeError(f"No terminal output containing {marker!r}")
+                arrived.wait(remaining)
+
+    session.attach(listener)
+    try:
+        session.write("printf '%s_%s\\n' __bench ready\n")
+        wait_for('__bench_ready')
+        durations = []
+        for i in range(rounds):
+            with arrived:
+                output.clear()
+            t0 = time.perf_counter()
+            # The shell echoes what is typed; only the printf output joins the halves
+            session.write(f"printf '%s_%s_\\n' __bench {i}\n")
+            wait_for(f"__bench_{i}_")
+            durations.append(time.perf_counter() - t0)
+    finally:
+        session.detach(listener)
+        session.terminate()
+        TerminalManager.discard(session)
+    return {'rounds': rounds, 'round_trip': timing_stats(durations)}
+
+
+def run(sections=SECTIONS, keep=False, log=None, **options):
+    """Runs the selected sections; a failing section reports its error instead of results."""
+    benches = {
+        'deploy': lambda ws: bench_deploy(ws, options.get('deploy_projects', 8), options.get('concurrency', 4), options.get('rounds', 2)),
+        'pages': lambda ws: bench_pages(ws, options.get('projects', 1000), options.get('deployments', 100000)),
+        'files': lambda ws: bench_files(ws, options.get('files', 100000)),
+        'terminal': lambda ws: bench_terminal(ws, options.get('terminal_rounds', 50)),
+    }
+    report = {
+        'meta': {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': sys.version.split()[0],
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'database': connection.vendor,
+            'options': {k: v for k, v in options.items() if v is not None},
+        },
+        'results': {},
+    }
+    with Workspace(keep=keep) as ws:
+        report['meta']['workspace'] = str(ws.root)
+        for name in sections:
+            if log:
+                log(f"Running {name} benchmark...")
+            started = time.perf_counter()
+            try:
+                result = benches[name](ws)
+            except Exception as e:
+                result = {'error': f"{type(e).__name__}: {e}"}
+            if log:
+                # Failed measurements inside a section are reported, not raised
+                failed = sorted(key for key, value in result.items() if key == 'error' or (isinstance(value, dict) and 'error' in value))
+                if failed:
+                    log(f"{name} benchmark: errors in {', '.join(failed)}")
+            result['elapsed_s'] = round(time.perf_counter() - started, 2)
+            report['results'][name] = result
+    return report
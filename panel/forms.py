@@ -1,16 +1,73 @@
+import re
+
 from django import forms
 from .models import Project
 
 class ProjectForm(forms.ModelForm):
     class Meta:
         model = Project
-        fields = ['name', 'domain', 'repo_url', 'branch', 'port', 'python_version', 'env_vars']
+        fields = [
+            'name', 'domain', 'repo_url', 'branch', 'tags', 'bind_mode', 'port', 'python_version', 'env_vars', 'shared_paths',
+            'gunicorn_worker_class', 'gunicorn_workers', 'gunicorn_threads', 'gunicorn_timeout',
+            'gunicorn_max_requests', 'gunicorn_max_requests_jitter', 'gunicorn_preload',
+            'nginx_keepalive', 'nginx_gzip', 'nginx_static_expires', 'nginx_open_file_cache',
+            'nginx_proxy_buffering', 'nginx_microcache_seconds',
+        ]
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'My Awesome App'}),
             'domain': forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'app.example.com'}),
             'repo_url': forms.URLInput(attrs={'class': 'form-input', 'placeholder': 'https://github.com/user/repo'}),
             'branch': forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'main'}),
+            'tags': forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'production python311'}),
+            'bind_mode': forms.Select(attrs={'class': 'form-input'}),
             'port': forms.NumberInput(attrs={'class': 'form-input', 'placeholder': '8000'}),
             'python_version': forms.TextInput(attrs={'class': 'form-input', 'placeholder': '3.11'}),
             'env_vars': forms.Textarea(attrs={'class': 'form-input', 'rows': 4, 'placeholder': 'DEBUG=True\nSECRET_KEY=...'}),
+            'shared_paths': forms.Textarea(attrs={'class': 'form-input', 'rows': 3, 'placeholder': 'media/\ndb.sqlite3'}),
+            'gunicorn_worker_class': forms.Select(attrs={'class': 'form-input'}),
+            'gunicorn_workers': forms.NumberInput(attrs={'class': 'form-input', 'placeholder': 'auto'}),
+            'gunicorn_threads': forms.NumberInput(attrs={'class': 'form-input', 'placeholder': 'auto'}),
+            'gunicorn_timeout': forms.NumberInput(attrs={'class': 'form-input'}),
+            'gunicorn_max_requests': forms.NumberInput(attrs={'class': 'form-input'}),
+            'gunicorn_max_requests_jitter': forms.NumberInput(attrs={'class': 'form-input'}),
+            'nginx_keepalive': forms.NumberInput(attrs={'class': 'form-input'}),
+            'nginx_static_expires': forms.TextInput(attrs={'class': 'form-input', 'placeholder': '7d'}),
+            'nginx_microcache_seconds': forms.NumberInput(attrs={'class': 'form-input'}),
         }
+
+    def clean_nginx_static_expires(self):
+        value = self.cleaned_data['nginx_static_expires'].strip()
+        if not re.fullmatch(r'(off|max|epoch|\d+(ms|s|m|h|d|w|M|y)?)', value):
+            raise forms.ValidationError("Use an nginx time such as 12h, 7d, max or off.")
+        return value
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('bind_mode') == 'tcp' and not cleaned_data.get('port'):
+            self.add_error('port', "A port is required in TCP mode.")
+        return cleaned_data
+
+class FleetDeployForm(forms.Form):
+    """Which projects a fleet rollout deploys, and how carefully."""
+    all_projects = forms.BooleanField(required=False, label="All projects")
+    tag = forms.CharField(required=False, widget=forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'production'}))
+    match = forms.CharField(required=False, label="Name pattern", help_text="Shell-style, e.g. shop-*",
+                            widget=forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'shop-*'}))
+    projects = forms.ModelMultipleChoiceField(
+        queryset=Project.objects.order_by('name'), to_field_name='name', required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'form-input', 'size': 8}),
+    )
+    canaries = forms.IntegerField(min_value=0, help_text="Deployed first; the rest waits until they succeeded",
+                                  widget=forms.NumberInput(attrs={'class': 'form-input'}))
+    parallelism = forms.IntegerField(min_value=1, help_text="Projects queued or deploying at once",
+                                     widget=forms.NumberInput(attrs={'class': 'form-input'}))
+    max_failure_rate = forms.IntegerField(min_value=0, max_value=100, label="Max failure rate (%)",
+                                          help_text="Stop once more than this share of finished deploys failed",
+                                          widget=forms.NumberInput(attrs={'class': 'form-input'}))
+    full = forms.BooleanField(required=False, label="Full deploys", help_text="Re-run pip, migrate and collectstatic everywhere")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not (cleaned_data.get('all_projects') or cleaned_data.get('tag') or cleaned_data.get('match') or cleaned_data.get('projects')):
+            raise forms.ValidationError("Choose all projects, a tag, a name pattern or some projects.")
+        return cleaned_data
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from panel import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the panel's hot paths offline (throwaway database and workspace, "
+        "stubbed sudo/systemctl/nginx/pip) and prints the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', help=f"Comma separated sections to run ({', '.join(benchmark.SECTIONS)}).")
+        parser.add_argument('--deploy-projects', type=int, default=8, help="Projects deployed per round.")
+        parser.add_argument('--concurrency', type=int, default=4, help="Deployments running at once.")
+        parser.add_argument('--rounds', type=int, default=2, help="Deploy rounds (the first builds every project's cache repo).")
+        parser.add_argument('--projects', type=int, default=1000, help="Projects created for the page benchmarks.")
+        parser.add_argument('--deployments', type=int, default=100000, help="Deployments created for the page benchmarks.")
+        parser.add_argument('--files', type=int, default=100000, help="Entries in the directory listed by the files benchmark.")
+        parser.add_argument('--terminal-rounds', type=int, default=50)
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--keep', action='store_true', help="Keep the temporary workspace for inspection.")
+
+    def handle(self, *args, **options):
+        sections = benchmark.SECTIONS
+        if options['only']:
+            sections = [name.strip() for name in options['only'].split(',') if name.strip()]
+            unknown = set(sections) - set(benchmark.SECTIONS)
+            if unknown:
+                raise CommandError(f"Unknown section(s): {', '.join(sorted(unknown))}.")
+
+        report = benchmark.run(
+            sections,
+            keep=options['keep'],
+            log=lambda msg: self.stderr.write(msg),
+            deploy_projects=options['deploy_projects'],
+            concurrency=options['concurrency'],
+            rounds=options['rounds'],
+            projects=options['projects'],
+            deployments=options['deployments'],
+            files=options['files'],
+            terminal_rounds=options['terminal_rounds'],
+        )
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(data + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Report written to {options['output']}."))
+        else:
+            self.stdout.write(data)
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from panel.services import DeploymentQueue, MetricsSampler, TrafficMonitor
+
+
+class Command(BaseCommand):
+    help = "Runs the deployment queue (resumes abandoned jobs, drains pending deployments) the metrics sampler and the access log monitor."
+
+    def handle(self, *args, **options):
+        requeued = DeploymentQueue.recover_abandoned()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} abandoned deployment(s).")
+        DeploymentQueue.ensure_started()
+        MetricsSampler.ensure_started()
+        TrafficMonitor.ensure_started()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deployment worker running ({DeploymentQueue.concurrency()} concurrent job(s)). Press Ctrl+C to stop."
+        ))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping deployment worker.")
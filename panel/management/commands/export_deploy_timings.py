@@ -0,0 +1,70 @@
+import csv
+import json
+import sys
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from panel.models import DeploymentStep, Project
+
+COLUMNS = [
+    'project', 'deployment', 'release', 'commit', 'deployment_status', 'deployed_at',
+    'position', 'step', 'status', 'started_at', 'duration', 'returncode', 'output_bytes',
+]
+
+
+class Command(BaseCommand):
+    help = "Exports per-step deployment timings (one row per step) as CSV or JSON lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', help="Only this project (name).")
+        parser.add_argument('--days', type=int, help="Only deployments from the last N days.")
+        parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+        parser.add_argument('--output', help="Write to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        steps = DeploymentStep.objects.select_related('deployment__project').defer(
+            'deployment__legacy_logs', 'deployment__archived_logs', 'deployment__fingerprints'
+        ).order_by('deployment__created_at', 'deployment_id', 'position')
+        if options['project']:
+            project = Project.objects.filter(name=options['project']).first()
+            if project is None:
+                raise CommandError(f"No project named '{options['project']}'.")
+            steps = steps.filter(deployment__project=project)
+        if options['days']:
+            steps = steps.filter(deployment__created_at__gte=timezone.now() - timedelta(days=options['days']))
+
+        out = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            writer = csv.DictWriter(out, COLUMNS) if options['format'] == 'csv' else None
+            if writer:
+                writer.writeheader()
+            count = 0
+            for step in steps.iterator(chunk_size=500):
+                deployment = step.deployment
+                row = {
+                    'project': deployment.project.name,
+                    'deployment': deployment.id,
+                    'release': deployment.release,
+                    'commit': deployment.commit,
+                    'deployment_status': deployment.status,
+                    'deployed_at': deployment.created_at.isoformat(),
+                    'position': step.position,
+                    'step': step.name,
+                    'status': step.status,
+                    'started_at': step.started_at.isoformat(),
+                    'duration': round(step.duration, 3),
+                    'returncode': step.returncode,
+                    'output_bytes': step.output_bytes,
+                }
+                if writer:
+                    writer.writerow(row)
+                else:
+                    out.write(json.dumps(row) + "\n")
+                count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Exported {count} step(s) to {options['output']}."))
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from panel.models import FleetRollout
+from panel.services import DeploymentQueue, FleetService
+
+
+class Command(BaseCommand):
+    help = "Deploys many projects as one rollout: canaries first, bounded parallelism, halts on failures."
+
+    def add_arguments(self, parser):
+        parser.add_argument('projects', nargs='*', help="Project names.")
+        parser.add_argument('--all', action='store_true', dest='all_projects', help="Every project.")
+        parser.add_argument('--tag', help="Only projects carrying this tag.")
+        parser.add_argument('--match', help="Only projects whose name matches this shell pattern, e.g. 'shop-*'.")
+        parser.add_argument('--canaries', type=int, help="Deploy the first N projects alone first (default PANEL_FLEET_CANARIES).")
+        parser.add_argument('--canary', action='append', default=[], help="Use this project as a canary (repeatable).")
+        parser.add_argument('--parallelism', type=int, help="Deploys in flight at once (default PANEL_FLEET_PARALLELISM).")
+        parser.add_argument('--max-failure-rate', type=float, help="Halt once this fraction of finished deploys failed, e.g. 0.2.")
+        parser.add_argument('--full', action='store_true', help="Full deploys, no skipped steps.")
+        parser.add_argument('--wait', action='store_true', help="Run the queue here and report until the rollout ends.")
+
+    def handle(self, *args, **options):
+        projects, selection, error = FleetService.select(
+            all_projects=options['all_projects'], tag=options['tag'], match=options['match'], names=options['projects'],
+        )
+        if error:
+            raise CommandError(error)
+        unknown = set(options['canary']) - {p.name for p in projects}
+        if unknown:
+            raise CommandError(f"Canary not in the selection: {', '.join(sorted(unknown))}.")
+        rate = options['max_failure_rate']
+        if rate is not None and not 0 <= rate <= 1:
+            raise CommandError("--max-failure-rate must be between 0 and 1.")
+
+        rollout = FleetService.start(
+            projects, selection, canaries=options['canaries'], canary_names=options['canary'],
+            parallelism=options['parallelism'], max_failure_rate=rate, full=options['full'],
+        )
+        self.stdout.write(f"Rollout #{rollout.id} started for {len(projects)} project(s): {selection}")
+        if not options['wait']:
+            self.stdout.write("The deploy worker carries it out; follow it at /fleet/%d/." % rollout.id)
+            return
+
+        DeploymentQueue.ensure_started()
+        last = None
+        while True:
+            rollout = FleetRollout.objects.get(id=rollout.id)
+            progress = FleetService.progress(rollout)
+            counts = progress['counts']
+            line = ", ".join(f"{state} {count}" for state, count in counts.items() if count)
+            if line != last:
+                self.stdout.write(f"[{progress['percent']:3d}%] {line}")
+                last = line
+            if rollout.status != 'running' and not (counts['pending'] or counts['in_progress']):
+                break
+            time.sleep(2)
+
+        for target in progress['targets']:
+            if target['state'] == 'failed':
+                self.stdout.write(self.style.ERROR(f"  {target['project']}: failed (deployment {target['deployment_id']})"))
+        summary = f"Rollout #{rollout.id} {rollout.get_status_display().lower()}."
+        if rollout.reason:
+            summary += f" {rollout.reason}"
+        if rollout.status == 'completed' and not counts['failed']:
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            raise CommandError(summary)
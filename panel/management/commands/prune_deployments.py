@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from panel.models import Project
+from panel.services import DeploymentArchive
+
+
+class Command(BaseCommand):
+    help = "Compresses old deployment logs and prunes deployment history beyond the retention limit."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', help="Only this project (name).")
+        parser.add_argument('--days', type=int, help="Archive logs of finished deployments older than this many days.")
+        parser.add_argument('--keep', type=int, help="Finished deployments kept per project.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be done.")
+        parser.add_argument('--vacuum', action='store_true', help="Reclaim freed space afterwards (SQLite).")
+
+    def handle(self, *args, **options):
+        project = None
+        if options['project']:
+            project = Project.objects.filter(name=options['project']).first()
+            if project is None:
+                raise CommandError(f"No project named '{options['project']}'.")
+
+        result = DeploymentArchive.run(project, options['days'], options['keep'], options['dry_run'])
+        prefix = "Would archive" if options['dry_run'] else "Archived"
+        self.stdout.write(f"{prefix} {result['archived']} deployment log(s)", ending='')
+        if result['original_bytes']:
+            self.stdout.write(f" ({result['original_bytes']} -> {result['compressed_bytes']} bytes)", ending='')
+        self.stdout.write(".")
+        prefix = "Would prune" if options['dry_run'] else "Pruned"
+        self.stdout.write(f"{prefix} {result['pruned']} deployment(s).")
+
+        if options['vacuum'] and not options['dry_run'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+            self.stdout.write("Database vacuumed.")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+# Rebuilt by migrate on the target, or not worth moving
+EXCLUDED = ['contenttypes', 'auth.permission', 'sessions']
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves panel data between databases. 'export' dumps the configured database to a "
+        "file, 'import' loads such a file into the configured database, and 'copy' imports "
+        "straight from an SQLite file (e.g. after switching PANEL_DB_ENGINE to postgresql)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['export', 'import', 'copy'])
+        parser.add_argument('path', help="Dump file (export/import; .gz/.bz2/.xz compress) or SQLite database (copy).")
+        parser.add_argument('--force', action='store_true', help="Import even if the target already has projects.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if options['action'] == 'export':
+            self.export(path)
+        elif options['action'] == 'import':
+            self.load(path, options['force'])
+        else:
+            self.copy(path, options['force'])
+
+    def export(self, path):
+        call_command(
+            'dumpdata', natural_foreign=True, natural_primary=True,
+            exclude=EXCLUDED, output=str(path), verbosity=0,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Exported {settings.DATABASES['default']['ENGINE']} data to {path}."))
+
+    def load(self, path, force):
+        from panel.models import Project
+
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        call_command('migrate', interactive=False, verbosity=0)
+        if Project.objects.exists() and not force:
+            raise CommandError("The target database already has projects; use --force to load anyway.")
+        # loaddata runs in one transaction and resets sequences (PostgreSQL)
+        call_command('loaddata', str(path), verbosity=1)
+        self.stdout.write(self.style.SUCCESS("Import complete."))
+
+    def copy(self, source, force):
+        target = settings.DATABASES['default']
+        if not source.exists():
+            raise CommandError(f"{source} does not exist.")
+        if target['ENGINE'].endswith('sqlite3') and Path(target['NAME']).resolve() == source.resolve():
+            raise CommandError("The source is the configured database; set PANEL_DB_ENGINE / PANEL_DB_PATH to the target first.")
+
+        # Dump the source in a child process configured for it, then load here
+        env = dict(os.environ, PANEL_DB_ENGINE='sqlite', PANEL_DB_PATH=str(source.resolve()))
+        with tempfile.TemporaryDirectory() as tmp:
+            dump = Path(tmp) / 'panel-data.json'
+            self.stdout.write(f"Reading {source}...")
+            result = subprocess.run(
+                [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'transfer_database', 'export', str(dump)],
+                env=env, capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                raise CommandError(f"Export from {source} failed:\n{result.stderr}")
+            self.load(dump, force)
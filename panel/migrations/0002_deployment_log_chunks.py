@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-01-24 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='deployment',
+            old_name='logs',
+            new_name='legacy_logs',
+        ),
+        migrations.CreateModel(
+            name='DeploymentLogChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('deployment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_chunks', to='panel.deployment')),
+            ],
+            options={
+                'ordering': ['sequence'],
+                'constraints': [models.UniqueConstraint(fields=('deployment', 'sequence'), name='unique_log_chunk_sequence')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-16 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0002_deployment_log_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deployment',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='deployment',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deployment',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='deployment',
+            index=models.Index(fields=['status', 'created_at'], name='deployment_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-16 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0003_deployment_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deployment',
+            name='fingerprints',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='deployment',
+            name='force_full',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-16 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0004_deployment_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deployment',
+            name='commit',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='deployment',
+            name='release',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='deployment',
+            name='rollback_to',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='shared_paths',
+            field=models.TextField(blank=True, default='media/\ndb.sqlite3', help_text='Files/dirs kept across releases, one per line (e.g. media/, db.sqlite3)'),
+        ),
+    ]
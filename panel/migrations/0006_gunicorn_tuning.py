@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-16 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0005_releases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='gunicorn_max_requests',
+            field=models.PositiveIntegerField(default=1000, help_text='Recycle a worker after this many requests (0 disables)'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='gunicorn_max_requests_jitter',
+            field=models.PositiveIntegerField(default=100),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='gunicorn_preload',
+            field=models.BooleanField(default=False, help_text='Load the app before forking workers (deploys then restart instead of reloading)'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='gunicorn_threads',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Threads per worker (gthread). Leave empty for auto', null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='gunicorn_timeout',
+            field=models.PositiveSmallIntegerField(default=30, help_text='Seconds'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='gunicorn_worker_class',
+            field=models.CharField(choices=[('sync', 'Sync'), ('gthread', 'Threads (gthread)'), ('uvicorn', 'Uvicorn (ASGI)')], default='sync', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='gunicorn_workers',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Leave empty for auto', null=True),
+        ),
+    ]
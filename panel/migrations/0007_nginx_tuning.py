@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-16 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0006_gunicorn_tuning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='nginx_gzip',
+            field=models.BooleanField(default=True, help_text='Compress text responses (and serve pre-compressed .gz static files)'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='nginx_keepalive',
+            field=models.PositiveSmallIntegerField(default=16, help_text='Idle keepalive connections to Gunicorn (0 disables)'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='nginx_microcache_seconds',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Cache anonymous GET responses for this many seconds (0 disables)'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='nginx_open_file_cache',
+            field=models.BooleanField(default=True, help_text='Cache static file descriptors and metadata'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='nginx_proxy_buffering',
+            field=models.BooleanField(default=True, help_text="Buffer app responses so slow clients don't hold workers"),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='nginx_static_expires',
+            field=models.CharField(default='7d', help_text='Cache lifetime of static files, e.g. 7d (hashed files are cached for a year)', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-16 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0007_nginx_tuning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='bind_mode',
+            field=models.CharField(choices=[('tcp', 'TCP port (127.0.0.1)'), ('socket', 'Unix socket'), ('socket_activated', 'Unix socket (systemd socket activation)')], default='tcp', help_text='How Nginx reaches Gunicorn. Socket-activated apps start on their first request.', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='port',
+            field=models.IntegerField(blank=True, help_text='Internal Gunicorn port (e.g. 8000), only needed in TCP mode', null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-16 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0008_unix_socket_bind'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deployment',
+            index=models.Index(fields=['project', '-created_at'], name='deployment_project_idx'),
+        ),
+    ]
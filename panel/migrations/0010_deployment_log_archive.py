@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-16 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0009_deployment_project_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deployment',
+            name='archived_logs',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deployment',
+            name='logs_archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
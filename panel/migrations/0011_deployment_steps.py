@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-16 21:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0010_deployment_log_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeploymentStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('name', models.CharField(max_length=32)),
+                ('status', models.CharField(choices=[('success', 'Success'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='success', max_length=10)),
+                ('started_at', models.DateTimeField()),
+                ('duration', models.FloatField(help_text='Seconds')),
+                ('returncode', models.IntegerField(blank=True, help_text="Exit code of the step's last failing (or last) command", null=True)),
+                ('output_bytes', models.PositiveIntegerField(default=0)),
+                ('deployment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='steps', to='panel.deployment')),
+            ],
+            options={
+                'ordering': ['position'],
+                'constraints': [models.UniqueConstraint(fields=('deployment', 'position'), name='unique_deployment_step_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-16 21:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0011_deployment_steps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetRollout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('halted', 'Halted'), ('cancelled', 'Cancelled')], default='running', max_length=10)),
+                ('selection', models.CharField(help_text='How the projects were picked, e.g. tag:production', max_length=300)),
+                ('parallelism', models.PositiveSmallIntegerField(default=2)),
+                ('max_failure_rate', models.FloatField(default=0.2, help_text='Stop once this fraction of finished deploys failed')),
+                ('full', models.BooleanField(default=False, help_text='Full deploys (no step skipping)')),
+                ('reason', models.CharField(blank=True, max_length=300)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tags',
+            field=models.CharField(blank=True, help_text='Space separated labels (e.g. production python311), used to pick projects for fleet deploys', max_length=200),
+        ),
+        migrations.CreateModel(
+            name='RolloutTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('canary', models.BooleanField(default=False)),
+                ('skipped', models.BooleanField(default=False)),
+                ('deployment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rollout_targets', to='panel.deployment')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollout_targets', to='panel.project')),
+                ('rollout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='targets', to='panel.fleetrollout')),
+            ],
+            options={
+                'ordering': ['position'],
+                'constraints': [models.UniqueConstraint(fields=('rollout', 'project'), name='unique_rollout_project')],
+            },
+        ),
+    ]
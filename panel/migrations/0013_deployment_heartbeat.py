@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0012_fleet_rollouts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deployment',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
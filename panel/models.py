@@ -1,17 +1,53 @@
+import zlib
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 class Project(models.Model):
+    BIND_CHOICES = [
+        ('tcp', 'TCP port (127.0.0.1)'),
+        ('socket', 'Unix socket'),
+        ('socket_activated', 'Unix socket (systemd socket activation)'),
+    ]
+    WORKER_CLASS_CHOICES = [
+        ('sync', 'Sync'),
+        ('gthread', 'Threads (gthread)'),
+        ('uvicorn', 'Uvicorn (ASGI)'),
+    ]
+
     name = models.CharField(max_length=100)
     domain = models.CharField(max_length=200, help_text="e.g. app.example.com")
     repo_url = models.CharField(max_length=300, help_text="https://github.com/user/repo")
     branch = models.CharField(max_length=100, default='main')
-    port = models.IntegerField(unique=True, help_text="Internal Gunicorn port (e.g. 8000)")
+    tags = models.CharField(max_length=200, blank=True, help_text="Space separated labels (e.g. production python311), used to pick projects for fleet deploys")
+    bind_mode = models.CharField(max_length=20, choices=BIND_CHOICES, default='tcp', help_text="How Nginx reaches Gunicorn. Socket-activated apps start on their first request.")
+    port = models.IntegerField(unique=True, null=True, blank=True, help_text="Internal Gunicorn port (e.g. 8000), only needed in TCP mode")
     python_version = models.CharField(max_length=10, default='3.11')
     
     # Environment variables (stored as simple text for MVP, one per line)
     env_vars = models.TextField(blank=True, help_text="KEY=VALUE (one per line)")
     
+    # Paths kept in shared/ and symlinked into every release (one per line, trailing / for directories)
+    shared_paths = models.TextField(blank=True, default="media/\ndb.sqlite3", help_text="Files/dirs kept across releases, one per line (e.g. media/, db.sqlite3)")
+    
+    # Gunicorn tuning. Empty workers/threads mean "auto": the host's cores and
+    # memory are split across all active projects.
+    gunicorn_workers = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Leave empty for auto")
+    gunicorn_threads = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Threads per worker (gthread). Leave empty for auto")
+    gunicorn_worker_class = models.CharField(max_length=20, choices=WORKER_CLASS_CHOICES, default='sync')
+    gunicorn_max_requests = models.PositiveIntegerField(default=1000, help_text="Recycle a worker after this many requests (0 disables)")
+    gunicorn_max_requests_jitter = models.PositiveIntegerField(default=100)
+    gunicorn_timeout = models.PositiveSmallIntegerField(default=30, help_text="Seconds")
+    gunicorn_preload = models.BooleanField(default=False, help_text="Load the app before forking workers (deploys then restart instead of reloading)")
+    
+    # Nginx tuning
+    nginx_keepalive = models.PositiveSmallIntegerField(default=16, help_text="Idle keepalive connections to Gunicorn (0 disables)")
+    nginx_gzip = models.BooleanField(default=True, help_text="Compress text responses (and serve pre-compressed .gz static files)")
+    nginx_static_expires = models.CharField(max_length=20, default='7d', help_text="Cache lifetime of static files, e.g. 7d (hashed files are cached for a year)")
+    nginx_open_file_cache = models.BooleanField(default=True, help_text="Cache static file descriptors and metadata")
+    nginx_proxy_buffering = models.BooleanField(default=True, help_text="Buffer app responses so slow clients don't hold workers")
+    nginx_microcache_seconds = models.PositiveSmallIntegerField(default=0, help_text="Cache anonymous GET responses for this many seconds (0 disables)")
+    
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -29,8 +65,130 @@ class Deployment(models.Model):
 
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='deployments')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    logs = models.TextField(blank=True)
+    # Logs written before log chunks existed. New deployments append to
+    # DeploymentLogChunk instead of rewriting this column on every line.
+    legacy_logs = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by the deployment queue: which worker ("host:pid") is running the job and when.
+    claimed_by = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Renewed by the running worker; a stale heartbeat means the worker died.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Skip nothing, even if the inputs of a step are unchanged.
+    force_full = models.BooleanField(default=False)
+    # Input hashes of the steps that completed in this deployment, e.g.
+    # {'dependencies': '...', 'migrations': '...', 'static': '...'}.
+    fingerprints = models.JSONField(default=dict, blank=True)
+    # Release directory (releases/<release>) and commit this deployment produced.
+    release = models.CharField(max_length=50, blank=True)
+    commit = models.CharField(max_length=40, blank=True)
+    # When set, this job switches back to an existing release instead of deploying.
+    rollback_to = models.CharField(max_length=50, blank=True)
+    # Old finished deployments keep their log as one zlib-compressed blob
+    # (legacy_logs and the log chunks are dropped when it is written).
+    archived_logs = models.BinaryField(null=True, blank=True)
+    logs_archived_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='deployment_queue_idx'),
+            # Latest deployment per project (dashboard, history)
+            models.Index(fields=['project', '-created_at'], name='deployment_project_idx'),
+        ]
 
     def __str__(self):
         return f"{self.project.name} - {self.status} - {self.created_at}"
+
+    @property
+    def logs(self):
+        """Full log text, assembled from the legacy column and the log chunks."""
+        if self.archived_logs:
+            return zlib.decompress(bytes(self.archived_logs)).decode('utf-8')
+        parts = [self.legacy_logs] if self.legacy_logs else []
+        parts.extend(chunk.content for chunk in self.log_chunks.all())
+        return "\n".join(parts)
+
+class DeploymentLogChunk(models.Model):
+    """An append-only batch of log lines belonging to a deployment."""
+    deployment = models.ForeignKey(Deployment, on_delete=models.CASCADE, related_name='log_chunks')
+    sequence = models.PositiveIntegerField()
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['deployment', 'sequence'], name='unique_log_chunk_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.deployment_id} #{self.sequence}"
+
+
+class DeploymentStep(models.Model):
+    """Timing span of one phase of a deployment (git, pip, migrate...)."""
+    STATUS_CHOICES = [
+        ('success', _('Success')),
+        ('failed', _('Failed')),
+        ('skipped', _('Skipped')),
+    ]
+
+    deployment = models.ForeignKey(Deployment, on_delete=models.CASCADE, related_name='steps')
+    position = models.PositiveSmallIntegerField()
+    name = models.CharField(max_length=32)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='success')
+    started_at = models.DateTimeField()
+    duration = models.FloatField(help_text=_("Seconds"))
+    returncode = models.IntegerField(null=True, blank=True, help_text=_("Exit code of the step's last failing (or last) command"))
+    output_bytes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['deployment', 'position'], name='unique_deployment_step_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.deployment_id} {self.name} {self.duration:.2f}s"
+
+
+class FleetRollout(models.Model):
+    """A deploy of many projects at once (see FleetService)."""
+    STATUS_CHOICES = [
+        ('running', _('Running')),
+        ('completed', _('Completed')),
+        ('halted', _('Halted')),
+        ('cancelled', _('Cancelled')),
+    ]
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='running')
+    selection = models.CharField(max_length=300, help_text=_("How the projects were picked, e.g. tag:production"))
+    parallelism = models.PositiveSmallIntegerField(default=2)
+    max_failure_rate = models.FloatField(default=0.2, help_text=_("Stop once this fraction of finished deploys failed"))
+    full = models.BooleanField(default=False, help_text=_("Full deploys (no step skipping)"))
+    reason = models.CharField(max_length=300, blank=True)
+
+    def __str__(self):
+        return f"Rollout {self.id} ({self.get_status_display()})"
+
+
+class RolloutTarget(models.Model):
+    """One project of a rollout; `deployment` is set once it has been queued."""
+    rollout = models.ForeignKey(FleetRollout, on_delete=models.CASCADE, related_name='targets')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='rollout_targets')
+    position = models.PositiveIntegerField()
+    canary = models.BooleanField(default=False)
+    deployment = models.ForeignKey(Deployment, on_delete=models.SET_NULL, null=True, blank=True, related_name='rollout_targets')
+    skipped = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['rollout', 'project'], name='unique_rollout_project'),
+        ]
+
+    def __str__(self):
+        return f"{self.rollout_id} #{self.position} {self.project_id}"
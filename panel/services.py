@@ -1,15 +1,49 @@
 import subprocess
+import logging
 import os
 import shutil
+import signal
+import threading
+import time
+from collections import deque
 from pathlib import Path
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
+class OutputTail:
+    """Keeps roughly the last `max_bytes` of text written to it."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._parts = deque()
+        self._size = 0
+
+    def append(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        while self._size > self.max_bytes and len(self._parts) > 1:
+            self._size -= len(self._parts.popleft())
+
+    def __str__(self):
+        return "".join(self._parts)[-self.max_bytes:]
+
 class SystemService:
     @staticmethod
-    def run_command(command, cwd=None):
+    def run_command(command, cwd=None, on_line=None, timeout=None, env=None, on_tick=None, tick=0.5):
         """
         Runs a shell command and returns the output or error.
+
+        If `on_line`, `on_tick` or `timeout` is given the command is streamed
+        instead: `on_line(line, stream)` is called for every stdout/stderr line
+        as it arrives, `on_tick()` every `tick` seconds while it runs (also when
+        it is silent), and only the last PANEL_COMMAND_TAIL_KB of each stream is
+        kept for the result dict.
         """
+        if on_line is not None or on_tick is not None or timeout is not None:
+            return SystemService.stream_command(
+                command, cwd=cwd, on_line=on_line, timeout=timeout, env=env, on_tick=on_tick, tick=tick
+            )
         try:
             result = subprocess.run(
                 command,
@@ -18,6 +52,7 @@ class SystemService:
                 capture_output=True,
                 text=True,
                 stdin=subprocess.DEVNULL, # Fix for [Errno 6] No such device or address in non-TTY envs
+                env=env,
                 check=False # We handle errors manually
             )
             return {
@@ -34,9 +69,244 @@ class SystemService:
                 'returncode': -1
             }
 
+    @staticmethod
+    def stream_command(command, cwd=None, on_line=None, timeout=None, env=None, on_tick=None, tick=0.5):
+        """
+        Runs a shell command with Popen, forwarding output line by line.
+
+        The command runs in its own process group so a timeout kills the
+        whole tree (e.g. pip and the compilers it spawned), not just the shell.
+        `on_tick` runs on the calling thread (serialized with `on_line`) every
+        `tick` seconds until the command exits, e.g. to flush buffered lines
+        while a step is quiet.
+        """
+        tail_bytes = getattr(settings, 'PANEL_COMMAND_TAIL_KB', 64) * 1024
+        tails = {'stdout': OutputTail(tail_bytes), 'stderr': OutputTail(tail_bytes)}
+        callback_lock = threading.Lock()
+
+        env = dict(env if env is not None else os.environ)
+        env.setdefault('PYTHONUNBUFFERED', '1') # Let python children flush line by line
+
+        popen_kwargs = {}
+        if os.name == 'nt':
+            popen_kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            popen_kwargs['start_new_session'] = True
+
+        try:
+            proc = subprocess.Popen(
+                command,
+                shell=True,
+                cwd=cwd,
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors='replace',
+                bufsize=1,
+                **popen_kwargs
+            )
+        except Exception as e:
+            return {
+                'success': False,
+                'stdout': '',
+                'stderr': str(e),
+                'returncode': -1
+            }
+
+        def pump(pipe, name):
+            for line in pipe:
+                tails[name].append(line)
+                if on_line is not None:
+                    with callback_lock:
+                        try:
+                            on_line(line.rstrip('\n'), name)
+                        except Exception:
+                            pass # A broken log sink must not wedge the pipe
+            pipe.close()
+
+        readers = [
+            threading.Thread(target=pump, args=(proc.stdout, 'stdout'), daemon=True),
+            threading.Thread(target=pump, args=(proc.stderr, 'stderr'), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+
+        timed_out = False
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = tick if on_tick is not None else None
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0)
+                wait = remaining if wait is None else min(wait, remaining)
+            try:
+                proc.wait(timeout=wait)
+                break
+            except subprocess.TimeoutExpired:
+                if deadline is not None and time.monotonic() >= deadline:
+                    timed_out = True
+                    SystemService.kill_process_group(proc)
+                    proc.wait()
+                    break
+            with callback_lock:
+                try:
+                    on_tick()
+                except Exception:
+                    pass
+
+        for reader in readers:
+            reader.join(timeout=5)
+
+        stderr = str(tails['stderr'])
+        if timed_out:
+            stderr = f"{stderr}\nCommand timed out after {timeout}s and was killed.".lstrip()
+        return {
+            'success': proc.returncode == 0 and not timed_out,
+            'stdout': str(tails['stdout']),
+            'stderr': stderr,
+            'returncode': -1 if timed_out else proc.returncode
+        }
+
+    @staticmethod
+    def kill_process_group(proc):
+        """Kills a process started by stream_command along with its children."""
+        try:
+            if os.name == 'nt':
+                subprocess.run(f"taskkill /F /T /PID {proc.pid}", shell=True, capture_output=True)
+            else:
+                os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+
 import getpass
 
+class GunicornTuning:
+    """
+    Resolves a project's Gunicorn settings, including the "auto" mode.
+
+    In auto mode the host is shared by all active projects: each gets an
+    equal slice of the usual (2 x cores + 1) workers, capped by its slice of
+    the memory left after PANEL_RESERVED_MEMORY_MB, at
+    PANEL_GUNICORN_WORKER_MB per worker.
+    """
+
+    @staticmethod
+    def cpu_count():
+        try:
+            return len(os.sched_getaffinity(0))
+        except AttributeError:
+            return os.cpu_count() or 1
+
+    @staticmethod
+    def memory_mb():
+        """Total RAM in MB, or None if it can't be read (non-Linux)."""
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemTotal:'):
+                        return int(line.split()[1]) // 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+    @classmethod
+    def active_projects(cls, project):
+        from .models import Project
+        count = Project.objects.filter(is_active=True).exclude(id=project.id).count()
+        return count + 1 # Count this project even if it isn't saved/active yet
+
+    @classmethod
+    def resolve(cls, project):
+        """Returns the effective settings as a dict."""
+        worker_class = project.gunicorn_worker_class or 'sync'
+        shares = cls.active_projects(project)
+        cores = cls.cpu_count()
+
+        workers = project.gunicorn_workers
+        if not workers:
+            if worker_class == 'uvicorn':
+                # Async workers don't block on I/O; one per core is plenty
+                workers = max(1, round(cores / shares))
+            else:
+                workers = max(1, round((2 * cores + 1) / shares))
+            memory = cls.memory_mb()
+            if memory:
+                reserved = getattr(settings, 'PANEL_RESERVED_MEMORY_MB', 512)
+                per_worker = getattr(settings, 'PANEL_GUNICORN_WORKER_MB', 120)
+                budget = max(0, memory - reserved) / shares
+                workers = max(1, min(workers, int(budget // per_worker)))
+
+        threads = project.gunicorn_threads
+        if not threads:
+            threads = 4 if worker_class == 'gthread' else 1
+
+        return {
+            'worker_class': worker_class,
+            'workers': workers,
+            'threads': threads,
+            'timeout': project.gunicorn_timeout,
+            'max_requests': project.gunicorn_max_requests,
+            'max_requests_jitter': project.gunicorn_max_requests_jitter if project.gunicorn_max_requests else 0,
+            'preload': project.gunicorn_preload,
+        }
+
+    @classmethod
+    def command_args(cls, project):
+        """Gunicorn CLI arguments (without bind/chdir) and the app to serve."""
+        tuning = cls.resolve(project)
+        args = [f"--workers {tuning['workers']}"]
+        if tuning['worker_class'] == 'uvicorn':
+            args.append("--worker-class uvicorn.workers.UvicornWorker")
+            app = "config.asgi:application"
+        else:
+            args.append(f"--worker-class {tuning['worker_class']}")
+            app = "config.wsgi:application"
+        if tuning['worker_class'] == 'gthread':
+            args.append(f"--threads {tuning['threads']}")
+        args.append(f"--timeout {tuning['timeout']}")
+        if tuning['max_requests']:
+            args.append(f"--max-requests {tuning['max_requests']} --max-requests-jitter {tuning['max_requests_jitter']}")
+        if tuning['preload']:
+            args.append("--preload")
+        return " ".join(args), app
+
+    @staticmethod
+    def packages(project):
+        """Packages the worker class needs on top of requirements.txt."""
+        if project.gunicorn_worker_class == 'uvicorn':
+            return 'gunicorn uvicorn'
+        return 'gunicorn'
+
 class ConfigGenerator:
+    @staticmethod
+    def socket_path(project):
+        """Unix socket Gunicorn listens on in the socket bind modes."""
+        return f"/run/{project.name}_gunicorn/gunicorn.sock"
+
+    @staticmethod
+    def upstream_address(project):
+        """Where Nginx reaches the project's Gunicorn."""
+        if project.bind_mode in ('socket', 'socket_activated'):
+            return f"unix:{ConfigGenerator.socket_path(project)}"
+        return f"127.0.0.1:{project.port}"
+
+    @staticmethod
+    def upstream_name(project):
+        """Identifier safe to use for the project's nginx upstream and cache zone."""
+        import re
+        return re.sub(r'[^a-z0-9_]', '_', project.name.lower()) + f"_{project.id or 0}"
+
+    # Tab separated (nginx expands \t) so TrafficMonitor can split lines cheaply;
+    # nginx logs control characters inside $uri as \xHH, so fields never contain tabs
+    ACCESS_LOG_FORMAT = r"$msec\t$status\t$request_time\t$upstream_response_time\t$request_method\t$uri\t$body_bytes_sent"
+
+    @staticmethod
+    def access_log_path(project):
+        """The project's own nginx access log, read by TrafficMonitor."""
+        log_dir = getattr(settings, 'PANEL_ACCESS_LOG_DIR', '/var/log/nginx')
+        return Path(log_dir) / f"{ConfigGenerator.upstream_name(project)}.access.log"
+
     @staticmethod
     def generate_nginx_config(project):
         """Generates Nginx config string."""
@@ -45,176 +315,1319 @@ class ConfigGenerator:
         
         # Using a very permissive regex for static alias for now
         static_path = f"/var/www/{clean_domain}/static/"
-        
-        return f"""server {{
-    listen 80;
-    server_name {clean_domain};
+        upstream = ConfigGenerator.upstream_name(project)
+
+        # http-level blocks (site files are included inside nginx's http {} block)
+        head = [
+            f"upstream {upstream} {{",
+            f"    server {ConfigGenerator.upstream_address(project)};",
+        ]
+        if project.nginx_keepalive:
+            head.append(f"    keepalive {project.nginx_keepalive};")
+        head.append("}")
+        # log_format names are global to nginx, so each site defines its own
+        head.append(f"log_format {upstream}_timing '{ConfigGenerator.ACCESS_LOG_FORMAT}';")
+        if project.nginx_microcache_seconds:
+            head.append(
+                f"proxy_cache_path /var/cache/nginx/{upstream} levels=1:2 "
+                f"keys_zone={upstream}_cache:10m max_size=256m inactive=10m use_temp_path=off;"
+            )
+
+        server = [
+            "    listen 80;",
+            f"    server_name {clean_domain};",
+            f"    access_log {ConfigGenerator.access_log_path(project)} {upstream}_timing;",
+            "",
+            "    sendfile on;",
+            "    tcp_nopush on;",
+            "    tcp_nodelay on;",
+        ]
+        if project.nginx_gzip:
+            server += [
+                "",
+                "    gzip on;",
+                "    gzip_vary on;",
+                "    gzip_comp_level 5;",
+                "    gzip_min_length 1024;",
+                "    gzip_proxied any;",
+                "    gzip_types text/plain text/css text/javascript application/javascript application/json application/xml image/svg+xml;",
+            ]
+        if project.nginx_open_file_cache:
+            server += [
+                "",
+                "    open_file_cache max=2000 inactive=60s;",
+                "    open_file_cache_valid 120s;",
+                "    open_file_cache_min_uses 2;",
+                "    open_file_cache_errors on;",
+            ]
 
-    location / {{
-        proxy_pass http://127.0.0.1:{project.port};
-        proxy_set_header Host $host;
-        proxy_set_header X-Real-IP $remote_addr;
-        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
-        proxy_set_header X-Forwarded-Proto $scheme;
-    }}
+        proxy = [
+            f"        proxy_pass http://{upstream};",
+            "        proxy_set_header Host $host;",
+            "        proxy_set_header X-Real-IP $remote_addr;",
+            "        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;",
+            "        proxy_set_header X-Forwarded-Proto $scheme;",
+        ]
+        if project.nginx_keepalive:
+            proxy += [
+                "        proxy_http_version 1.1;",
+                '        proxy_set_header Connection "";',
+            ]
+        if project.nginx_proxy_buffering:
+            proxy += [
+                "        proxy_buffering on;",
+                "        proxy_buffer_size 16k;",
+                "        proxy_buffers 16 16k;",
+                "        proxy_busy_buffers_size 32k;",
+            ]
+        else:
+            proxy.append("        proxy_buffering off;")
+        if project.nginx_microcache_seconds:
+            # Only anonymous traffic is cached: skip anything with a session or auth
+            proxy += [
+                f"        proxy_cache {upstream}_cache;",
+                "        proxy_cache_methods GET HEAD;",
+                f"        proxy_cache_valid 200 301 302 {project.nginx_microcache_seconds}s;",
+                "        proxy_cache_use_stale updating error timeout http_500 http_502 http_503 http_504;",
+                "        proxy_cache_background_update on;",
+                "        proxy_cache_lock on;",
+                "        proxy_cache_bypass $cookie_sessionid $http_authorization;",
+                "        proxy_no_cache $cookie_sessionid $http_authorization;",
+                "        add_header X-Cache-Status $upstream_cache_status;",
+            ]
 
-    location /static/ {{
-        alias {static_path};
-    }}
-}}"""
+        static = [f"        alias {static_path};"]
+        if project.nginx_gzip:
+            static.append("        gzip_static on;")
+        if project.nginx_static_expires and project.nginx_static_expires != 'off':
+            static += [
+                f"        expires {project.nginx_static_expires};",
+                "        access_log off;",
+                "",
+                "        # Hashed names (ManifestStaticFilesStorage: app.3f2a1b9c4d5e.css) never change",
+                r'        location ~* "\.[0-9a-f]{12}\.[A-Za-z0-9]+$" {',
+                "            expires max;",
+                '            add_header Cache-Control "public, max-age=31536000, immutable";',
+                "            access_log off;",
+                "        }",
+            ]
+
+        lines = head + [
+            "",
+            "server {",
+            *server,
+            "",
+            "    location / {",
+            *proxy,
+            "    }",
+            "",
+            "    location /static/ {",
+            *static,
+            "    }",
+            "}",
+        ]
+        return "\n".join(lines)
 
     @staticmethod
     def generate_gunicorn_service(project, venv_path, project_path):
         """Generates Systemd service string."""
+        args, app = GunicornTuning.command_args(project)
+        unit = ""
+        service = ""
+        if project.bind_mode == 'socket_activated':
+            # systemd owns the socket and hands it over (LISTEN_FDS), no --bind needed
+            socket_unit = f"{project.name}_gunicorn.socket"
+            unit = f"Requires={socket_unit}\n"
+            after = f"network.target {socket_unit}"
+            bind = ""
+        elif project.bind_mode == 'socket':
+            # /run/<name>_gunicorn is created for the service. Nginx must be able to
+            # traverse it; the socket itself (umask 007, group www-data) is the gate.
+            after = "network.target"
+            service = f"RuntimeDirectory={project.name}_gunicorn\nRuntimeDirectoryMode=0755\n"
+            bind = f" --bind unix:{ConfigGenerator.socket_path(project)} --umask 007"
+        else:
+            after = "network.target"
+            bind = f" --bind 127.0.0.1:{project.port}"
         return f"""[Unit]
 Description=Gunicorn daemon for {project.name}
-After=network.target
+{unit}After={after}
 
 [Service]
 User={getpass.getuser()}
 Group=www-data
-WorkingDirectory={project_path}
-ExecStart={venv_path}/bin/gunicorn --workers 3 --bind 127.0.0.1:{project.port} config.wsgi:application
+{service}WorkingDirectory={project_path}
+ExecStart={venv_path}/bin/gunicorn {args} --chdir {project_path}{bind} {app}
+ExecReload=/bin/kill -s HUP $MAINPID
 Restart=always
 
 [Install]
 WantedBy=multi-user.target"""
 
+    @staticmethod
+    def generate_gunicorn_socket(project):
+        """
+        Generates the systemd .socket unit used in socket activation mode.
+
+        systemd creates the socket directory as root, so it has to stay
+        world-traversable for Nginx; access is limited by SocketMode/SocketGroup.
+        """
+        return f"""[Unit]
+Description=Gunicorn socket for {project.name}
+
+[Socket]
+ListenStream={ConfigGenerator.socket_path(project)}
+SocketUser={getpass.getuser()}
+SocketGroup=www-data
+SocketMode=0660
+DirectoryMode=0755
+
+[Install]
+WantedBy=sockets.target"""
+
 import sys
 import platform
+from contextlib import contextmanager
+
+class ConfigReconciler:
+    """
+    Installs generated system config files only when they actually change.
+
+    Rendered output is compared with the installed file and unchanged
+    files are left alone. nginx reloads (`nginx -s reload`, never a restart)
+    and systemd daemon-reloads requested by concurrent deploys within
+    PANEL_RELOAD_DEBOUNCE_MS are coalesced into a single call.
+    """
+    _batch_lock = threading.Lock()
+    _batches = {}
+
+    @staticmethod
+    def read(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @classmethod
+    def apply(cls, path, content):
+        """
+        Writes `content` to `path` (via sudo) unless it's already installed.
+
+        Returns (changed, result) where result is a run_command dict.
+        """
+        import tempfile
+        if cls.read(path) == content:
+            return False, {'success': True, 'stdout': '', 'stderr': '', 'returncode': 0}
+        fd, tmp_path = tempfile.mkstemp(prefix='panel-', suffix=f"-{Path(path).name}")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        res = SystemService.run_command(f'sudo install -m 644 "{tmp_path}" "{path}"')
+        os.unlink(tmp_path)
+        return res['success'], res
+
+    @classmethod
+    def link(cls, link_path, target):
+        """Points a symlink (e.g. sites-enabled/<domain>) at `target` unless it already does."""
+        try:
+            if os.readlink(link_path) == str(target):
+                return False, {'success': True, 'stdout': '', 'stderr': '', 'returncode': 0}
+        except OSError:
+            pass
+        res = SystemService.run_command(f'sudo ln -sfn "{target}" "{link_path}"')
+        return res['success'], res
+
+    @classmethod
+    def remove(cls, path):
+        """Removes an installed file or link; returns whether anything was removed."""
+        if not os.path.lexists(path):
+            return False
+        return SystemService.run_command(f'sudo rm -f "{path}"')['success']
+
+    @classmethod
+    def _coalesced(cls, key, action):
+        """
+        Runs `action` once for all callers that ask within the debounce window.
+
+        The first caller waits out the window, then runs the action; callers
+        arriving meanwhile just wait for (and share) its result. Callers after
+        the action started open a new batch, so their changes aren't missed.
+        """
+        window = getattr(settings, 'PANEL_RELOAD_DEBOUNCE_MS', 1000) / 1000
+        with cls._batch_lock:
+            batch = cls._batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = cls._batches[key] = {'done': threading.Event(), 'result': None}
+        if not leader:
+            batch['done'].wait()
+            return batch['result']
+
+        time.sleep(window)
+        with cls._batch_lock:
+            cls._batches.pop(key, None)
+        try:
+            batch['result'] = action()
+        except Exception as e:
+            batch['result'] = {'success': False, 'stdout': '', 'stderr': str(e), 'returncode': -1}
+        finally:
+            batch['done'].set()
+        return batch['result']
+
+    @classmethod
+    def reload_nginx(cls):
+        """Validates the nginx config and reloads it gracefully (debounced)."""
+        def action():
+            res = SystemService.run_command("sudo nginx -t")
+            if not res['success']:
+                return res
+            res = SystemService.run_command("sudo nginx -s reload")
+            if not res['success']:
+                # nginx isn't running (no pid file): start it instead
+                res = SystemService.run_command("sudo systemctl start nginx")
+            return res
+        return cls._coalesced('nginx', action)
+
+    @classmethod
+    def daemon_reload(cls):
+        """Makes systemd pick up changed unit files (debounced)."""
+        return cls._coalesced('systemd', lambda: SystemService.run_command("sudo systemctl daemon-reload"))
+
+
+class DeploymentLogger:
+    """
+    Buffers deployment log lines and appends them to the database in chunks.
+
+    Lines are flushed as a single DeploymentLogChunk once the buffer holds
+    PANEL_LOG_FLUSH_LINES lines or PANEL_LOG_FLUSH_INTERVAL_MS has passed since
+    the last flush, so a chatty deploy costs one small INSERT per batch instead
+    of rewriting the whole log on every line.
+    """
+
+    def __init__(self, deployment):
+        self.deployment = deployment
+        self.flush_lines = getattr(settings, 'PANEL_LOG_FLUSH_LINES', 20)
+        self.flush_interval = getattr(settings, 'PANEL_LOG_FLUSH_INTERVAL_MS', 500) / 1000
+        self._buffer = []
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+        last = deployment.log_chunks.order_by('-sequence').values_list('sequence', flat=True).first()
+        self._sequence = last + 1 if last is not None else 0
+        self._first_sequence = self._sequence
+
+    def __call__(self, msg):
+        self.log(msg)
+
+    def log(self, msg):
+        with self._lock:
+            self._buffer.append(str(msg))
+            elapsed = time.monotonic() - self._last_flush
+            if len(self._buffer) >= self.flush_lines or elapsed >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def flush_due(self):
+        """Flushes lines that have waited PANEL_LOG_FLUSH_INTERVAL_MS (for quiet steps)."""
+        with self._lock:
+            if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        from .models import DeploymentLogChunk
+        DeploymentLogChunk.objects.create(
+            deployment=self.deployment,
+            sequence=self._sequence,
+            content="\n".join(self._buffer),
+        )
+        self._sequence += 1
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    @property
+    def text(self):
+        """
+        Log text written through this logger, read back from its chunks (lines
+        are not kept in memory once flushed).
+        """
+        self.flush()
+        chunks = self.deployment.log_chunks.filter(sequence__gte=self._first_sequence).order_by('sequence')
+        return "\n".join(chunks.values_list('content', flat=True))
+
+    def set_status(self, status):
+        """Flushes pending lines, then saves only the status column."""
+        self.flush()
+        self.deployment.status = status
+        update_fields = ['status']
+        if status in ('success', 'failed'):
+            from django.utils import timezone
+            self.deployment.finished_at = timezone.now()
+            update_fields.append('finished_at')
+        self.deployment.save(update_fields=update_fields)
+        DashboardService.invalidate()
+
+class DeployProfiler:
+    """
+    Records how long each phase of a deployment takes as DeploymentStep rows.
+
+        with profile.step('pip'):
+            ...
+
+    Commands run inside a step report their exit code and output size via
+    observe() / finished(). A step left by an exception is marked failed.
+    Recording problems are logged, never raised: timing must not break a
+    deploy.
+    """
+    # Display order of the steps DeployService.deploy / rollback record
+    STEPS = (
+        'prepare', 'git', 'fingerprint', 'venv', 'pip', 'migrate',
+        'collectstatic', 'configs', 'switch', 'nginx_reload', 'finalize',
+    )
+
+    def __init__(self, deployment):
+        self.deployment = deployment
+        self.current = None
+        self._position = 0
+        # A requeued deployment (worker died mid-job) starts its timings over
+        deployment.steps.all().delete()
+
+    @contextmanager
+    def step(self, name):
+        from django.utils import timezone
+        span = {
+            'name': name, 'status': 'success', 'started_at': timezone.now(),
+            'start': time.monotonic(), 'returncode': None, 'output_bytes': 0,
+        }
+        self.current = span
+        try:
+            yield span
+        except BaseException:
+            span['status'] = 'failed'
+            raise
+        finally:
+            self.current = None
+            if span['status'] == 'success' and span['returncode']:
+                span['status'] = 'failed'
+            self._save(span, time.monotonic() - span['start'])
+
+    def skip(self, name):
+        """Records a step that was not needed this time (inputs unchanged)."""
+        from django.utils import timezone
+        self._save({'name': name, 'status': 'skipped', 'started_at': timezone.now(),
+                    'returncode': None, 'output_bytes': 0}, 0.0)
+
+    def observe(self, line):
+        if self.current is not None:
+            self.current['output_bytes'] += len(line.encode('utf-8', 'replace')) + 1
+
+    def finished(self, res):
+        """Keeps the exit code of the step's last failing command, or of its last one."""
+        span = self.current
+        if span is not None and 'returncode' in res and not (span['returncode'] and res['success']):
+            span['returncode'] = res['returncode']
+
+    @staticmethod
+    def waterfall(deployment):
+        """Steps of a deployment with their offset/width as % of the whole run."""
+        steps = list(deployment.steps.all())
+        if not steps:
+            return [], 0.0
+        origin = steps[0].started_at
+        offsets = [(step.started_at - origin).total_seconds() for step in steps]
+        total = max(offset + step.duration for offset, step in zip(offsets, steps)) or 1.0
+        rows = [{
+            'step': step,
+            'offset': offset,
+            'left': round(offset / total * 100, 2),
+            'width': max(round(step.duration / total * 100, 2), 0.3),
+        } for offset, step in zip(offsets, steps)]
+        return rows, total
+
+    @classmethod
+    def trends(cls, project, limit=30):
+        """
+        Duration of each step over the project's last `limit` deployments
+        (rollbacks excluded), oldest first: (deployments, rows). Each row has
+        the step's durations (None where it didn't run) and sparkline points.
+        """
+        from .models import DeploymentStep
+        deployments = list(
+            project.deployments.filter(rollback_to='', steps__isnull=False).distinct()
+            .defer('legacy_logs', 'archived_logs', 'fingerprints').order_by('-created_at')[:limit]
+        )[::-1]
+        index = {d.id: i for i, d in enumerate(deployments)}
+        durations = {}
+        totals = [0.0] * len(deployments)
+        for deployment_id, name, status, duration in DeploymentStep.objects.filter(
+            deployment_id__in=index
+        ).values_list('deployment_id', 'name', 'status', 'duration'):
+            i = index[deployment_id]
+            totals[i] += duration
+            if status != 'skipped':
+                durations.setdefault(name, [None] * len(deployments))[i] = duration
+
+        order = {name: i for i, name in enumerate(cls.STEPS)}
+        rows = [('total', totals)] + sorted(durations.items(), key=lambda item: order.get(item[0], len(order)))
+        return deployments, [cls._trend_row(name, values) for name, values in rows]
+
+    @staticmethod
+    def _trend_row(name, values):
+        ran = sorted(v for v in values if v is not None)
+        peak = ran[-1] if ran else 0
+        step = 200 / (len(values) - 1) if len(values) > 1 else 0
+        points = " ".join(
+            f"{i * step:.1f},{38 - v / (peak or 1) * 36:.1f}" for i, v in enumerate(values) if v is not None
+        )
+        return {
+            'name': name,
+            'durations': values,
+            'latest': next((v for v in reversed(values) if v is not None), None),
+            'median': ran[len(ran) // 2] if ran else None,
+            'max': peak if ran else None,
+            'points': points,
+        }
+
+    def _save(self, span, duration):
+        from .models import DeploymentStep
+        try:
+            DeploymentStep.objects.create(
+                deployment=self.deployment, position=self._position, name=span['name'],
+                status=span['status'], started_at=span['started_at'], duration=duration,
+                returncode=span['returncode'], output_bytes=span['output_bytes'],
+            )
+            self._position += 1
+        except Exception:
+            logger.exception("Could not record deploy step %s", span['name'])
+
+class DeployFingerprint:
+    """
+    Hashes the inputs of the expensive deploy steps.
+
+    A step whose fingerprint matches the one recorded by the last successful
+    deployment of the project is skipped:
+      - dependencies: requirements.txt + the interpreter path and version +
+        the server packages installed on top (gunicorn, uvicorn)
+      - migrations: path and content of every migrations/*.py file, plus
+        the dependencies (Django and installed apps ship migrations)
+      - static: path and git blob id (content hash for untracked files) of
+        files in static/ trees and settings modules, plus the dependencies
+        (packages ship static files too)
+
+    Every release is a fresh checkout, so nothing here may depend on file
+    mtimes.
+    """
+    SKIP_DIRS = {'venv', '.venv', '.git', 'node_modules', '__pycache__'}
+
+    @staticmethod
+    def git_blobs(project_path):
+        """
+        Maps tracked paths of the checkout to their blob ids ({} outside git).
+        Files modified since HEAD are left out, so they get content-hashed.
+        """
+        res = SystemService.run_command('git ls-tree -r -z HEAD', cwd=project_path)
+        modified = SystemService.run_command('git diff --name-only -z HEAD', cwd=project_path)
+        if not (res['success'] and modified['success']):
+            return {}
+        blobs = {}
+        for entry in res['stdout'].split('\0'):
+            meta, _, path = entry.partition('\t')
+            parts = meta.split()
+            if path and len(parts) == 3 and parts[1] == 'blob':
+                blobs[path] = parts[2]
+        for path in modified['stdout'].split('\0'):
+            blobs.pop(path, None)
+        return blobs
 
-# ... imports ...
+    @classmethod
+    def compute(cls, project_path, interpreter, extra_packages=''):
+        import hashlib
+        project_path = Path(project_path)
+
+        requirements = project_path / 'requirements.txt'
+        if not requirements.exists():
+            return {}
+        deps = hashlib.sha256(requirements.read_bytes())
+        deps.update(f"\0{interpreter}\0{platform.python_version()}\0{extra_packages}".encode())
+        deps = deps.hexdigest()
+
+        # Installed apps ship migrations too, so both depend on the requirements
+        migrations = hashlib.sha256(deps.encode())
+        static = hashlib.sha256(deps.encode())
+        blobs = cls.git_blobs(project_path)
+        for root, dirs, files in os.walk(project_path):
+            dirs[:] = sorted(d for d in dirs if d not in cls.SKIP_DIRS)
+            rel_root = Path(root).relative_to(project_path)
+            parts = rel_root.parts
+            for name in sorted(files):
+                rel = (rel_root / name).as_posix()
+                if parts and parts[-1] == 'migrations' and name.endswith('.py'):
+                    migrations.update(rel.encode())
+                    migrations.update(hashlib.sha256(Path(root, name).read_bytes()).digest())
+                elif 'static' in parts or name == 'settings.py' or (parts and parts[-1] == 'settings'):
+                    blob = blobs.get(rel) or hashlib.sha256(Path(root, name).read_bytes()).hexdigest()
+                    static.update(f"{rel}\0{blob}\0".encode())
+
+        return {
+            'dependencies': deps,
+            'migrations': migrations.hexdigest(),
+            'static': static.hexdigest(),
+        }
+
+    @staticmethod
+    def last_successful(project, exclude=None):
+        """Fingerprints recorded by the project's last successful deployment."""
+        qs = project.deployments.filter(status='success')
+        if exclude is not None:
+            qs = qs.exclude(id=exclude.id)
+        return qs.order_by('-created_at').values_list('fingerprints', flat=True).first() or {}
+
+class WheelCache:
+    """
+    Content-addressed wheelhouse shared by every hosted project.
+
+    Wheels are stored once under blobs/<sha256> and hard-linked by filename
+    into wheels/, which pip uses as --find-links. Installs are tried
+    offline first (--no-index); missing wheels are then downloaded or built
+    with `pip wheel` and added to the wheelhouse. When that fails and a
+    regular `pip install` has to fetch from the index, the packages it
+    fetched are wheeled afterwards, so the next deploy finds them offline.
+    Wheels are evicted least recently used first once the wheelhouse
+    exceeds PANEL_WHEELHOUSE_MAX_MB.
+    """
+    _lock = threading.Lock()
+
+    @staticmethod
+    def root():
+        cache_dir = getattr(settings, 'PANEL_CACHE_DIR', Path.home() / '.djangopanel' / 'cache')
+        return Path(cache_dir) / 'wheelhouse'
+
+    @classmethod
+    def wheels_dir(cls):
+        return cls.root() / 'wheels'
+
+    @classmethod
+    def pip_env(cls):
+        """Environment for pip: one HTTP/build cache shared by all projects."""
+        env = os.environ.copy()
+        env['PIP_CACHE_DIR'] = str(cls.root().parent / 'pip')
+        env['PIP_DISABLE_PIP_VERSION_CHECK'] = '1'
+        return env
+
+    @classmethod
+    def install(cls, pip, targets, run_step, log, cwd=None):
+        """
+        Installs `targets` (pip arguments, e.g. '-r requirements.txt') into a venv.
+
+        Returns the result dict of the last pip command that ran.
+        """
+        import tempfile
+        wheels = cls.wheels_dir()
+        wheels.mkdir(parents=True, exist_ok=True)
+        env = cls.pip_env()
+        fd, report = tempfile.mkstemp(prefix='pip-report-', suffix='.json', dir=cls.root())
+        os.close(fd)
+        report = Path(report)
+        find_links = f'--find-links "{wheels}"'
+
+        try:
+            res = run_step(f'"{pip}" install --no-index {find_links} --report "{report}" {targets}', cwd=cwd, env=env)
+            if res['success']:
+                log("Installed from the shared wheelhouse.")
+            else:
+                log("Wheelhouse is missing packages, fetching and building wheels...")
+                res = cls.build_wheels(pip, targets, run_step, log, cwd=cwd)
+                if res['success']:
+                    res = run_step(f'"{pip}" install --no-index {find_links} --report "{report}" {targets}', cwd=cwd, env=env)
+                if not res['success']:
+                    # Some packages can't be built as wheels; let pip do it the usual way
+                    log("Falling back to a regular pip install...")
+                    res = run_step(f'"{pip}" install {find_links} --report "{report}" {targets}', cwd=cwd, env=env)
+                    if res['success']:
+                        # Keep what came from the index, so the next deploy finds it offline
+                        downloaded = cls.downloaded(report)
+                        if downloaded:
+                            cls.build_wheels(pip, '--no-deps ' + ' '.join(f'"{req}"' for req in downloaded), run_step, log, cwd=cwd)
+
+            if res['success']:
+                cls.mark_used(report)
+            return res
+        finally:
+            report.unlink(missing_ok=True)
+
+    @classmethod
+    def build_wheels(cls, pip, targets, run_step, log, cwd=None):
+        """
+        Downloads or builds wheels for `targets` with `pip wheel` and adds them
+        to the wheelhouse (also the ones built before a failure). Returns the
+        `pip wheel` result.
+        """
+        import tempfile
+        staging = Path(tempfile.mkdtemp(prefix='staging-', dir=cls.root()))
+        try:
+            res = run_step(
+                f'"{pip}" wheel --find-links "{cls.wheels_dir()}" --wheel-dir "{staging}" {targets}',
+                cwd=cwd, env=cls.pip_env(),
+            )
+            added = cls.add_wheels(staging)
+            if added:
+                log(f"Added {added} wheel(s) to the shared wheelhouse.")
+            return res
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @staticmethod
+    def report_items(report):
+        """The 'install' entries of a pip install --report file."""
+        import json
+        try:
+            with open(report) as f:
+                return json.load(f).get('install', [])
+        except (OSError, ValueError):
+            return []
+
+    @classmethod
+    def downloaded(cls, report):
+        """name==version of the packages a pip install report says came from an index."""
+        requirements = []
+        for item in cls.report_items(report):
+            url = item.get('download_info', {}).get('url', '')
+            metadata = item.get('metadata', {})
+            if url.startswith(('http:', 'https:')) and metadata.get('name') and metadata.get('version'):
+                requirements.append(f"{metadata['name']}=={metadata['version']}")
+        return requirements
+
+    @classmethod
+    def add_wheels(cls, directory):
+        """Moves the wheels in `directory` into the wheelhouse. Returns how many were new."""
+        import hashlib
+        blobs = cls.root() / 'blobs'
+        wheels = cls.wheels_dir()
+        added = 0
+        for wheel in Path(directory).glob('*.whl'):
+            digest = hashlib.sha256()
+            with open(wheel, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            digest = digest.hexdigest()
+            blob = blobs / digest[:2] / f"{digest}.whl"
+            link = wheels / wheel.name
+            with cls._lock:
+                if not blob.exists():
+                    blob.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(wheel, blob)
+                if not link.exists():
+                    try:
+                        os.link(blob, link)
+                    except OSError:
+                        shutil.copy2(blob, link) # No hard links on this filesystem
+                    added += 1
+        return added
+
+    @classmethod
+    def mark_used(cls, report):
+        """Refreshes the LRU timestamp of every wheel listed in a pip install report."""
+        from urllib.parse import unquote, urlparse
+        wheels = cls.wheels_dir().resolve()
+        for item in cls.report_items(report):
+            url = item.get('download_info', {}).get('url', '')
+            if not url.startswith('file:'):
+                continue
+            path = Path(unquote(urlparse(url).path))
+            if path.parent.resolve() == wheels:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+
+    @classmethod
+    def evict(cls):
+        """Removes least recently used wheels until the wheelhouse fits its size cap."""
+        max_bytes = getattr(settings, 'PANEL_WHEELHOUSE_MAX_MB', 2048) * 1024 * 1024
+        wheels_dir = cls.wheels_dir()
+        if not wheels_dir.exists():
+            return 0
+        with cls._lock:
+            entries = []
+            for entry in os.scandir(wheels_dir):
+                if entry.name.endswith('.whl'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= max_bytes:
+                    break
+                os.unlink(path)
+                total -= size
+                removed += 1
+
+            # Drop blobs no longer linked from wheels/
+            for blob in (cls.root() / 'blobs').glob('*/*.whl'):
+                try:
+                    if blob.stat().st_nlink == 1:
+                        blob.unlink()
+                except OSError:
+                    pass
+            return removed
+
+class GitService:
+    """
+    Shallow, branch-aware checkouts backed by a panel-wide object cache.
+
+    Every repository URL gets one bare cache repo under PANEL_CACHE_DIR/git.
+    Only `Project.branch` is fetched, PANEL_GIT_DEPTH commits deep, and each
+    project's working tree is a detached `git worktree` of that cache repo,
+    so projects deployed from the same URL share their objects. Updates are
+    a shallow fetch plus a hard reset, never a merging pull.
+    """
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    @staticmethod
+    def cache_dir(repo_url):
+        import hashlib
+        cache_root = Path(getattr(settings, 'PANEL_CACHE_DIR', Path.home() / '.djangopanel' / 'cache'))
+        key = hashlib.sha1(repo_url.strip().rstrip('/').encode()).hexdigest()
+        return cache_root / 'git' / f"{key}.git"
+
+    @classmethod
+    def _lock_for(cls, path):
+        with cls._locks_guard:
+            return cls._locks.setdefault(str(path), threading.Lock())
+
+    @staticmethod
+    def depth():
+        return max(1, int(getattr(settings, 'PANEL_GIT_DEPTH', 1)))
+
+    @classmethod
+    def sync(cls, project, worktree, run_step, log):
+        """
+        Brings `worktree` to the tip of `project.branch`.
+
+        Returns a run_command-style result dict with an extra 'commit' key.
+        """
+        worktree = Path(worktree)
+        branch = project.branch or 'main'
+        remote_ref = f"refs/remotes/origin/{branch}"
+        fetch = f'git fetch --no-tags --depth {cls.depth()} origin "+refs/heads/{branch}:{remote_ref}"'
+
+        repo = cls.cache_dir(project.repo_url)
+        with cls._lock_for(repo):
+            if not repo.exists():
+                log(f"Creating object cache for {project.repo_url}...")
+                repo.parent.mkdir(parents=True, exist_ok=True)
+                res = run_step(f'git -c init.defaultBranch=main init --quiet --bare "{repo}"')
+                if res['success']:
+                    res = run_step(f'git remote add origin "{project.repo_url}"', cwd=repo)
+                if not res['success']:
+                    shutil.rmtree(repo, ignore_errors=True)
+                    return res
+            log(f"Fetching {branch} from {project.repo_url} (depth {cls.depth()})...")
+            res = run_step(fetch, cwd=repo)
+
+        if not res['success']:
+            return res
+
+        commit = SystemService.run_command(f'git rev-parse "{remote_ref}"', cwd=repo)
+        if not commit['success']:
+            return commit
+        sha = commit['stdout'].strip()
+
+        if worktree.exists():
+            res = run_step(f'git reset --hard {sha}', cwd=worktree)
+        else:
+            log(f"Checking out {branch} into {worktree}...")
+            with cls._lock_for(repo):
+                run_step('git worktree prune', cwd=repo)
+                res = run_step(f'git worktree add --detach "{worktree}" {sha}', cwd=repo)
+        res['commit'] = sha
+        return res
+
+    @classmethod
+    def prune(cls, project):
+        """Forgets worktrees of the project's cache repo whose directories are gone."""
+        repo = cls.cache_dir(project.repo_url)
+        if repo.exists():
+            with cls._lock_for(repo):
+                SystemService.run_command('git worktree prune', cwd=repo)
+
+class ReleaseService:
+    """
+    Capistrano-style release layout of a project:
+
+        <BASE_DIR>/<name>/releases/<id>/   one checkout per deployment
+        <BASE_DIR>/<name>/current          symlink to the live release
+        <BASE_DIR>/<name>/shared/          Project.shared_paths, linked into every release
+        <BASE_DIR>/<name>/venvs/<hash>/    virtualenvs, keyed by the dependency fingerprint
+
+    Releases are fully prepared before `current` is switched, and the switch
+    is an atomic rename of a new symlink over the old one.
+    """
+
+    @staticmethod
+    def root(project):
+        return DeployService.BASE_DIR / project.name
+
+    @classmethod
+    def releases_dir(cls, project):
+        return cls.root(project) / "releases"
+
+    @classmethod
+    def current_link(cls, project):
+        return cls.root(project) / "current"
+
+    @classmethod
+    def shared_dir(cls, project):
+        return cls.root(project) / "shared"
+
+    @classmethod
+    def venvs_dir(cls, project):
+        return cls.root(project) / "venvs"
+
+    @classmethod
+    def current_release(cls, project):
+        """Name of the live release, or None."""
+        link = cls.current_link(project)
+        if not link.is_symlink():
+            return None
+        return Path(os.readlink(link)).name
+
+    @staticmethod
+    def _sort_key(name):
+        return int(name) if name.isdigit() else -1
+
+    @classmethod
+    def list_releases(cls, project):
+        """Release names, newest first."""
+        releases_dir = cls.releases_dir(project)
+        if not releases_dir.exists():
+            return []
+        names = [entry.name for entry in os.scandir(releases_dir) if entry.is_dir(follow_symlinks=False)]
+        return sorted(names, key=cls._sort_key, reverse=True)
+
+    @classmethod
+    def adopt_legacy_layout(cls, project, log):
+        """Moves a pre-release checkout (files directly in the project dir) to releases/legacy."""
+        root = cls.root(project)
+        if not root.exists() or cls.releases_dir(project).exists():
+            return
+        log("Converting project directory to the release layout (releases/legacy)...")
+        staging = root.parent / f".{project.name}.legacy"
+        os.replace(root, staging)
+        cls.releases_dir(project).mkdir(parents=True)
+        os.replace(staging, cls.releases_dir(project) / "legacy")
+
+        # Its data (media, sqlite db, ...) becomes the shared copy
+        legacy = cls.releases_dir(project) / "legacy"
+        for rel in cls.shared_paths(project):
+            source = legacy / rel.rstrip('/')
+            if source.exists() and not source.is_symlink():
+                target = cls.shared_dir(project) / rel.rstrip('/')
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(source), str(target))
+        # Virtualenvs aren't relocatable; the moved one can't run anymore
+        if (legacy / "venv").is_dir() and not (legacy / "venv").is_symlink():
+            shutil.rmtree(legacy / "venv", onerror=_on_rm_error)
+        cls.link_shared(project, legacy)
+        cls.switch(project, "legacy")
+
+    @staticmethod
+    def shared_paths(project):
+        paths = []
+        for line in (project.shared_paths or '').splitlines():
+            line = line.strip().lstrip('/')
+            if line and '..' not in Path(line).parts:
+                paths.append(line)
+        return paths
+
+    @classmethod
+    def link_shared(cls, project, release_path):
+        """Replaces each shared path in a release with a symlink into shared/."""
+        for rel in cls.shared_paths(project):
+            is_dir = rel.endswith('/')
+            rel = rel.rstrip('/')
+            target = cls.shared_dir(project) / rel
+            if is_dir:
+                target.mkdir(parents=True, exist_ok=True)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+
+            link = Path(release_path) / rel
+            link.parent.mkdir(parents=True, exist_ok=True)
+            if link.is_symlink() or link.is_file():
+                link.unlink()
+            elif link.is_dir():
+                shutil.rmtree(link)
+            os.symlink(os.path.relpath(target, link.parent), link)
+
+    @classmethod
+    def switch(cls, project, release):
+        """Atomically points `current` at releases/<release>."""
+        link = cls.current_link(project)
+        tmp_link = link.with_name(f".current-{release}")
+        if tmp_link.is_symlink():
+            tmp_link.unlink()
+        os.symlink(Path("releases") / release, tmp_link)
+        os.replace(tmp_link, link)
+
+    @classmethod
+    def venv_of(cls, project, release):
+        """Resolved virtualenv path used by a release, or None."""
+        if not release:
+            return None
+        venv = cls.releases_dir(project) / release / "venv"
+        return venv.resolve() if venv.exists() else None
+
+    @classmethod
+    def remove_release(cls, project, release):
+        shutil.rmtree(cls.releases_dir(project) / release, onerror=_on_rm_error)
+        GitService.prune(project)
+
+    @classmethod
+    def prune(cls, project, log=None):
+        """Keeps the newest PANEL_KEEP_RELEASES releases (and the live one), then drops unused venvs."""
+        keep = max(1, getattr(settings, 'PANEL_KEEP_RELEASES', 5))
+        current = cls.current_release(project)
+        removed = []
+        for name in cls.list_releases(project)[keep:]:
+            if name != current:
+                cls.remove_release(project, name)
+                removed.append(name)
+        if removed and log:
+            log(f"Pruned old releases: {', '.join(removed)}")
+
+        venvs_dir = cls.venvs_dir(project)
+        if venvs_dir.exists():
+            in_use = {cls.venv_of(project, name) for name in cls.list_releases(project)}
+            for entry in os.scandir(venvs_dir):
+                if Path(entry.path).resolve() not in in_use:
+                    shutil.rmtree(entry.path, onerror=_on_rm_error)
+        return removed
+
+def _on_rm_error(func, path, exc_info):
+    # Helper for Windows read-only git files: make writable and try again
+    import stat
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
 
 class DeployService:
     BASE_DIR = Path.home() / "django_projects" 
 
+    @staticmethod
+    def service_name(project):
+        return f"{project.name}_gunicorn.service"
+
+    @staticmethod
+    def socket_name(project):
+        return f"{project.name}_gunicorn.socket"
+
     @classmethod
     def deploy(cls, project, deployment):
-        # ... (logging logic) ...
-        log_buffer = []
-        def log(msg):
-            log_buffer.append(msg)
-            deployment.logs = "\\n".join(log_buffer)
-            deployment.save()
+        log = DeploymentLogger(deployment)
+        log.set_status('in_progress')
+        profile = DeployProfiler(deployment)
+        step_timeout = getattr(settings, 'PANEL_DEPLOY_STEP_TIMEOUT', None)
+
+        def on_line(line, stream):
+            profile.observe(line)
+            log(line)
+
+        def run_step(command, cwd=None, env=None):
+            """Runs a deploy step, streaming its output into the deployment log."""
+            res = SystemService.run_command(
+                command, cwd=cwd, on_line=on_line, timeout=step_timeout, env=env,
+                on_tick=log.flush_due, tick=log.flush_interval,
+            )
+            profile.finished(res)
+            return res
 
+        switched = False
+        release = str(deployment.id)
+        release_path = None
         try:
             # 1. Prepare Paths
-            project_path = cls.BASE_DIR / project.name
-            venv_path = project_path / "venv"
-            static_path = Path(f"/var/www/{project.domain}/static")
-            
-            # Determine OS-specific bin directory
-            is_windows = platform.system() == 'Windows'
-            bin_dir = "Scripts" if is_windows else "bin"
+            with profile.step('prepare'):
+                release_path = ReleaseService.releases_dir(project) / release
+                current_path = ReleaseService.current_link(project)
+
+                # Determine OS-specific bin directory
+                is_windows = platform.system() == 'Windows'
+                bin_dir = "Scripts" if is_windows else "bin"
+
+                if not cls.BASE_DIR.exists():
+                    os.makedirs(cls.BASE_DIR, exist_ok=True)
+
+                log(f"Starting deployment for {project.name} (release {release})...")
+                ReleaseService.adopt_legacy_layout(project, log)
+                ReleaseService.releases_dir(project).mkdir(parents=True, exist_ok=True)
+                if release_path.exists():
+                    ReleaseService.remove_release(project, release)
+
+            # 2. Check out the project branch into a new release directory
+            with profile.step('git'):
+                res = GitService.sync(project, release_path, run_step, log)
+
+                if not res['success']:
+                    raise Exception(f"Git failed: {res['stderr']}")
+                log(f"Git operation successful ({project.branch} @ {res['commit'][:10]}).")
+                deployment.release = release
+                deployment.commit = res['commit']
+                deployment.save(update_fields=['release', 'commit'])
+                ReleaseService.link_shared(project, release_path)
+
+            # Steps whose inputs match the last successful deploy are skipped
+            with profile.step('fingerprint'):
+                server_packages = GunicornTuning.packages(project)
+                fingerprints = DeployFingerprint.compute(release_path, sys.executable, server_packages)
+                previous = {} if deployment.force_full else DeployFingerprint.last_successful(project, exclude=deployment)
+            completed = {}
+
+            def unchanged(step):
+                if fingerprints.get(step) and previous.get(step) == fingerprints[step]:
+                    completed[step] = fingerprints[step]
+                    return True
+                return False
+
+            def record(step, res):
+                if res['success'] and fingerprints.get(step):
+                    completed[step] = fingerprints[step]
+
+            if deployment.force_full:
+                log("Full deploy requested: no steps will be skipped.")
+
+            # 3. Setup Venv: releases with the same requirements share one
+            venv_key = fingerprints['dependencies'][:16] if fingerprints.get('dependencies') else f"release-{release}"
+            venv_path = ReleaseService.venvs_dir(project) / venv_key
             venv_bin = venv_path / bin_dir
-            
-            if not cls.BASE_DIR.exists():
-                os.makedirs(cls.BASE_DIR, exist_ok=True)
+            venv_ready = venv_path / ".panel-complete"
+            with profile.step('venv'):
+                if not venv_path.exists():
+                    log(f"Creating virtual environment using {sys.executable}...")
+                    # Use sys.executable to ensure we use the same python interpreter
+                    venv_path.parent.mkdir(parents=True, exist_ok=True)
+                    res = run_step(f'"{sys.executable}" -m venv "{venv_path}"')
+                    if not res['success']:
+                        shutil.rmtree(venv_path, ignore_errors=True)
+                        raise Exception(f"Venv creation failed: {res['stderr']}")
+                release_venv = release_path / "venv"
+                if release_venv.is_symlink() or release_venv.is_file():
+                    release_venv.unlink()
+                elif release_venv.is_dir():
+                    shutil.rmtree(release_venv)
+                os.symlink(os.path.relpath(venv_path, release_path), release_venv)
 
-            # 2. Clone or Pull
-            log(f"Starting deployment for {project.name}...")
-            if project_path.exists():
-                log("Pulling latest changes...")
-                res = SystemService.run_command("git pull", cwd=project_path)
+            # 4. Install Requirements (+ Gunicorn, critical for the service to run
+            # even if it's not in requirements.txt)
+            if venv_ready.exists() and not deployment.force_full:
+                log(f"Requirements unchanged, reusing virtual environment venvs/{venv_key}.")
+                completed['dependencies'] = fingerprints.get('dependencies')
+                profile.skip('pip')
             else:
-                log(f"Cloning {project.repo_url}...")
-                res = SystemService.run_command(f'git clone "{project.repo_url}" "{project.name}"', cwd=cls.BASE_DIR)
-            
-            if not res['success']:
-                raise Exception(f"Git failed: {res['stderr']}")
-            log("Git operation successful.")
-
-            # 3. Setup Venv
-            if not venv_path.exists():
-                log(f"Creating virtual environment using {sys.executable}...")
-                # Use sys.executable to ensure we use the same python interpreter
-                res = SystemService.run_command(f'"{sys.executable}" -m venv venv', cwd=project_path)
-                if not res['success']:
-                    raise Exception(f"Venv creation failed: {res['stderr']}")
+                with profile.step('pip'):
+                    log("Installing requirements...")
+                    # Use absolute path to pip; packages come from the shared wheelhouse when possible
+                    pip = venv_bin / "pip"
+                    res = WheelCache.install(pip, '-r requirements.txt', run_step, log, cwd=release_path)
+                    if not res['success']:
+                        log(f"Warning: pip install had issues: {res['stderr']}")
 
-            # 4. Install Requirements
-            log("Installing requirements...")
-            # Use absolute path to pip
-            pip_cmd = f'"{venv_bin / "pip"}" install -r requirements.txt'
-            res = SystemService.run_command(pip_cmd, cwd=project_path)
-            if not res['success']:
-                log(f"Warning: pip install had issues: {res['stderr']}") 
+                    log(f"Ensuring server packages are installed ({server_packages})...")
+                    gunicorn_res = WheelCache.install(pip, server_packages, run_step, log, cwd=release_path)
+                    record('dependencies', res if gunicorn_res['success'] else gunicorn_res)
+                    if 'dependencies' in completed:
+                        venv_ready.touch()
+                    WheelCache.evict()
 
-            # 5. Migrations & Static
-            log("Running migrations...")
+            # 5. Migrations & Static (run from the new release, before it goes live)
             python_cmd = f'"{venv_bin / "python"}" manage.py'
-            res = SystemService.run_command(f"{python_cmd} migrate", cwd=project_path)
-            
-            log("Collecting static files...")
-            res = SystemService.run_command(f"{python_cmd} collectstatic --noinput", cwd=project_path)
+            if unchanged('migrations'):
+                log("Migrations unchanged since last successful deploy, skipping migrate.")
+                profile.skip('migrate')
+            else:
+                with profile.step('migrate'):
+                    log("Running migrations...")
+                    res = run_step(f"{python_cmd} migrate", cwd=release_path)
+                    record('migrations', res)
+
+            if unchanged('static'):
+                log("Static files unchanged since last successful deploy, skipping collectstatic.")
+                profile.skip('collectstatic')
+            else:
+                with profile.step('collectstatic'):
+                    log("Collecting static files...")
+                    res = run_step(f"{python_cmd} collectstatic --noinput", cwd=release_path)
+                    record('static', res)
+
+            deployment.fingerprints = completed
+            deployment.save(update_fields=['fingerprints'])
 
             
             # 6. System Configs (Requires SUDO - this part is tricky without password)
-            # We will assume the user running this has passwordless sudo for these writes
-            # OR we write to tmp and ask user to copy (but the prompt asked for "Direct deployment")
-            # We'll try direct write with tee using sudo
-            
-            log("Configuring Systemd & Nginx...")
-            
-            # Write Nginx
-            nginx_conf = ConfigGenerator.generate_nginx_config(project)
-            nginx_path = f"/etc/nginx/sites-available/{project.domain}"
-            # Escape quotes for shell safety in echo is hard, writing detailed python file writer is better
-            # For MVP, let's just write to a temp file and move it.
-            tmp_nginx = f"/tmp/{project.domain}.nginx"
-            with open(tmp_nginx, 'w') as f:
-                f.write(nginx_conf)
-            
-            res = SystemService.run_command(f"sudo mv {tmp_nginx} {nginx_path} && sudo ln -sf {nginx_path} /etc/nginx/sites-enabled/", cwd=project_path)
-            if not res['success']:
-                 # If sudo fails, we just log it. This is expected on non-root or limited setups.
-                 log(f"Sudo Nginx failed (permissions?): {res['stderr']}")
+            # We will assume the user running this has passwordless sudo for these writes.
+            # Files are only rewritten when the generated content changed.
+            with profile.step('configs'):
+                log("Configuring Systemd & Nginx...")
 
-            # Ensure Gunicorn is installed (critical for the service to run)
-            # Even if it's not in requirements.txt
-            log("Ensuring Gunicorn is installed...")
-            res = SystemService.run_command(f'"{venv_bin / "pip"}" install gunicorn', cwd=project_path)
-            
-            # Systemd Service
-            service_conf = ConfigGenerator.generate_gunicorn_service(project, venv_path, project_path)
-            service_name = f"{project.name}_gunicorn.service"
-            tmp_service = f"/tmp/{service_name}"
-            with open(tmp_service, 'w') as f:
-                f.write(service_conf)
-            
-            res = SystemService.run_command(f"sudo mv {tmp_service} /etc/systemd/system/{service_name} && sudo systemctl daemon-reload && sudo systemctl enable {service_name} && sudo systemctl restart {service_name}", cwd=project_path)
-            
-            # Verify Service Status
-            res = SystemService.run_command(f"sudo systemctl is-active {service_name}")
-            if not res['success']:
-                log(f"Service failed to start. Logs:")
-                # Fetch recent logs for this service
-                log_res = SystemService.run_command(f"sudo journalctl -u {service_name} --no-pager -n 20")
-                log(log_res['stdout'])
-                raise Exception("Gunicorn Application Service failed to start.")
-             
-            # Restart Nginx
-            # Verify config first
-            res = SystemService.run_command("sudo nginx -t")
-            if not res['success']:
-                log(f"Nginx config syntax error: {res['stderr']}")
-                raise Exception(f"Generated Nginx config is invalid: {res['stderr']}")
+                # Write Nginx
+                nginx_conf = ConfigGenerator.generate_nginx_config(project)
+                nginx_path = f"/etc/nginx/sites-available/{project.domain}"
+                nginx_changed, res = ConfigReconciler.apply(nginx_path, nginx_conf)
+                if res['success']:
+                    linked, res = ConfigReconciler.link(f"/etc/nginx/sites-enabled/{project.domain}", nginx_path)
+                    nginx_changed = nginx_changed or linked
+                if not res['success']:
+                     # If sudo fails, we just log it. This is expected on non-root or limited setups.
+                     log(f"Sudo Nginx failed (permissions?): {res['stderr']}")
+                log("Nginx config updated." if nginx_changed else "Nginx config unchanged.")
 
-            res = SystemService.run_command("sudo systemctl restart nginx")
-            if not res['success']:
-                log(f"Nginx failed to reload: {res['stderr']}")
-                raise Exception(f"Nginx restart failed. Check system logs.")
+                # Systemd Service (always runs whatever `current` points at)
+                service_conf = ConfigGenerator.generate_gunicorn_service(project, current_path / "venv", current_path)
+                service_name = cls.service_name(project)
+                socket_name = cls.socket_name(project)
+                unit_changed, res = ConfigReconciler.apply(f"/etc/systemd/system/{service_name}", service_conf)
+                if not res['success']:
+                    log(f"Sudo Systemd failed (permissions?): {res['stderr']}")
+                if project.bind_mode == 'socket_activated':
+                    socket_changed, res = ConfigReconciler.apply(
+                        f"/etc/systemd/system/{socket_name}", ConfigGenerator.generate_gunicorn_socket(project)
+                    )
+                else:
+                    # Leaving socket activation: the socket unit must go (if it was ever installed)
+                    socket_path = f"/etc/systemd/system/{socket_name}"
+                    socket_changed = False
+                    if os.path.lexists(socket_path):
+                        SystemService.run_command(f"sudo systemctl disable --now {socket_name}")
+                        socket_changed = ConfigReconciler.remove(socket_path)
+                if unit_changed or socket_changed:
+                    log("Systemd units updated.")
+                    ConfigReconciler.daemon_reload()
+                    if project.bind_mode == 'socket_activated':
+                        # The socket is what starts at boot; the service starts on demand
+                        SystemService.run_command(f"sudo systemctl disable {service_name}")
+                        SystemService.run_command(f"sudo systemctl enable --now {socket_name}")
+                    else:
+                        SystemService.run_command(f"sudo systemctl enable {service_name}")
 
+            # 7. Go live: switch `current`, then reload Gunicorn gracefully
+            with profile.step('switch'):
+                previous_release = ReleaseService.current_release(project)
+                ReleaseService.switch(project, release)
+                switched = True
+                log(f"Switched current -> releases/{release}.")
+
+                venv_changed = ReleaseService.venv_of(project, previous_release) != venv_path.resolve()
+                # With --preload the master holds the old code, so a HUP isn't enough
+                restart = unit_changed or venv_changed or project.gunicorn_preload
+                if not cls.reload_service(project, restart=restart, log=log):
+                    log("Service failed to start. Logs:")
+                    # Fetch recent logs for this service
+                    log_res = SystemService.run_command(f"sudo journalctl -u {service_name} --no-pager -n 20")
+                    log(log_res['stdout'])
+                    if previous_release and (ReleaseService.releases_dir(project) / previous_release).exists():
+                        log(f"Switching back to release {previous_release}...")
+                        ReleaseService.switch(project, previous_release)
+                        cls.reload_service(project, restart=venv_changed, log=log)
+                        switched = False
+                    raise Exception("Gunicorn Application Service failed to start.")
+             
+            # Reload Nginx (config test + graceful reload, shared with concurrent deploys)
+            if nginx_changed:
+                with profile.step('nginx_reload'):
+                    log("Reloading Nginx...")
+                    res = ConfigReconciler.reload_nginx()
+                    if not res['success']:
+                        log(f"Nginx failed to reload: {res['stderr']}")
+                        raise Exception(f"Nginx reload failed (invalid config?): {res['stderr']}")
+            else:
+                profile.skip('nginx_reload')
+
+            with profile.step('finalize'):
+                ReleaseService.prune(project, log)
+                # Refresh the search index in the background; it only re-reads changed files
+                SearchIndex.update_async(project)
             log("Deployment Successful!")
-            deployment.status = 'success'
-            deployment.save()
-            return True, deployment.logs
+            log.set_status('success')
+            try:
+                DeploymentArchive.run(project)
+            except Exception:
+                logger.exception("Deployment history retention failed for %s", project.name)
+            return True, log.text
 
         except Exception as e:
             msg = f"Deployment failed: {str(e)}"
             log(msg)
-            deployment.status = 'failed'
-            deployment.save()
+            if not switched and release_path is not None and release_path.exists():
+                # Never went live; don't leave a half-built release behind
+                try:
+                    ReleaseService.remove_release(project, release)
+                except Exception:
+                    pass
+            log.set_status('failed')
+            return False, msg
+
+    @classmethod
+    def reload_service(cls, project, restart=False, log=None):
+        """
+        Reloads the project's Gunicorn gracefully (HUP: new workers pick up the
+        `current` release, in-flight requests finish on the old ones). A full
+        restart is used when the unit or virtualenv changed, or the service is down.
+        Returns whether the service is active afterwards.
+        """
+        service_name = cls.service_name(project)
+        active = SystemService.run_command(f"sudo systemctl is-active {service_name}")['success']
+        if project.bind_mode == 'socket_activated' and not active:
+            # Idle socket-activated app: it will start with the new release on its next request
+            if log:
+                log("Gunicorn is idle (socket activated); it will start on the next request.")
+            return SystemService.run_command(f"sudo systemctl is-active {cls.socket_name(project)}")['success']
+        if not restart:
+            restart = not active
+        if restart:
+            if log:
+                log("Restarting Gunicorn...")
+            SystemService.run_command(f"sudo systemctl restart {service_name}")
+        else:
+            if log:
+                log("Reloading Gunicorn gracefully (HUP)...")
+            SystemService.run_command(f"sudo systemctl reload {service_name}")
+
+        # Verify Service Status
+        return SystemService.run_command(f"sudo systemctl is-active {service_name}")['success']
+
+    @classmethod
+    def rollback(cls, project, deployment):
+        """Switches `current` back to an existing release (deployment.rollback_to)."""
+        log = DeploymentLogger(deployment)
+        log.set_status('in_progress')
+        profile = DeployProfiler(deployment)
+        release = deployment.rollback_to
+        try:
+            if release not in ReleaseService.list_releases(project):
+                raise Exception(f"Release {release} no longer exists.")
+            if ReleaseService.venv_of(project, release) is None:
+                raise Exception(f"Release {release} has no virtual environment to run with.")
+            with profile.step('switch'):
+                previous_release = ReleaseService.current_release(project)
+                log(f"Rolling back {project.name} from release {previous_release} to {release}...")
+                ReleaseService.switch(project, release)
+                deployment.release = release
+                deployment.commit = project.deployments.filter(release=release).exclude(commit='').values_list('commit', flat=True).first() or ''
+                deployment.save(update_fields=['release', 'commit'])
+
+                venv_changed = ReleaseService.venv_of(project, previous_release) != ReleaseService.venv_of(project, release)
+                if not cls.reload_service(project, restart=venv_changed or project.gunicorn_preload, log=log):
+                    raise Exception("Gunicorn Application Service failed to start.")
+            log("Rollback Successful!")
+            log.set_status('success')
+            return True, log.text
+        except Exception as e:
+            msg = f"Rollback failed: {str(e)}"
+            log(msg)
+            log.set_status('failed')
             return False, msg
 
     @classmethod
@@ -222,41 +1635,770 @@ class DeployService:
         """Removes project files and system configurations."""
         try:
             # 1. Stop and Remove Systemd Service
-            service_name = f"{project.name}_gunicorn.service"
-            SystemService.run_command(f"sudo systemctl stop {service_name}")
-            SystemService.run_command(f"sudo systemctl disable {service_name}")
-            SystemService.run_command(f"sudo rm /etc/systemd/system/{service_name}")
+            service_name = cls.service_name(project)
+            socket_name = cls.socket_name(project)
+            SystemService.run_command(f"sudo systemctl stop {socket_name} {service_name}")
+            SystemService.run_command(f"sudo systemctl disable {socket_name} {service_name}")
+            unit_removed = ConfigReconciler.remove(f"/etc/systemd/system/{service_name}")
+            unit_removed = ConfigReconciler.remove(f"/etc/systemd/system/{socket_name}") or unit_removed
             
             # 2. Remove Nginx Config
-            nginx_path = f"/etc/nginx/sites-available/{project.domain}"
-            SystemService.run_command(f"sudo rm {nginx_path}")
-            SystemService.run_command(f"sudo rm /etc/nginx/sites-enabled/{project.domain}")
+            nginx_removed = ConfigReconciler.remove(f"/etc/nginx/sites-enabled/{project.domain}")
+            nginx_removed = ConfigReconciler.remove(f"/etc/nginx/sites-available/{project.domain}") or nginx_removed
             
-            # 3. Reload Daemons
-            SystemService.run_command("sudo systemctl daemon-reload")
-            SystemService.run_command("sudo systemctl restart nginx")
+            # 3. Reload Daemons (only what changed)
+            if unit_removed:
+                ConfigReconciler.daemon_reload()
+            if nginx_removed:
+                ConfigReconciler.reload_nginx()
             
-            # 4. Remove Files
-            # Helper for Windows read-only git files
-            def on_rm_error(func, path, exc_info):
-                import stat
-                # Make writable and try again
-                os.chmod(path, stat.S_IWRITE)
-                func(path)
-
+            # 4. Remove Files (releases, shared data, venvs)
             project_path = cls.BASE_DIR / project.name
             if project_path.exists():
-                shutil.rmtree(project_path, onerror=on_rm_error)
+                shutil.rmtree(project_path, onerror=_on_rm_error)
+            GitService.prune(project)
+            SearchIndex.remove(project)
                 
             return True, "Project removed successfully."
         except Exception as e:
             return False, str(e)
 
+class DeploymentQueue:
+    """
+    DB-backed deployment queue drained by a pool of worker threads.
+
+    Pending Deployment rows are the queue. Jobs are claimed with a single
+    conditional UPDATE that checks the project has nothing in progress and
+    that fewer than PANEL_DEPLOY_CONCURRENCY jobs run globally, so several
+    dispatchers can drain the same queue safely. Jobs run in the
+    deploy_worker command; web processes only queue them (unless
+    PANEL_DEPLOY_IN_WEB_PROCESS is set, e.g. for runserver).
+
+    A dispatcher renews the heartbeat of the jobs it runs on every poll; a
+    job whose heartbeat is older than PANEL_DEPLOY_LEASE_SECONDS belongs to
+    a dead process and is requeued by whichever dispatcher notices first.
+    """
+    _lock = threading.Lock()
+    _wakeup = threading.Event()
+    _dispatcher = None
+    _executor = None
+    _running = 0
+    _active = set()
+
+    @staticmethod
+    def worker_id():
+        import socket
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @classmethod
+    def enqueue(cls, project, force_full=False):
+        """
+        Queues a deployment for `project` and returns (deployment, created).
+
+        A project never has more than one pending deployment: requesting
+        another while one is still waiting returns the queued one (upgraded
+        to a full deploy if `force_full` is set). The check and the insert
+        run in one transaction holding the project row lock (SQLite takes its
+        write lock up front), so concurrent requests can't both create one.
+        """
+        from django.db import transaction
+        from .models import Deployment, Project
+        with transaction.atomic():
+            Project.objects.select_for_update().filter(id=project.id).first()
+            deployment = project.deployments.filter(status='pending', rollback_to='').order_by('created_at').first()
+            created = deployment is None
+            if created:
+                deployment = Deployment.objects.create(project=project, status='pending', force_full=force_full)
+            elif force_full and not deployment.force_full:
+                deployment.force_full = True
+                Deployment.objects.filter(id=deployment.id).update(force_full=True)
+        if created:
+            DashboardService.invalidate()
+        cls.notify()
+        return deployment, created
+
+    @classmethod
+    def enqueue_rollback(cls, project, release):
+        """Queues a switch of `current` back to releases/<release>."""
+        from .models import Deployment
+        deployment = Deployment.objects.create(project=project, status='pending', rollback_to=release)
+        DashboardService.invalidate()
+        cls.notify()
+        return deployment
+
+    @classmethod
+    def notify(cls):
+        """
+        Called after queueing a job. The deploy worker picks it up on its next
+        poll; only with PANEL_DEPLOY_IN_WEB_PROCESS does this process run it.
+        """
+        if getattr(settings, 'PANEL_DEPLOY_IN_WEB_PROCESS', False):
+            cls.ensure_started()
+
+    @classmethod
+    def ensure_started(cls):
+        """Starts this process' dispatcher thread if it isn't running yet."""
+        with cls._lock:
+            if cls._dispatcher is None or not cls._dispatcher.is_alive():
+                from concurrent.futures import ThreadPoolExecutor
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.concurrency(), thread_name_prefix='deploy'
+                )
+                cls._dispatcher = threading.Thread(target=cls._dispatch_forever, name='deploy-dispatcher', daemon=True)
+                cls._dispatcher.start()
+        cls._wakeup.set()
+
+    @staticmethod
+    def concurrency():
+        return max(1, getattr(settings, 'PANEL_DEPLOY_CONCURRENCY', 2))
+
+    @staticmethod
+    def lease_seconds():
+        return getattr(settings, 'PANEL_DEPLOY_LEASE_SECONDS', 60)
+
+    @classmethod
+    def recover_abandoned(cls):
+        """
+        Requeues jobs whose worker stopped renewing their lease.
+
+        A worker restart kills its deploy threads mid-job; once the heartbeat
+        is PANEL_DEPLOY_LEASE_SECONDS old those deployments go back to pending
+        so the queue resumes them.
+        """
+        from datetime import timedelta
+        from django.db.models import Q
+        from django.utils import timezone
+        from .models import Deployment
+        cutoff = timezone.now() - timedelta(seconds=cls.lease_seconds())
+        requeued = Deployment.objects.filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__isnull=True),
+            status='in_progress',
+        ).update(status='pending', claimed_by='', started_at=None, heartbeat_at=None)
+        if requeued:
+            logger.warning("Requeued %d deployment(s) abandoned by a dead worker.", requeued)
+            DashboardService.invalidate()
+        return requeued
+
+    @classmethod
+    def claim(cls, deployment_id):
+        """Atomically moves a pending deployment to in_progress, or returns False."""
+        from django.db.models import Count, Exists, OuterRef, Subquery, Value
+        from django.db.models.functions import Coalesce
+        from django.db.models.lookups import LessThan
+        from django.utils import timezone
+        from .models import Deployment
+
+        in_progress = Deployment.objects.filter(status='in_progress')
+        running = in_progress.order_by().values('status').annotate(n=Count('id')).values('n')
+        claimed = Deployment.objects.filter(
+            ~Exists(in_progress.filter(project=OuterRef('project'))),
+            LessThan(Coalesce(Subquery(running), Value(0)), cls.concurrency()),
+            id=deployment_id,
+            status='pending',
+        ).update(status='in_progress', claimed_by=cls.worker_id(), started_at=timezone.now(), heartbeat_at=timezone.now()) == 1
+        if claimed:
+            DashboardService.invalidate()
+        return claimed
+
+    @classmethod
+    def dispatch(cls):
+        """Claims and starts as many pending jobs as there are free workers."""
+        from .models import Deployment
+        started = 0
+        with cls._lock:
+            free = cls.concurrency() - cls._running
+        if free <= 0:
+            return 0
+        busy_projects = set(Deployment.objects.filter(status='in_progress').values_list('project_id', flat=True))
+        for deployment_id, project_id in Deployment.objects.filter(status='pending').order_by('created_at').values_list('id', 'project_id'):
+            if started >= free:
+                break
+            if project_id in busy_projects:
+                continue
+            if cls.claim(deployment_id):
+                busy_projects.add(project_id)
+                with cls._lock:
+                    cls._running += 1
+                    cls._active.add(deployment_id)
+                cls._executor.submit(cls._run_job, deployment_id)
+                started += 1
+        return started
+
+    @classmethod
+    def heartbeat(cls):
+        """Renews the lease of the jobs this process is running."""
+        from django.utils import timezone
+        from .models import Deployment
+        with cls._lock:
+            active = list(cls._active)
+        if active:
+            Deployment.objects.filter(id__in=active, status='in_progress', claimed_by=cls.worker_id()).update(
+                heartbeat_at=timezone.now()
+            )
+
+    @classmethod
+    def _run_job(cls, deployment_id):
+        from django.db import connection
+        from .models import Deployment
+        try:
+            deployment = Deployment.objects.select_related('project').defer('legacy_logs').get(id=deployment_id)
+            if deployment.rollback_to:
+                DeployService.rollback(deployment.project, deployment)
+            else:
+                DeployService.deploy(deployment.project, deployment)
+        except Exception as e:
+            Deployment.objects.filter(id=deployment_id, status='in_progress').update(status='failed')
+            DashboardService.invalidate()
+            logger.exception("Deployment %s crashed: %s", deployment_id, e)
+        finally:
+            connection.close()
+            with cls._lock:
+                cls._running -= 1
+                cls._active.discard(deployment_id)
+            cls._wakeup.set()
+
+    @classmethod
+    def _dispatch_forever(cls):
+        from django.db import close_old_connections
+        poll_interval = getattr(settings, 'PANEL_DEPLOY_QUEUE_POLL_SECONDS', 5)
+        while True:
+            try:
+                close_old_connections()
+                cls.heartbeat()
+                cls.recover_abandoned()
+                # Finished jobs may let fleet rollouts queue their next projects
+                FleetService.advance_running()
+                cls.dispatch()
+            except Exception as e:
+                # e.g. a locked database; try again on the next tick
+                logger.warning("Deployment queue dispatch failed: %s", e)
+            cls._wakeup.wait(timeout=poll_interval)
+            cls._wakeup.clear()
+
+class FleetService:
+    """
+    Deploys many projects as one rollout (FleetRollout / RolloutTarget).
+
+    Targets run canaries first: until every canary succeeded nothing else
+    is queued, and a failed canary halts the rollout. After that at most
+    `parallelism` targets are queued or running at once, and the rollout
+    halts as soon as more than `max_failure_rate` of its finished deploys
+    failed. Each target is an ordinary queued deployment, so the work is
+    done by DeployService.deploy through DeploymentQueue (whose global
+    PANEL_DEPLOY_CONCURRENCY limit still applies).
+
+    advance() is idempotent and driven by the queue dispatchers: every
+    finished job wakes them up and they move running rollouts along.
+    """
+    FINISHED = ('success', 'failed')
+
+    @staticmethod
+    def parallelism():
+        return max(1, getattr(settings, 'PANEL_FLEET_PARALLELISM', DeploymentQueue.concurrency()))
+
+    @staticmethod
+    def canaries():
+        return getattr(settings, 'PANEL_FLEET_CANARIES', 1)
+
+    @staticmethod
+    def max_failure_rate():
+        return getattr(settings, 'PANEL_FLEET_MAX_FAILURE_RATE', 0.2)
+
+    @staticmethod
+    def select(all_projects=False, tag=None, match=None, names=None):
+        """
+        Returns (projects, selection description, error). Criteria combine:
+        an explicit name list, plus a tag and/or a shell-style name pattern.
+        """
+        from fnmatch import fnmatch
+        from .models import Project
+        names = [n for n in (names or []) if n]
+        if not (all_projects or tag or match or names):
+            return [], '', "Choose all projects, a tag, a name pattern or a list of projects."
+        projects = list(Project.objects.order_by('name'))
+        if names:
+            known = {p.name for p in projects}
+            missing = [n for n in names if n not in known]
+            if missing:
+                return [], '', f"Unknown project(s): {', '.join(missing)}."
+            projects = [p for p in projects if p.name in names]
+        if tag:
+            projects = [p for p in projects if tag in p.tags.replace(',', ' ').split()]
+        if match:
+            projects = [p for p in projects if fnmatch(p.name, match)]
+        selection = " ".join(filter(None, [
+            "all" if all_projects and not (tag or match or names) else "",
+            f"tag:{tag}" if tag else "",
+            f"match:{match}" if match else "",
+            ",".join(names),
+        ]))
+        if not projects:
+            return [], selection, "No projects match."
+        return projects, selection, None
+
+    @classmethod
+    def start(cls, projects, selection, canaries=None, canary_names=None, parallelism=None, max_failure_rate=None, full=False):
+        """
+        Creates a rollout over `projects` and queues its first deployments.
+
+        Canaries are the projects named in `canary_names`, otherwise the
+        first `canaries` projects.
+        """
+        from .models import FleetRollout, RolloutTarget
+        canary_names = set(canary_names or [])
+        if canary_names:
+            canary_ids = {p.id for p in projects if p.name in canary_names}
+        else:
+            count = cls.canaries() if canaries is None else canaries
+            canary_ids = {p.id for p in projects[:count]}
+        ordered = [p for p in projects if p.id in canary_ids] + [p for p in projects if p.id not in canary_ids]
+
+        rollout = FleetRollout.objects.create(
+            selection=selection[:300],
+            parallelism=parallelism or cls.parallelism(),
+            max_failure_rate=cls.max_failure_rate() if max_failure_rate is None else max_failure_rate,
+            full=full,
+        )
+        RolloutTarget.objects.bulk_create(
+            RolloutTarget(rollout=rollout, project=project, position=i, canary=project.id in canary_ids)
+            for i, project in enumerate(ordered)
+        )
+        cls.advance(rollout.id)
+        return rollout
+
+    @staticmethod
+    def _state(target):
+        if target.deployment_id is None:
+            return 'skipped' if target.skipped else 'waiting'
+        return target.deployment.status
+
+    @classmethod
+    def advance(cls, rollout_id):
+        """Queues the next targets of a running rollout, or halts / completes it."""
+        from django.db import transaction
+        from django.utils import timezone
+        from .models import FleetRollout
+
+        with transaction.atomic():
+            rollout = FleetRollout.objects.select_for_update().filter(id=rollout_id, status='running').first()
+            if rollout is None:
+                return
+            targets = list(
+                rollout.targets.select_related('project', 'deployment')
+                .defer('deployment__legacy_logs', 'deployment__archived_logs', 'deployment__fingerprints')
+            )
+            states = [cls._state(t) for t in targets]
+            finished = sum(1 for s in states if s in cls.FINISHED)
+            failed = states.count('failed')
+            in_flight = sum(1 for s in states if s in ('pending', 'in_progress'))
+
+            reason = ''
+            failed_canary = next((t for t, s in zip(targets, states) if t.canary and s == 'failed'), None)
+            if failed_canary:
+                reason = f"Canary {failed_canary.project.name} failed."
+            elif finished and failed / finished > rollout.max_failure_rate:
+                reason = f"{failed} of {finished} finished deploys failed (limit {rollout.max_failure_rate:.0%})."
+            if reason:
+                cls._stop(rollout, 'halted', reason)
+                return
+
+            canaries_done = all(s == 'success' for t, s in zip(targets, states) if t.canary)
+            free = rollout.parallelism - in_flight
+            for target, state in zip(targets, states):
+                if free <= 0:
+                    break
+                if state != 'waiting' or (not target.canary and not canaries_done):
+                    continue
+                target.deployment, _ = DeploymentQueue.enqueue(target.project, force_full=rollout.full)
+                target.save(update_fields=['deployment'])
+                in_flight += 1
+                free -= 1
+
+            if in_flight == 0 and 'waiting' not in states:
+                rollout.status = 'completed'
+                rollout.finished_at = timezone.now()
+                rollout.reason = f"{failed} of {finished} deploys failed." if failed else ''
+                rollout.save(update_fields=['status', 'finished_at', 'reason'])
+
+    @classmethod
+    def _stop(cls, rollout, status, reason):
+        """Skips the targets not queued yet; deploys already running finish on their own."""
+        from django.utils import timezone
+        rollout.targets.filter(deployment__isnull=True).update(skipped=True)
+        rollout.status = status
+        rollout.reason = reason
+        rollout.finished_at = timezone.now()
+        rollout.save(update_fields=['status', 'reason', 'finished_at'])
+
+    @classmethod
+    def cancel(cls, rollout):
+        from django.db import transaction
+        from .models import FleetRollout
+        with transaction.atomic():
+            locked = FleetRollout.objects.select_for_update().filter(id=rollout.id, status='running').first()
+            if locked:
+                cls._stop(locked, 'cancelled', "Cancelled.")
+
+    @classmethod
+    def advance_running(cls):
+        from .models import FleetRollout
+        for rollout_id in FleetRollout.objects.filter(status='running').values_list('id', flat=True):
+            cls.advance(rollout_id)
+
+    @classmethod
+    def progress(cls, rollout):
+        """Counts per state plus one row per target, for the fleet view and its JSON feed."""
+        targets = list(
+            rollout.targets.select_related('project', 'deployment')
+            .defer('deployment__legacy_logs', 'deployment__archived_logs', 'deployment__fingerprints')
+        )
+        counts = dict.fromkeys(('waiting', 'pending', 'in_progress', 'success', 'failed', 'skipped'), 0)
+        rows = []
+        for target in targets:
+            state = cls._state(target)
+            counts[state] += 1
+            deployment = target.deployment
+            rows.append({
+                'project': target.project.name,
+                'project_id': target.project_id,
+                'canary': target.canary,
+                'state': state,
+                'deployment_id': deployment.id if deployment else None,
+                'started_at': deployment.started_at.isoformat() if deployment and deployment.started_at else None,
+                'finished_at': deployment.finished_at.isoformat() if deployment and deployment.finished_at else None,
+            })
+        total = len(targets)
+        done = counts['success'] + counts['failed'] + counts['skipped']
+        return {
+            'id': rollout.id,
+            'status': rollout.status,
+            'status_display': rollout.get_status_display(),
+            'reason': rollout.reason,
+            'total': total,
+            'percent': round(done / total * 100) if total else 100,
+            'counts': counts,
+            'targets': rows,
+        }
+
+import zlib
+
+class DeploymentArchive:
+    """
+    Retention for deployment history.
+
+    Logs of finished deployments older than PANEL_LOG_ARCHIVE_DAYS are
+    compressed into Deployment.archived_logs and their log chunks deleted.
+    Beyond the PANEL_KEEP_DEPLOYMENTS most recent finished deployments of a
+    project, rows are deleted, except the last successful one (its
+    fingerprints drive step skipping) and those whose release is still on
+    disk (rollback targets).
+    """
+    FINISHED = ('success', 'failed')
+
+    @staticmethod
+    def archive_days():
+        return getattr(settings, 'PANEL_LOG_ARCHIVE_DAYS', 7)
+
+    @staticmethod
+    def keep():
+        return getattr(settings, 'PANEL_KEEP_DEPLOYMENTS', 50)
+
+    @staticmethod
+    def archive(deployment):
+        """Compresses one deployment's log; returns (original, compressed) sizes."""
+        from django.db import transaction
+        from django.utils import timezone
+        from .models import Deployment
+
+        text = deployment.logs.encode('utf-8')
+        blob = zlib.compress(text, 9)
+        with transaction.atomic():
+            Deployment.objects.filter(id=deployment.id).update(
+                archived_logs=blob, legacy_logs='', logs_archived_at=timezone.now()
+            )
+            deployment.log_chunks.all().delete()
+        return len(text), len(blob)
+
+    @classmethod
+    def archive_old(cls, project=None, days=None, dry_run=False):
+        """Archives old finished logs; returns (count, original bytes, compressed bytes)."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import Deployment
+
+        days = cls.archive_days() if days is None else days
+        qs = Deployment.objects.filter(
+            status__in=cls.FINISHED,
+            logs_archived_at__isnull=True,
+            created_at__lt=timezone.now() - timedelta(days=days),
+        ).only('id', 'legacy_logs', 'archived_logs').prefetch_related('log_chunks')
+        if project is not None:
+            qs = qs.filter(project=project)
+        if dry_run:
+            return qs.count(), 0, 0
+        count = original = compressed = 0
+        for deployment in qs.iterator(chunk_size=100):
+            before, after = cls.archive(deployment)
+            count += 1
+            original += before
+            compressed += after
+        return count, original, compressed
+
+    @classmethod
+    def prune(cls, project, keep=None, dry_run=False):
+        """Deletes a project's finished deployments beyond `keep`; returns how many."""
+        keep = cls.keep() if keep is None else keep
+        finished = project.deployments.filter(status__in=cls.FINISHED)
+        kept = set(finished.order_by('-created_at').values_list('id', flat=True)[:keep])
+        last_success = finished.filter(status='success').order_by('-created_at').values_list('id', flat=True).first()
+        if last_success:
+            kept.add(last_success)
+        stale = finished.exclude(id__in=kept).exclude(release__in=ReleaseService.list_releases(project))
+        if dry_run:
+            return stale.count()
+        deleted = 0
+        ids = list(stale.values_list('id', flat=True))
+        for start in range(0, len(ids), 500):
+            # Deletes cascade to the log chunks
+            deleted += project.deployments.filter(id__in=ids[start:start + 500]).delete()[1].get('panel.Deployment', 0)
+        if deleted:
+            DashboardService.invalidate()
+        return deleted
+
+    @classmethod
+    def run(cls, project=None, days=None, keep=None, dry_run=False):
+        """Archives and prunes one project, or all of them."""
+        from .models import Project
+
+        archived, original, compressed = cls.archive_old(project, days, dry_run)
+        projects = [project] if project is not None else Project.objects.only('id', 'name')
+        pruned = sum(cls.prune(p, keep, dry_run) for p in projects)
+        return {'archived': archived, 'original_bytes': original, 'compressed_bytes': compressed, 'pruned': pruned}
+
+class DashboardService:
+    """
+    Dashboard listing: one query per page, cached for a few seconds.
+
+    Each project is annotated with its latest deployment's status and time
+    through a subquery (no per-project queries, no deployment rows or logs
+    loaded). Pages are cached under a version number that is bumped
+    whenever a project or deployment changes state, so a change shows up on
+    the next request; the TTL only bounds staleness for writers that bypass
+    invalidate().
+    """
+    VERSION_KEY = 'panel:dashboard:version'
+    FIELDS = ('id', 'name', 'domain', 'bind_mode', 'port', 'is_active', 'created_at')
+
+    @staticmethod
+    def page_size():
+        return getattr(settings, 'PANEL_DASHBOARD_PAGE_SIZE', 24)
+
+    @staticmethod
+    def ttl():
+        return getattr(settings, 'PANEL_DASHBOARD_CACHE_SECONDS', 10)
+
+    @classmethod
+    def queryset(cls):
+        from django.db.models import OuterRef, Subquery
+        from .models import Deployment, Project
+
+        latest = Deployment.objects.filter(project=OuterRef('pk')).order_by('-created_at')
+        return Project.objects.only(*cls.FIELDS).annotate(
+            latest_status=Subquery(latest.values('status')[:1]),
+            latest_deployed_at=Subquery(latest.values('created_at')[:1]),
+        ).order_by('-created_at')
+
+    @classmethod
+    def page(cls, number=1):
+        """Returns {'projects', 'number', 'num_pages', 'count'} for a dashboard page."""
+        from django.core.cache import cache
+        from django.core.paginator import Paginator
+
+        version = cache.get_or_set(cls.VERSION_KEY, 1, None)
+        # Validate `number` (raw ?page= input) before it goes into a cache key,
+        # so junk or out-of-range values all share the page they resolve to
+        paginator = Paginator(cls.queryset(), cls.page_size())
+        paginator.count = cache.get_or_set(
+            f"panel:dashboard:{version}:count", lambda: cls.queryset().count(), cls.ttl()
+        )
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        number = min(max(number, 1), paginator.num_pages)
+        key = f"panel:dashboard:{version}:{number}"
+        data = cache.get(key)
+        if data is None:
+            page = paginator.page(number)
+            data = {
+                'projects': list(page.object_list),
+                'number': page.number,
+                'num_pages': page.paginator.num_pages,
+                'count': page.paginator.count,
+            }
+            cache.set(key, data, cls.ttl())
+        return data
+
+    @classmethod
+    def invalidate(cls):
+        from django.core.cache import cache
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, 1, None)
+
+import heapq
+import codecs
+import hashlib
+import stat
+import tempfile
+import mmap
+from array import array
+from collections import OrderedDict
+
+class LineIndex:
+    """
+    Sparse line-offset index of a text file: the byte offset of every
+    STRIDE-th line, built by scanning an mmap of the file (nothing is read
+    into a Python string). When an append-only file such as a log grows, the
+    index is extended from where it stopped instead of being rebuilt.
+    """
+    STRIDE = 1024
+    CACHE_SIZE = 32
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    _path_locks = {}
+
+    def __init__(self, path):
+        self.path = path
+        self.checkpoints = array('Q', [0])
+        self.newlines = 0
+        self.size = 0
+        self.ends_with_newline = False
+        self.mtime = None
+        self.inode = None
+
+    @classmethod
+    def get(cls, path):
+        """
+        Returns an up-to-date index for `path`, reusing the cached one when possible.
+
+        Scanning happens under a lock of its own path only; the class-wide
+        lock just guards the cache, so indexing a huge file does not hold up
+        viewers of other files.
+        """
+        key = str(path)
+        with cls._lock:
+            path_lock = cls._path_locks.setdefault(key, threading.Lock())
+        with path_lock:
+            st = os.stat(path)
+            with cls._lock:
+                index = cls._cache.get(key)
+            if index is None or index.inode != st.st_ino or st.st_size < index.size:
+                # New, replaced or truncated file: start over
+                index = cls(path)
+            if (index.size, index.mtime) != (st.st_size, st.st_mtime):
+                index._extend(st)
+            with cls._lock:
+                cls._cache[key] = index
+                cls._cache.move_to_end(key)
+                while len(cls._cache) > cls.CACHE_SIZE:
+                    evicted, _ = cls._cache.popitem(last=False)
+                    lock = cls._path_locks.get(evicted)
+                    if lock is not None and not lock.locked():
+                        del cls._path_locks[evicted]
+            return index
+
+    def _extend(self, st):
+        if st.st_size > self.size:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                size = min(st.st_size, len(mm))
+                pos = mm.find(b'\n', self.size, size)
+                while pos != -1:
+                    self.newlines += 1
+                    if self.newlines % self.STRIDE == 0:
+                        self.checkpoints.append(pos + 1)
+                    pos = mm.find(b'\n', pos + 1, size)
+                self.size = size
+                self.ends_with_newline = mm[size - 1] == 10
+        self.mtime = st.st_mtime
+        self.inode = st.st_ino
+
+    @property
+    def total_lines(self):
+        # A last line without a trailing newline still counts
+        return self.newlines + (1 if self.size and not self.ends_with_newline else 0)
+
+    def read(self, start, count, max_bytes):
+        """
+        Returns up to `count` lines from line `start` (0-based) as
+        (lines, truncated); reading stops after `max_bytes`, so one huge
+        line cannot exhaust memory.
+        """
+        lines = []
+        if not self.size or start >= self.total_lines:
+            return lines, False
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = min(self.size, len(mm))
+            offset = self.checkpoints[min(start // self.STRIDE, len(self.checkpoints) - 1)]
+            skip = start - (start // self.STRIDE) * self.STRIDE
+            for _ in range(skip):
+                offset = mm.find(b'\n', offset, size) + 1
+            budget = max_bytes
+            while len(lines) < count and offset < size:
+                end = mm.find(b'\n', offset, size)
+                end = size if end == -1 else end
+                if end - offset > budget:
+                    lines.append(mm[offset:offset + budget].decode('utf-8', 'replace'))
+                    return lines, True
+                lines.append(mm[offset:end].decode('utf-8', 'replace'))
+                budget -= end - offset + 1
+                offset = end + 1
+        return lines, False
+
 class FileService:
+    SORT_KEYS = ('name', 'size', 'mtime')
+    CONFLICT = "The file was changed on disk since it was opened."
+    _save_locks = {}
+    _save_locks_guard = threading.Lock()
+
+    @staticmethod
+    def page_size():
+        return getattr(settings, 'PANEL_FILE_PAGE_SIZE', 200)
+
+    @staticmethod
+    def _scan(target_dir, prefix):
+        """
+        Yields one dict per directory entry.
+
+        os.scandir hands back type info from the directory read itself, and
+        DirEntry.stat() is cached, so each entry costs at most one stat call.
+        """
+        with os.scandir(target_dir) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                    st = entry.stat()
+                    size, mtime = (0 if is_dir else st.st_size), st.st_mtime
+                except OSError:
+                    # Broken symlink or entry vanished while listing
+                    is_dir, size, mtime = False, 0, 0
+                yield {
+                    'name': entry.name,
+                    'path': f"{prefix}{entry.name}",
+                    'is_dir': is_dir,
+                    'size': size,
+                    'mtime': mtime,
+                }
+
     @staticmethod
-    def list_files(project, subpath=''):
+    def list_files(project, subpath='', sort='name', desc=False, offset=0, limit=None):
         """
-        Lists files in a project directory safely.
+        Lists one page of a project directory safely.
+
+        Directories always come first, then entries are ordered by `sort`
+        (name, size or mtime). Returns ({'items', 'total', 'next_offset'}, error);
+        next_offset is None on the last page.
         """
         base_dir = DeployService.BASE_DIR / project.name
         target_dir = (base_dir / subpath).resolve()
@@ -270,66 +2412,543 @@ class FileService:
             
         if not target_dir.is_dir():
             return None, "Path is not a directory"
-            
-        items = []
-        try:
-            for item in target_dir.iterdir():
-                items.append({
-                    'name': item.name,
-                    'path': str(item.relative_to(base_dir)).replace('\\', '/'),
-                    'is_dir': item.is_dir(),
-                    'size': item.stat().st_size if item.is_file() else 0,
-                })
-            
-            # Sort: directories first, then files
-            items.sort(key=lambda x: (not x['is_dir'], x['name'].lower()))
-            return items, None
+
+        if sort not in FileService.SORT_KEYS:
+            sort = 'name'
+        offset = max(int(offset or 0), 0)
+        limit = max(int(limit or FileService.page_size()), 1)
+        rel = target_dir.relative_to(base_dir.resolve()).as_posix()
+        prefix = '' if rel == '.' else f"{rel}/"
+
+        if sort == 'name':
+            value = lambda x: x['name'].lower()
+        else:
+            value = lambda x: x[sort]
+
+        try:
+            entries = list(FileService._scan(target_dir, prefix))
+            # Only the entries up to the requested page need ordering
+            wanted = offset + limit
+            if desc:
+                ordered = heapq.nlargest(wanted, entries, key=lambda x: (x['is_dir'], value(x)))
+            else:
+                ordered = heapq.nsmallest(wanted, entries, key=lambda x: (not x['is_dir'], value(x)))
+            items = ordered[offset:wanted]
+            total = len(entries)
+            return {
+                'items': items,
+                'total': total,
+                'next_offset': wanted if wanted < total else None,
+            }, None
         except Exception as e:
             return None, str(e)
 
     @staticmethod
-    def read_file(project, subpath):
-        """Reads file content."""
+    def resolve_file(project, subpath):
+        """Returns (path, error) for a regular file inside the project directory."""
         base_dir = DeployService.BASE_DIR / project.name
         target_file = (base_dir / subpath).resolve()
-        
+
         if not str(target_file).startswith(str(base_dir.resolve())):
             return None, "Access denied."
-            
+
         if not target_file.exists() or not target_file.is_file():
             return None, "File not found."
+
+        return target_file, None
+
+    @staticmethod
+    def is_binary(path, block_size=8192):
+        """Sniffs the first block: NUL bytes or invalid UTF-8 mean binary."""
+        with open(path, 'rb') as f:
+            block = f.read(block_size)
+        if b'\0' in block:
+            return True
+        try:
+            # Incremental decode tolerates a multi-byte character cut at the block end
+            codecs.getincrementaldecoder('utf-8')().decode(block, final=False)
+        except UnicodeDecodeError:
+            return True
+        return False
+
+    @staticmethod
+    def editor_max_bytes():
+        return getattr(settings, 'PANEL_EDITOR_MAX_KB', 1024) * 1024
+
+    @classmethod
+    def inspect(cls, project, subpath):
+        """
+        Returns ({'size', 'binary', 'editable'}, error). Files above
+        PANEL_EDITOR_MAX_KB or binary files are not editable and are shown
+        in the ranged viewer instead.
+        """
+        target_file, error = cls.resolve_file(project, subpath)
+        if error:
+            return None, error
+        try:
+            size = target_file.stat().st_size
+            binary = cls.is_binary(target_file)
+        except OSError as e:
+            return None, str(e)
+        return {
+            'size': size,
+            'binary': binary,
+            'editable': not binary and size <= cls.editor_max_bytes(),
+        }, None
+
+    @classmethod
+    def read_file(cls, project, subpath):
+        """Reads file content (for the editor; large and binary files are refused)."""
+        info, error = cls.inspect(project, subpath)
+        if error:
+            return None, error
+        if info['binary']:
+            return None, "Binary file detected. Cannot edit."
+        if not info['editable']:
+            return None, "File is too large to edit."
             
         try:
-            with open(target_file, 'r', encoding='utf-8') as f:
+            # newline='' keeps CRLF files byte-identical, so versions match the file on disk
+            with open(cls.resolve_file(project, subpath)[0], 'r', encoding='utf-8', newline='') as f:
                 return f.read(), None
         except UnicodeDecodeError:
             return None, "Binary file detected. Cannot edit."
         except Exception as e:
             return None, str(e)
 
+    @classmethod
+    def read_lines(cls, project, subpath, start=0, count=500):
+        """
+        Returns ({'lines', 'start', 'total_lines', 'size', 'truncated'}, error)
+        for a window of a text file of any size.
+        """
+        target_file, error = cls.resolve_file(project, subpath)
+        if error:
+            return None, error
+        max_bytes = getattr(settings, 'PANEL_VIEWER_PAGE_KB', 256) * 1024
+        try:
+            if cls.is_binary(target_file):
+                return None, "Binary file detected."
+            index = LineIndex.get(target_file)
+            start = max(int(start), 0)
+            lines, truncated = index.read(start, min(max(int(count), 1), 5000), max_bytes)
+        except (OSError, ValueError) as e:
+            return None, str(e)
+        return {
+            'lines': lines,
+            'start': start,
+            'total_lines': index.total_lines,
+            'size': index.size,
+            'truncated': truncated,
+        }, None
+
+    @classmethod
+    def tail(cls, project, subpath, offset=None):
+        """
+        "tail -f" for growing files: returns ({'text', 'offset', 'reset'}, error)
+        with what was appended since `offset`. Without an offset (or when the
+        file was truncated / rotated) it starts from the last chunk of the file.
+        """
+        target_file, error = cls.resolve_file(project, subpath)
+        if error:
+            return None, error
+        max_bytes = getattr(settings, 'PANEL_VIEWER_PAGE_KB', 256) * 1024
+        try:
+            size = target_file.stat().st_size
+            reset = offset is None or int(offset) > size
+            start = max(size - max_bytes, 0) if reset else int(offset)
+            # Never send more than one page per poll; the client catches up
+            end = min(size, start + max_bytes)
+            with open(target_file, 'rb') as f:
+                f.seek(start)
+                data = f.read(end - start)
+        except (OSError, ValueError) as e:
+            return None, str(e)
+        if reset and start > 0:
+            # Begin on a line boundary
+            data = data[data.find(b'\n') + 1:]
+        # Hold back a trailing partial line until it is complete
+        cut = data.rfind(b'\n') + 1 if end == size else len(data)
+        if cut == 0:
+            cut = len(data)
+        return {
+            'text': data[:cut].decode('utf-8', 'replace'),
+            'offset': end - (len(data) - cut),
+            'reset': reset,
+        }, None
+
+    @staticmethod
+    def version(data):
+        """Version token of a file body (bytes or str), used to detect concurrent changes."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def apply_patch(text, patch):
+        """
+        Applies line hunks to `text`. The patch is a list of
+        [start, delete_count, [new lines]] against text.split('\\n'), with
+        non-overlapping hunks in ascending order. Raises ValueError when the
+        patch does not fit the text.
+        """
+        lines = text.split('\n')
+        result = []
+        position = 0
+        for hunk in patch:
+            try:
+                start, delete, insert = int(hunk[0]), int(hunk[1]), [str(line) for line in hunk[2]]
+            except (TypeError, ValueError, IndexError):
+                raise ValueError("Malformed patch.")
+            if start < position or delete < 0 or start + delete > len(lines):
+                raise ValueError("Patch does not apply.")
+            result.extend(lines[position:start])
+            result.extend(insert)
+            position = start + delete
+        result.extend(lines[position:])
+        return '\n'.join(result)
+
     @staticmethod
-    def save_file(project, subpath, content):
-        """Saves content to file."""
+    def atomic_write(path, data):
+        """
+        Replaces `path` with `data` atomically: write a temp file in the same
+        directory, fsync it, give it the original mode/owner, then rename it
+        over the target. A crash leaves either the old or the new file, never
+        a truncated one.
+        """
+        path = Path(path)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            st = None
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if st is not None:
+                os.chmod(tmp, stat.S_IMODE(st.st_mode))
+                if (st.st_uid, st.st_gid) != (os.getuid(), os.getgid()):
+                    try:
+                        os.chown(tmp, st.st_uid, st.st_gid)
+                    except PermissionError:
+                        pass
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(tmp, 0o666 & ~umask)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        # Persist the rename itself
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    @classmethod
+    def _save_lock(cls, path):
+        with cls._save_locks_guard:
+            return cls._save_locks.setdefault(str(path), threading.Lock())
+
+    @classmethod
+    def save_file(cls, project, subpath, content=None, base_version=None, patch=None):
+        """
+        Saves a file atomically. Returns (success, error, version).
+
+        With `base_version` (the version the editor loaded) the save is
+        refused when the file changed on disk in the meantime (another edit,
+        a deploy...); error is then CONFLICT. Either the full `content` or a
+        line `patch` against the base version is accepted.
+        """
         base_dir = DeployService.BASE_DIR / project.name
         target_file = (base_dir / subpath).resolve()
         
         if not str(target_file).startswith(str(base_dir.resolve())):
-            return False, "Access denied."
+            return False, "Access denied.", None
             
         try:
-            with open(target_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-            return True, None
+            with cls._save_lock(target_file):
+                try:
+                    current = target_file.read_bytes()
+                except FileNotFoundError:
+                    current = None
+                if base_version and (current is None or cls.version(current) != base_version):
+                    return False, cls.CONFLICT, None
+                if patch is not None:
+                    if current is None:
+                        return False, "File not found.", None
+                    content = cls.apply_patch(current.decode('utf-8'), patch)
+                data = content.encode('utf-8')
+                cls.atomic_write(target_file, data)
+            SearchIndex.update_path(project, subpath.strip('/'))
+            return True, None, cls.version(data)
         except Exception as e:
-            return False, str(e)
+            return False, str(e), None
+
+import sqlite3
+
+class SearchIndex:
+    """
+    Per-project filename and content search, kept in its own SQLite file
+    under PANEL_CACHE_DIR/search.
+
+    Paths and text contents live in FTS5 tables using the trigram tokenizer,
+    so any substring of three or more characters is answered from the index.
+    Updates are incremental: files whose size and mtime did not change are not
+    read again. VCS data, virtualenvs and binary files are never indexed.
+    """
+    SKIP_DIRS = {'.git', 'venv', '.venv', 'venvs', '__pycache__', 'node_modules'}
+    MIN_QUERY = 3
+    _locks = {}
+    _locks_guard = threading.Lock()
 
-class ConsoleService:
     @staticmethod
-    def run_command(project, command):
+    def path(project):
+        cache_dir = getattr(settings, 'PANEL_CACHE_DIR', Path.home() / '.djangopanel' / 'cache')
+        return Path(cache_dir) / 'search' / f"{project.id}.sqlite3"
+
+    @classmethod
+    def exists(cls, project):
+        return cls.path(project).exists()
+
+    @classmethod
+    def _lock_for(cls, project):
+        with cls._locks_guard:
+            return cls._locks.setdefault(project.id, threading.Lock())
+
+    @classmethod
+    def connect(cls, project):
+        path = cls.path(project)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                is_text INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5(path, tokenize='trigram');
+            CREATE VIRTUAL TABLE IF NOT EXISTS contents USING fts5(body, tokenize='trigram');
+        """)
+        return conn
+
+    @staticmethod
+    def roots(project):
+        """(label, directory) pairs to index; labels keep paths relative to the project root."""
+        current = ReleaseService.current_link(project)
+        if current.exists():
+            return [('current', current), ('shared', ReleaseService.shared_dir(project))]
+        return [('', ReleaseService.root(project))]
+
+    @classmethod
+    def _walk(cls, project):
+        """Yields (relative path, absolute path, stat) for every indexable file."""
+        for label, root in cls.roots(project):
+            if not root.is_dir():
+                continue
+            stack = [(str(root), f"{label}/" if label else '')]
+            while stack:
+                directory, prefix = stack.pop()
+                try:
+                    with os.scandir(directory) as it:
+                        for entry in it:
+                            if entry.name in cls.SKIP_DIRS:
+                                # Also catches the .git file of a worktree
+                                continue
+                            try:
+                                # Symlinks are not followed: shared paths are indexed once, under shared/
+                                if entry.is_dir(follow_symlinks=False):
+                                    stack.append((entry.path, f"{prefix}{entry.name}/"))
+                                elif entry.is_file(follow_symlinks=False):
+                                    yield f"{prefix}{entry.name}", entry.path, entry.stat(follow_symlinks=False)
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+
+    @staticmethod
+    def _read_text(path, size):
+        """File contents for the content index, or None for binaries and oversized files."""
+        max_bytes = getattr(settings, 'PANEL_SEARCH_MAX_FILE_KB', 1024) * 1024
+        if size > max_bytes:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read(max_bytes)
+            if b'\0' in data[:8192]:
+                return None
+            return data.decode('utf-8')
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    @classmethod
+    def _index_file(cls, conn, rel, full, st, row):
+        body = cls._read_text(full, st.st_size)
+        if row:
+            file_id = row[0]
+            conn.execute(
+                "UPDATE files SET size = ?, mtime = ?, is_text = ? WHERE id = ?",
+                (st.st_size, st.st_mtime, body is not None, file_id),
+            )
+            conn.execute("DELETE FROM contents WHERE rowid = ?", (file_id,))
+        else:
+            file_id = conn.execute(
+                "INSERT INTO files (path, size, mtime, is_text) VALUES (?, ?, ?, ?)",
+                (rel, st.st_size, st.st_mtime, body is not None),
+            ).lastrowid
+            conn.execute("INSERT INTO names (rowid, path) VALUES (?, ?)", (file_id, rel))
+        if body is not None:
+            conn.execute("INSERT INTO contents (rowid, body) VALUES (?, ?)", (file_id, body))
+
+    @staticmethod
+    def _delete(conn, file_ids):
+        for file_id in file_ids:
+            conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            conn.execute("DELETE FROM names WHERE rowid = ?", (file_id,))
+            conn.execute("DELETE FROM contents WHERE rowid = ?", (file_id,))
+
+    @classmethod
+    def update(cls, project):
+        """Brings the index in line with the project tree; returns counts of what changed."""
+        with cls._lock_for(project):
+            conn = cls.connect(project)
+            try:
+                known = {
+                    path: (file_id, size, mtime)
+                    for file_id, path, size, mtime in conn.execute("SELECT id, path, size, mtime FROM files")
+                }
+                seen = set()
+                updated = 0
+                for rel, full, st in cls._walk(project):
+                    seen.add(rel)
+                    row = known.get(rel)
+                    if row and row[1] == st.st_size and row[2] == st.st_mtime:
+                        continue
+                    cls._index_file(conn, rel, full, st, row)
+                    updated += 1
+                removed = [row[0] for path, row in known.items() if path not in seen]
+                cls._delete(conn, removed)
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)", (str(time.time()),)
+                )
+                conn.commit()
+                return {'files': len(seen), 'updated': updated, 'removed': len(removed)}
+            finally:
+                conn.close()
+
+    @classmethod
+    def update_async(cls, project):
+        def run():
+            try:
+                cls.update(project)
+            except Exception:
+                logger.exception("Search index update failed for %s", project.name)
+
+        threading.Thread(target=run, daemon=True, name=f"search-index-{project.id}").start()
+
+    @classmethod
+    def update_path(cls, project, rel):
+        """Re-indexes a single file (e.g. after an edit) if it is part of the index."""
+        if not cls.exists(project):
+            return
+        with cls._lock_for(project):
+            conn = cls.connect(project)
+            try:
+                row = conn.execute("SELECT id, size, mtime FROM files WHERE path = ?", (rel,)).fetchone()
+                if row is None:
+                    return
+                full = ReleaseService.root(project) / rel
+                try:
+                    st = os.stat(full, follow_symlinks=False)
+                except OSError:
+                    cls._delete(conn, [row[0]])
+                else:
+                    cls._index_file(conn, rel, full, st, row)
+                conn.commit()
+            finally:
+                conn.close()
+
+    @classmethod
+    def stats(cls, project):
+        """Indexed file count and last update time (epoch seconds), or None without an index."""
+        if not cls.exists(project):
+            return None
+        conn = cls.connect(project)
+        try:
+            files = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            row = conn.execute("SELECT value FROM meta WHERE key = 'updated_at'").fetchone()
+            return {'files': files, 'updated_at': float(row[0]) if row else None}
+        finally:
+            conn.close()
+
+    @classmethod
+    def search(cls, project, query, limit=50):
         """
-        Runs a command inside the project's virtual environment.
+        Returns {'files': [path, ...], 'matches': [(path, snippet), ...]}.
+
+        Snippets mark the matched text with \\x02 ... \\x03. Queries shorter
+        than MIN_QUERY only match file paths.
         """
+        query = query.strip()
+        result = {'files': [], 'matches': []}
+        if not query or not cls.exists(project):
+            return result
+        conn = cls.connect(project)
+        try:
+            if len(query) < cls.MIN_QUERY:
+                pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                rows = conn.execute(
+                    "SELECT path FROM files WHERE path LIKE ? ESCAPE '\\' ORDER BY length(path) LIMIT ?",
+                    (pattern, limit),
+                )
+                result['files'] = [path for path, in rows]
+                return result
+            # A quoted phrase is a plain substring match for the trigram tokenizer
+            phrase = '"' + query.replace('"', '""') + '"'
+            rows = conn.execute(
+                "SELECT f.path FROM names JOIN files f ON f.id = names.rowid "
+                "WHERE names MATCH ? ORDER BY length(f.path) LIMIT ?",
+                (phrase, limit),
+            )
+            result['files'] = [path for path, in rows]
+            rows = conn.execute(
+                "SELECT f.path, snippet(contents, 0, char(2), char(3), '...', 16) "
+                "FROM contents JOIN files f ON f.id = contents.rowid "
+                "WHERE contents MATCH ? LIMIT ?",
+                (phrase, limit),
+            )
+            result['matches'] = list(rows)
+            return result
+        finally:
+            conn.close()
+
+    @classmethod
+    def remove(cls, project):
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(f"{cls.path(project)}{suffix}")
+            except FileNotFoundError:
+                pass
+
+class ConsoleService:
+    @staticmethod
+    def environment(project):
+        """Returns (cwd, env) for commands run in the project's live release and virtualenv."""
         project_path = DeployService.BASE_DIR / project.name
+        if ReleaseService.current_link(project).exists():
+            project_path = ReleaseService.current_link(project)
         venv_path = project_path / "venv"
         
         # Determine OS-specific bin directory
@@ -341,6 +2960,14 @@ class ConsoleService:
         env = os.environ.copy()
         env['PATH'] = f"{str(venv_bin)}{os.pathsep}{env.get('PATH', '')}"
         env['VIRTUAL_ENV'] = str(venv_path)
+        return project_path, env
+
+    @staticmethod
+    def run_command(project, command):
+        """
+        Runs a command inside the project's virtual environment.
+        """
+        project_path, env = ConsoleService.environment(project)
         
         # Security: Prevent changing directory (basic)
         if command.strip().startswith('cd '):
@@ -383,3 +3010,827 @@ class ConsoleService:
                 'stderr': str(e),
                 'returncode': -1
             }
+
+import pty
+import fcntl
+import struct
+import termios
+import uuid
+
+class TerminalSession:
+    """
+    An interactive shell on a PTY, started in the project's live release with
+    its virtualenv on PATH. The session outlives the WebSocket that opened
+    it: output produced while nobody is attached is kept in a bounded
+    scrollback and replayed when a client attaches again.
+
+    Listeners are callables invoked from the reader thread with each chunk
+    of output (bytes), and once with None when the shell has exited.
+    """
+
+    def __init__(self, project, owner):
+        self.id = uuid.uuid4().hex
+        self.project_id = project.id
+        self.owner = owner
+        self.last_activity = time.monotonic()
+        self.exit_code = None
+        self.exited = False
+        self.listeners = set()
+        self.scrollback = deque()
+        self.scrollback_bytes = 0
+        self._lock = threading.Lock()
+
+        cwd, env = ConsoleService.environment(project)
+        env['TERM'] = 'xterm-256color'
+        shell = getattr(settings, 'PANEL_TERMINAL_SHELL', '/bin/bash')
+        # pty.fork makes the child a session leader with the PTY as its
+        # controlling terminal, so job control and Ctrl+C work as usual
+        self.pid, self.fd = pty.fork()
+        if self.pid == 0:
+            try:
+                os.chdir(cwd)
+                os.execvpe(shell, [shell, '-i'], env)
+            finally:
+                os._exit(127)
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self):
+        limit = getattr(settings, 'PANEL_TERMINAL_SCROLLBACK_KB', 256) * 1024
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError:
+                # EIO: the shell and everything it started are gone
+                data = b''
+            if not data:
+                break
+            with self._lock:
+                self.scrollback.append(data)
+                self.scrollback_bytes += len(data)
+                while self.scrollback_bytes > limit and len(self.scrollback) > 1:
+                    self.scrollback_bytes -= len(self.scrollback.popleft())
+                listeners = list(self.listeners)
+            for listener in listeners:
+                listener(data)
+
+        _, status = os.waitpid(self.pid, 0)
+        os.close(self.fd)
+        with self._lock:
+            self.exit_code = os.waitstatus_to_exitcode(status)
+            self.exited = True
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(None)
+        TerminalManager.discard(self)
+
+    def attach(self, listener):
+        """Registers a listener; returns the scrollback to replay."""
+        with self._lock:
+            self.last_activity = time.monotonic()
+            if self.exited:
+                listener(None)
+            else:
+                self.listeners.add(listener)
+            return b''.join(self.scrollback)
+
+    def detach(self, listener):
+        with self._lock:
+            self.listeners.discard(listener)
+            self.last_activity = time.monotonic()
+
+    def write(self, data):
+        self.last_activity = time.monotonic()
+        data = data.encode('utf-8')
+        while data and not self.exited:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+    def resize(self, cols, rows):
+        if self.exited or cols <= 0 or rows <= 0:
+            return
+        # The kernel sends SIGWINCH to the foreground job
+        fcntl.ioctl(self.fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+
+    def terminate(self):
+        """Hangs up the shell's process group, killing it if it does not exit."""
+        if self.exited:
+            return
+        try:
+            os.killpg(self.pid, signal.SIGHUP)
+        except ProcessLookupError:
+            return
+
+        def force():
+            if not self.exited:
+                try:
+                    os.killpg(self.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+        threading.Timer(5, force).start()
+
+
+class TerminalManager:
+    """
+    Terminal sessions of this panel process, keyed by id.
+
+    Sessions live in memory, so exactly one process may serve terminals
+    (install.sh routes /ws/ to a single-worker service). The first process
+    to open a terminal takes an exclusive lock on
+    PANEL_CACHE_DIR/terminal.lock; any other process refuses, instead of
+    silently starting a second shell or multiplying the session cap.
+
+    Each owner (logged-in user, or client address) may hold at most
+    PANEL_TERMINAL_MAX_SESSIONS sessions. A reaper thread hangs up sessions
+    that nobody has been attached to for PANEL_TERMINAL_IDLE_SECONDS.
+    """
+    _sessions = {}
+    _lock = threading.Lock()
+    _reaper = None
+    _host_lock = None
+    NOT_HOST = "Terminal sessions are served by another panel process. Route /ws/ to a single worker (see install.sh)."
+
+    @staticmethod
+    def max_sessions():
+        return getattr(settings, 'PANEL_TERMINAL_MAX_SESSIONS', 3)
+
+    @staticmethod
+    def idle_seconds():
+        return getattr(settings, 'PANEL_TERMINAL_IDLE_SECONDS', 900)
+
+    @classmethod
+    def open(cls, project, owner, session_id=None):
+        """
+        Re-attaches to `session_id` when it belongs to the same owner and
+        project, otherwise starts a new session. Returns (session, error).
+        """
+        if not cls.is_host():
+            return None, cls.NOT_HOST
+        cls.ensure_reaper()
+        with cls._lock:
+            session = cls._sessions.get(session_id) if session_id else None
+            if session and session.owner == owner and session.project_id == project.id and not session.exited:
+                return session, None
+            owned = sum(1 for s in cls._sessions.values() if s.owner == owner)
+            if owned >= cls.max_sessions():
+                return None, f"Too many open terminal sessions (limit {cls.max_sessions()}). Close one first."
+            session = TerminalSession(project, owner)
+            cls._sessions[session.id] = session
+            return session, None
+
+    @classmethod
+    def is_host(cls):
+        """Whether this process holds (or just took) the terminal host lock."""
+        with cls._lock:
+            if cls._host_lock is not None:
+                return True
+            path = Path(getattr(settings, 'PANEL_CACHE_DIR', Path.home() / '.djangopanel' / 'cache')) / 'terminal.lock'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            f = open(path, 'a+')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+            f.seek(0)
+            f.truncate()
+            f.write(f"{os.getpid()}\n")
+            f.flush()
+            cls._host_lock = f # Held until the process exits
+            return True
+
+    @classmethod
+    def discard(cls, session):
+        with cls._lock:
+            cls._sessions.pop(session.id, None)
+
+    @classmethod
+    def reap(cls):
+        now = time.monotonic()
+        with cls._lock:
+            sessions = list(cls._sessions.values())
+        for session in sessions:
+            if not session.listeners and now - session.last_activity > cls.idle_seconds():
+                logger.info("Closing idle terminal session %s", session.id)
+                session.terminate()
+
+    @classmethod
+    def ensure_reaper(cls):
+        with cls._lock:
+            if cls._reaper is not None and cls._reaper.is_alive():
+                return
+
+            def loop():
+                while True:
+                    time.sleep(max(min(cls.idle_seconds() / 4, 60), 1))
+                    try:
+                        cls.reap()
+                    except Exception:
+                        logger.exception("Terminal reaper failed")
+
+            cls._reaper = threading.Thread(target=loop, daemon=True, name='terminal-reaper')
+            cls._reaper.start()
+
+class MetricsStore:
+    """
+    Fixed-size time series of each project's Gunicorn unit, one small file
+    per project under PANEL_CACHE_DIR/metrics.
+
+    The file holds one ring buffer per resolution (RESOLUTIONS: 1s for
+    5 minutes, 1m for a day, 1h for 30 days). A sample lands in the slot of
+    its time bucket in every ring, updating that bucket's running average,
+    so rollups cost nothing extra and the file never grows. The sampler
+    process writes through mmap; web workers just read the file.
+
+    Every field keeps its own sample count, so a field missing from a
+    sample (CPU has no rate before the second reading) is left out of that
+    bucket's average and reported as None rather than averaged in as zero.
+    """
+    RESOLUTIONS = (('1s', 1, 300), ('1m', 60, 1440), ('1h', 3600, 720))
+    FIELDS = ('cpu', 'rss_mb', 'tasks', 'restarts')
+    # bucket start, then a sample count and an average per field
+    SLOT = struct.Struct('=d4I4f')
+    _maps = {}
+
+    @staticmethod
+    def root():
+        cache_dir = getattr(settings, 'PANEL_CACHE_DIR', Path.home() / '.djangopanel' / 'cache')
+        return Path(cache_dir) / 'metrics'
+
+    @classmethod
+    def path(cls, project_id):
+        return cls.root() / f"{project_id}.bin"
+
+    @classmethod
+    def _layout(cls):
+        """Yields (name, step, size, byte offset) per resolution."""
+        offset = 0
+        for name, step, size in cls.RESOLUTIONS:
+            yield name, step, size, offset
+            offset += size * cls.SLOT.size
+
+    @classmethod
+    def file_size(cls):
+        return sum(size for _, _, size in cls.RESOLUTIONS) * cls.SLOT.size
+
+    @classmethod
+    def _map(cls, project_id):
+        mm = cls._maps.get(project_id)
+        if mm is None:
+            path = cls.path(project_id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a+b') as f:
+                if os.fstat(f.fileno()).st_size != cls.file_size():
+                    # Unknown layout (or a new file): start from empty rings
+                    f.truncate(0)
+                    f.truncate(cls.file_size())
+                mm = mmap.mmap(f.fileno(), cls.file_size())
+            cls._maps[project_id] = mm
+        return mm
+
+    @classmethod
+    def record(cls, project_id, timestamp, values):
+        """Adds one sample (dict of FIELDS, missing ones are skipped) to every resolution."""
+        mm = cls._map(project_id)
+        sample = [values.get(field) for field in cls.FIELDS]
+        width = len(cls.FIELDS)
+        restarts = cls.FIELDS.index('restarts')
+        for _, step, size, base in cls._layout():
+            bucket = int(timestamp // step) * step
+            offset = base + (bucket // step % size) * cls.SLOT.size
+            slot_start, *slot = cls.SLOT.unpack_from(mm, offset)
+            counts, averages = slot[:width], slot[width:]
+            if slot_start != bucket:
+                # The ring wrapped around: this slot belonged to an older bucket
+                counts, averages = [0] * width, [0.0] * width
+            for i, value in enumerate(sample):
+                if value is None:
+                    continue
+                counts[i] += 1
+                # A restart counter is not averaged
+                averages[i] = float(value) if i == restarts else averages[i] + (float(value) - averages[i]) / counts[i]
+            cls.SLOT.pack_into(mm, offset, bucket, *counts, *averages)
+
+    @classmethod
+    def forget(cls, project_id):
+        mm = cls._maps.pop(project_id, None)
+        if mm is not None:
+            mm.close()
+        try:
+            cls.path(project_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def series(cls, project_id, resolution='1s', now=None):
+        """
+        Returns {'resolution', 'step', 't': [...], <field>: [...]} for the
+        buckets still inside the window of `resolution`, oldest first.
+        """
+        layout = {name: (step, size, base) for name, step, size, base in cls._layout()}
+        if resolution not in layout:
+            raise ValueError(f"Unknown resolution {resolution!r}.")
+        step, size, base = layout[resolution]
+        result = {'resolution': resolution, 'step': step, 't': []}
+        result.update({field: [] for field in cls.FIELDS})
+        try:
+            with open(cls.path(project_id), 'rb') as f:
+                f.seek(base)
+                data = f.read(size * cls.SLOT.size)
+        except FileNotFoundError:
+            return result
+        now = time.time() if now is None else now
+        oldest = now - step * size
+        slots = sorted(
+            slot for slot in cls.SLOT.iter_unpack(data[:len(data) - len(data) % cls.SLOT.size])
+            if any(slot[1:1 + len(cls.FIELDS)]) and oldest < slot[0] <= now
+        )
+        for bucket, *slot in slots:
+            result['t'].append(bucket)
+            counts, averages = slot[:len(cls.FIELDS)], slot[len(cls.FIELDS):]
+            for field, count, value in zip(cls.FIELDS, counts, averages):
+                result[field].append(round(value, 2) if count else None)
+        return result
+
+
+class MetricsSampler:
+    """
+    Samples every project's Gunicorn unit once per PANEL_MONITOR_INTERVAL
+    seconds into MetricsStore: CPU (% of one core), resident memory and
+    task count from the unit's cgroup (v2, or the v1 controllers), falling
+    back to /proc for the unit's processes, plus systemd's restart counter.
+    """
+    CGROUP_ROOT = Path('/sys/fs/cgroup')
+    _thread = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def interval():
+        return getattr(settings, 'PANEL_MONITOR_INTERVAL', 1)
+
+    @classmethod
+    def unified(cls):
+        return (cls.CGROUP_ROOT / 'cgroup.controllers').exists()
+
+    @staticmethod
+    def _read(path, default=None):
+        try:
+            return Path(path).read_text()
+        except OSError:
+            return default
+
+    @classmethod
+    def _keyed(cls, path):
+        """Parses 'key value' files such as cpu.stat / memory.stat."""
+        values = {}
+        for line in (cls._read(path) or '').splitlines():
+            key, _, value = line.partition(' ')
+            if value.strip().isdigit():
+                values[key] = int(value)
+        return values
+
+    @classmethod
+    def read_cgroup(cls, unit):
+        """Returns (cpu seconds, rss bytes, tasks) for a unit, or None if it has no cgroup."""
+        if cls.unified():
+            group = cls.CGROUP_ROOT / 'system.slice' / unit
+            if not group.is_dir():
+                return None
+            cpu = cls._keyed(group / 'cpu.stat').get('usage_usec')
+            memory = cls._keyed(group / 'memory.stat')
+            rss = memory.get('anon', 0) + memory.get('file_mapped', 0) if memory else None
+            tasks = cls._read(group / 'pids.current')
+            procs = group / 'cgroup.procs'
+            cpu = cpu / 1e6 if cpu is not None else None
+        else:
+            cpuacct = cls.CGROUP_ROOT / 'cpu,cpuacct' / 'system.slice' / unit
+            if not cpuacct.is_dir():
+                cpuacct = cls.CGROUP_ROOT / 'cpuacct' / 'system.slice' / unit
+            memory_group = cls.CGROUP_ROOT / 'memory' / 'system.slice' / unit
+            pids_group = cls.CGROUP_ROOT / 'pids' / 'system.slice' / unit
+            if not (cpuacct.is_dir() or memory_group.is_dir() or pids_group.is_dir()):
+                return None
+            usage = cls._read(cpuacct / 'cpuacct.usage')
+            cpu = int(usage) / 1e9 if usage else None
+            memory = cls._keyed(memory_group / 'memory.stat')
+            rss = memory.get('total_rss', memory.get('rss')) if memory else None
+            tasks = cls._read(pids_group / 'pids.current')
+            procs = next((g / 'cgroup.procs' for g in (cpuacct, memory_group, pids_group) if g.is_dir()), None)
+
+        if cpu is None or rss is None:
+            # Controller not enabled for the unit: add up its processes instead
+            proc_cpu, proc_rss = cls.read_proc(cls._read(procs, '').split() if procs else [])
+            cpu = proc_cpu if cpu is None else cpu
+            rss = proc_rss if rss is None else rss
+        return cpu, rss, int(tasks) if tasks and tasks.strip().isdigit() else 0
+
+    @staticmethod
+    def read_proc(pids):
+        """Sums CPU seconds and RSS bytes of processes from /proc."""
+        ticks = os.sysconf('SC_CLK_TCK')
+        page = os.sysconf('SC_PAGE_SIZE')
+        cpu = rss = 0
+        for pid in pids:
+            try:
+                stat_fields = Path(f"/proc/{pid}/stat").read_text().rsplit(')', 1)[1].split()
+                cpu += (int(stat_fields[11]) + int(stat_fields[12])) / ticks
+                rss += int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * page
+            except (OSError, IndexError, ValueError):
+                continue
+        return cpu, rss
+
+    @staticmethod
+    def restarts(units):
+        """systemd's NRestarts per unit, in one systemctl call."""
+        if not units:
+            return {}
+        res = SystemService.run_command(f"systemctl show -p NRestarts --value {' '.join(units)}")
+        values = res['stdout'].split('\n') if res['success'] else []
+        return {unit: int(v) for unit, v in zip(units, values) if v.strip().isdigit()}
+
+    @classmethod
+    def run_forever(cls):
+        from django.db import close_old_connections
+        from .models import Project
+
+        previous = {}
+        projects = []
+        restarts = {}
+        tick = 0
+        while True:
+            started = time.monotonic()
+            try:
+                if tick % 30 == 0:
+                    close_old_connections()
+                    projects = list(Project.objects.values_list('id', 'name'))
+                    known = {project_id for project_id, _ in projects}
+                    for project_id in list(MetricsStore._maps):
+                        if project_id not in known:
+                            MetricsStore.forget(project_id)
+                    restarts = cls.restarts([f"{name}_gunicorn.service" for _, name in projects])
+                now = time.time()
+                for project_id, name in projects:
+                    unit = f"{name}_gunicorn.service"
+                    reading = cls.read_cgroup(unit)
+                    values = {'restarts': restarts.get(unit, 0)}
+                    if reading is not None:
+                        cpu, rss, tasks = reading
+                        last = previous.get(project_id)
+                        if last and now > last[0] and cpu >= last[1]:
+                            values['cpu'] = (cpu - last[1]) / (now - last[0]) * 100
+                        previous[project_id] = (now, cpu)
+                        values['rss_mb'] = rss / (1024 * 1024)
+                        values['tasks'] = tasks
+                    else:
+                        # No cgroup: the unit is not running
+                        previous.pop(project_id, None)
+                        values.update(cpu=0, rss_mb=0, tasks=0)
+                    MetricsStore.record(project_id, now, values)
+            except Exception:
+                logger.exception("Metrics sampling failed")
+            tick += 1
+            time.sleep(max(cls.interval() - (time.monotonic() - started), 0.05))
+
+    @classmethod
+    def ensure_started(cls):
+        """Starts the sampler thread; only the deploy_worker process runs one."""
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(target=cls.run_forever, daemon=True, name='metrics-sampler')
+                cls._thread.start()
+
+import json
+from bisect import bisect_left
+
+class LatencyHistogram:
+    """
+    Fixed log-scale latency histogram (1ms to ~70s, 25% wide buckets).
+
+    Every histogram has the same buckets, so windows, prefixes and projects
+    merge by adding counts; percentiles are reported as the bucket's upper
+    bound.
+    """
+    BOUNDS = tuple(0.001 * 1.25 ** i for i in range(52))
+    __slots__ = ('counts', 'total')
+
+    def __init__(self):
+        self.counts = array('I', bytes(4 * (len(self.BOUNDS) + 1)))
+        self.total = 0
+
+    def add(self, seconds):
+        self.counts[bisect_left(self.BOUNDS, seconds)] += 1
+        self.total += 1
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total += other.total
+        return self
+
+    def percentile(self, q):
+        """Latency in seconds below which a fraction `q` of requests fall."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.BOUNDS[min(i, len(self.BOUNDS) - 1)]
+        return self.BOUNDS[-1]
+
+
+class TrafficMinute:
+    """Aggregates of one project's requests within one minute."""
+    __slots__ = ('minute', 'requests', 'statuses', 'latency', 'upstream_sum', 'upstream_count', 'prefixes')
+
+    def __init__(self, minute):
+        self.minute = minute
+        self.requests = 0
+        self.statuses = {}
+        self.latency = LatencyHistogram()
+        self.upstream_sum = 0.0
+        self.upstream_count = 0
+        # prefix -> [requests, 5xx responses, LatencyHistogram]
+        self.prefixes = {}
+
+
+class TrafficStats:
+    """
+    Last hour of one project's traffic as a ring of per-minute aggregates
+    (an extra slot holds the minute in progress).
+
+    Memory is bounded by WINDOW minutes x PANEL_TRAFFIC_MAX_PREFIXES
+    histograms; paths beyond the prefix cap in a minute count as "(other)".
+    """
+    WINDOW = 61
+    OTHER = '(other)'
+
+    def __init__(self):
+        self.slots = [None] * self.WINDOW
+
+    @staticmethod
+    def prefix(path):
+        """The first PANEL_TRAFFIC_PREFIX_DEPTH path segments: /api/v1/users -> /api/."""
+        depth = getattr(settings, 'PANEL_TRAFFIC_PREFIX_DEPTH', 1)
+        segments = path.lstrip('/').split('/')
+        if len(segments) > depth:
+            return '/' + '/'.join(segments[:depth]) + '/'
+        return path or '/'
+
+    def add(self, timestamp, status, request_time, upstream_time, path, now):
+        minute = int(timestamp // 60)
+        if minute <= int(now // 60) - self.WINDOW:
+            return
+        index = minute % self.WINDOW
+        slot = self.slots[index]
+        if slot is None or slot.minute != minute:
+            if slot is not None and slot.minute > minute:
+                return
+            slot = self.slots[index] = TrafficMinute(minute)
+        slot.requests += 1
+        slot.statuses[status] = slot.statuses.get(status, 0) + 1
+        slot.latency.add(request_time)
+        if upstream_time is not None:
+            slot.upstream_sum += upstream_time
+            slot.upstream_count += 1
+
+        key = self.prefix(path)
+        entry = slot.prefixes.get(key)
+        if entry is None:
+            if len(slot.prefixes) >= getattr(settings, 'PANEL_TRAFFIC_MAX_PREFIXES', 50):
+                key = self.OTHER
+                entry = slot.prefixes.get(key)
+            if entry is None:
+                entry = slot.prefixes[key] = [0, 0, LatencyHistogram()]
+        entry[0] += 1
+        if status >= 500:
+            entry[1] += 1
+        entry[2].add(request_time)
+
+    def _window(self, now, minutes):
+        # The last `minutes` full minutes plus the one in progress
+        current = int(now // 60)
+        return [s for s in self.slots if s is not None and current - minutes <= s.minute <= current]
+
+    @staticmethod
+    def _latency(histogram):
+        return {
+            f"p{int(q * 100)}": None if histogram.percentile(q) is None else round(histogram.percentile(q) * 1000, 1)
+            for q in (0.5, 0.95, 0.99)
+        }
+
+    def summary(self, now, minutes):
+        slots = self._window(now, minutes)
+        latency = LatencyHistogram()
+        statuses = {}
+        upstream_sum = upstream_count = 0
+        for slot in slots:
+            latency.merge(slot.latency)
+            for status, count in slot.statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+            upstream_sum += slot.upstream_sum
+            upstream_count += slot.upstream_count
+        elapsed = minutes * 60 + now % 60
+        classes = {}
+        for status, count in statuses.items():
+            classes[f"{status // 100}xx"] = classes.get(f"{status // 100}xx", 0) + count
+        return {
+            'requests': latency.total,
+            'rps': round(latency.total / elapsed, 2),
+            'classes': dict(sorted(classes.items())),
+            'statuses': {str(k): v for k, v in sorted(statuses.items())},
+            'upstream_avg_ms': round(upstream_sum / upstream_count * 1000, 1) if upstream_count else None,
+            **self._latency(latency),
+        }
+
+    def prefixes(self, now, minutes, limit=20):
+        merged = {}
+        for slot in self._window(now, minutes):
+            for key, (requests, errors, histogram) in slot.prefixes.items():
+                entry = merged.setdefault(key, [0, 0, LatencyHistogram()])
+                entry[0] += requests
+                entry[1] += errors
+                entry[2].merge(histogram)
+        top = sorted(merged.items(), key=lambda item: -item[1][0])[:limit]
+        return [
+            {'prefix': key, 'requests': requests, 'errors': errors, **self._latency(histogram)}
+            for key, (requests, errors, histogram) in top
+        ]
+
+    def rps_series(self, now):
+        """Requests per second of each of the last 60 full minutes, oldest first."""
+        current = int(now // 60)
+        by_minute = {s.minute: s.requests for s in self.slots if s is not None}
+        return [round(by_minute.get(minute, 0) / 60, 2) for minute in range(current - 60, current)]
+
+    def snapshot(self, now):
+        return {
+            'updated': now,
+            'windows': {name: self.summary(now, minutes) for name, minutes in (('1m', 1), ('5m', 5), ('1h', 60))},
+            'prefixes': self.prefixes(now, 60),
+            'rps': self.rps_series(now),
+        }
+
+
+class AccessLogTailer:
+    """
+    Follows a log file across rotations by remembering (inode, offset).
+
+    When the inode behind the path changes, the rest of the old file is
+    read from its rotated name (<path>.1) before starting on the new one;
+    a file that shrank (copytruncate) is read again from the start. Only
+    complete lines are consumed.
+    """
+
+    def __init__(self, path, inode=None, offset=0):
+        self.path = Path(path)
+        self.inode = inode
+        self.offset = offset
+
+    def _read_from(self, path, offset, max_bytes):
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(max_bytes)
+        end = data.rfind(b'\n') + 1
+        if not end and len(data) == max_bytes:
+            # A single line longer than the read limit: skip it
+            return [], offset + len(data)
+        return data[:end].decode('utf-8', 'replace').splitlines(), offset + end
+
+    def read(self, max_bytes=8 * 1024 * 1024):
+        """Returns the complete lines appended since the last call."""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return []
+        lines = []
+        if self.inode is None:
+            # First sight: live statistics only, don't replay history
+            self.inode, self.offset = st.st_ino, st.st_size
+        elif st.st_ino != self.inode:
+            rotated = self.path.with_name(self.path.name + '.1')
+            try:
+                if rotated.stat().st_ino == self.inode:
+                    lines, _ = self._read_from(rotated, self.offset, max_bytes)
+            except OSError:
+                pass
+            self.inode, self.offset = st.st_ino, 0
+        elif st.st_size < self.offset:
+            self.offset = 0
+        if st.st_size > self.offset:
+            try:
+                new_lines, self.offset = self._read_from(self.path, self.offset, max_bytes)
+            except OSError:
+                return lines
+            lines += new_lines
+        return lines
+
+
+class TrafficMonitor:
+    """
+    Tails every project's nginx access log (see ConfigGenerator.access_log_path)
+    in the deploy_worker process and keeps a TrafficStats per project. A
+    JSON snapshot of each is written to PANEL_CACHE_DIR/traffic/<id>.json
+    every PANEL_TRAFFIC_INTERVAL seconds for the web processes to serve;
+    tail positions are saved so a worker restart doesn't count lines twice.
+    """
+    _thread = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def root():
+        cache_dir = getattr(settings, 'PANEL_CACHE_DIR', Path.home() / '.djangopanel' / 'cache')
+        return Path(cache_dir) / 'traffic'
+
+    @staticmethod
+    def parse(line):
+        """Returns (timestamp, status, request_time, upstream_time, path) or None."""
+        fields = line.split('\t')
+        if len(fields) < 7:
+            return None
+        try:
+            timestamp, status, request_time = float(fields[0]), int(fields[1]), float(fields[2])
+        except ValueError:
+            return None
+        upstream = None
+        if fields[3] not in ('', '-'):
+            # "0.010, 0.020" when nginx retried another upstream server
+            try:
+                upstream = sum(float(part.strip(' :')) for part in fields[3].split(',') if part.strip(' :-'))
+            except ValueError:
+                pass
+        return timestamp, status, request_time, upstream, fields[5]
+
+    @classmethod
+    def snapshot(cls, project_id):
+        try:
+            return json.loads((cls.root() / f"{project_id}.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def _write(cls, path, data):
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, path)
+
+    @classmethod
+    def run_forever(cls):
+        from django.db import close_old_connections
+        from .models import Project
+
+        root = cls.root()
+        root.mkdir(parents=True, exist_ok=True)
+        state_path = root / 'state.json'
+        try:
+            saved = json.loads(state_path.read_text())
+        except (OSError, ValueError):
+            saved = {}
+        tailers = {}
+        stats = {}
+        tick = 0
+        while True:
+            started = time.time()
+            try:
+                if tick % 12 == 0:
+                    close_old_connections()
+                    projects = {p.id: ConfigGenerator.access_log_path(p) for p in Project.objects.only('id', 'name')}
+                    for project_id in list(tailers):
+                        if project_id not in projects:
+                            del tailers[project_id]
+                            stats.pop(project_id, None)
+                            (root / f"{project_id}.json").unlink(missing_ok=True)
+                    for project_id, path in projects.items():
+                        tailer = tailers.get(project_id)
+                        if tailer is None or tailer.path != path:
+                            inode, offset = saved.get(str(project_id), [None, 0]) if tailer is None else (None, 0)
+                            tailers[project_id] = AccessLogTailer(path, inode, offset)
+                            stats.setdefault(project_id, TrafficStats())
+
+                now = time.time()
+                for project_id, tailer in tailers.items():
+                    project_stats = stats[project_id]
+                    for line in tailer.read():
+                        entry = cls.parse(line)
+                        if entry:
+                            project_stats.add(*entry, now=now)
+                    cls._write(root / f"{project_id}.json", project_stats.snapshot(now))
+
+                positions = {str(pid): [t.inode, t.offset] for pid, t in tailers.items()}
+                if positions != saved:
+                    cls._write(state_path, positions)
+                    saved = positions
+            except Exception:
+                logger.exception("Access log processing failed")
+            tick += 1
+            time.sleep(max(getattr(settings, 'PANEL_TRAFFIC_INTERVAL', 5) - (time.time() - started), 0.05))
+
+    @classmethod
+    def ensure_started(cls):
+        """Starts the tailer thread; only the deploy_worker process runs one."""
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(target=cls.run_forever, daemon=True, name='traffic-monitor')
+                cls._thread.start()
@@ -1,3 +1,803 @@
-from django.test import TestCase
+import fcntl
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Deployment, FleetRollout, Project
+from .services import (
+    ConfigReconciler, DeployFingerprint, DeployService, DeploymentLogger, DeploymentQueue, FileService, FleetService,
+    LatencyHistogram, LineIndex, MetricsStore, SearchIndex, SystemService, TerminalManager, WheelCache,
+)
+
+
+class PanelTestMixin:
+    """
+    Shared fixture: a temp dir (also used as PANEL_CACHE_DIR), an in-memory
+    cache and no deployment dispatcher thread.
+    """
+    def setUp(self):
+        super().setUp()
+        self.tmp = Path(tempfile.mkdtemp(prefix='panel-test-'))
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        overrides = override_settings(
+            PANEL_CACHE_DIR=self.tmp / 'cache',
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch.object(DeploymentQueue, 'ensure_started')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_projects(self, count, prefix='app', port=8000):
+        return [
+            Project.objects.create(name=f"{prefix}{i}", domain=f"{prefix}{i}.test", repo_url=f"https://example.com/{prefix}.git", port=port + i)
+            for i in range(count)
+        ]
+
+
+@override_settings(PANEL_LOG_FLUSH_LINES=3, PANEL_LOG_FLUSH_INTERVAL_MS=60000)
+class DeploymentLoggerTests(PanelTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.deployment = Deployment.objects.create(project=self.create_projects(1)[0], status='in_progress')
+
+    def chunks(self):
+        return list(self.deployment.log_chunks.values_list('sequence', 'content'))
+
+    def test_lines_are_batched_into_chunks(self):
+        log = DeploymentLogger(self.deployment)
+        # The first line goes out at once (nothing was flushed yet), then every 3 lines
+        for i in range(6):
+            log(f"line {i}")
+        self.assertEqual(self.chunks(), [(0, "line 0"), (1, "line 1\nline 2\nline 3")])
+        log.flush()
+        self.assertEqual(self.chunks()[-1], (2, "line 4\nline 5"))
+        log.flush()
+        self.assertEqual(len(self.chunks()), 3)
+        self.assertEqual(self.deployment.logs, "\n".join(f"line {i}" for i in range(6)))
+
+    def test_flush_due_waits_for_the_interval(self):
+        log = DeploymentLogger(self.deployment)
+        log("first")
+        log("buffered")
+        log.flush_due()
+        self.assertEqual(len(self.chunks()), 1)
+        log.flush_interval = 0
+        log.flush_due()
+        self.assertEqual(self.chunks()[-1], (1, "buffered"))
+
+    def test_new_logger_continues_the_sequence(self):
+        DeploymentLogger(self.deployment)("before restart")
+        log = DeploymentLogger(self.deployment)
+        log("after restart")
+        log.flush()
+        self.assertEqual([seq for seq, _ in self.chunks()], [0, 1])
+        # .text only covers what this logger wrote
+        self.assertEqual(log.text, "after restart")
+
+    def test_set_status_flushes_and_saves_status(self):
+        log = DeploymentLogger(self.deployment)
+        log("one")
+        log("two")
+        log.set_status('success')
+        self.deployment.refresh_from_db()
+        self.assertEqual(self.deployment.status, 'success')
+        self.assertIsNotNone(self.deployment.finished_at)
+        self.assertEqual(self.deployment.logs, "one\ntwo")
+
+    def test_legacy_logs_come_first(self):
+        self.deployment.legacy_logs = "old line"
+        self.deployment.save()
+        log = DeploymentLogger(self.deployment)
+        log("new line")
+        self.assertEqual(self.deployment.logs, "old line\nnew line")
+
+
+@skipUnless(os.name == 'posix', "uses a POSIX shell")
+class StreamCommandTests(SimpleTestCase):
+    def test_lines_are_forwarded_as_they_arrive(self):
+        lines = []
+        res = SystemService.run_command(
+            "echo one; echo two >&2; echo three", on_line=lambda line, stream: lines.append((line, stream))
+        )
+        self.assertTrue(res['success'])
+        self.assertEqual(res['stdout'], "one\nthree\n")
+        self.assertEqual(res['stderr'], "two\n")
+        self.assertEqual(sorted(lines), [("one", 'stdout'), ("three", 'stdout'), ("two", 'stderr')])
+
+    def test_timeout_kills_the_process_tree(self):
+        started = time.monotonic()
+        res = SystemService.run_command("sleep 5 & sleep 5; wait", timeout=0.5)
+        self.assertLess(time.monotonic() - started, 4)
+        self.assertFalse(res['success'])
+        self.assertEqual(res['returncode'], -1)
+        self.assertIn("timed out after 0.5s", res['stderr'])
+
+    def test_on_tick_runs_while_the_command_is_silent(self):
+        ticks = []
+        res = SystemService.run_command("sleep 0.5", on_tick=lambda: ticks.append(1), tick=0.05)
+        self.assertTrue(res['success'])
+        self.assertGreaterEqual(len(ticks), 3)
+
+    def test_failure_keeps_the_exit_code(self):
+        res = SystemService.run_command("exit 3", timeout=5)
+        self.assertEqual((res['success'], res['returncode']), (False, 3))
+
+
+@override_settings(PANEL_RELOAD_DEBOUNCE_MS=200)
+class ConfigReconcilerTests(PanelTestMixin, SimpleTestCase):
+    def test_apply_skips_unchanged_files(self):
+        path = self.tmp / 'site.conf'
+        path.write_text("server {}\n")
+        with mock.patch.object(SystemService, 'run_command') as run:
+            changed, res = ConfigReconciler.apply(path, "server {}\n")
+        self.assertFalse(changed)
+        self.assertTrue(res['success'])
+        run.assert_not_called()
+
+    def test_apply_installs_changed_files(self):
+        path = self.tmp / 'site.conf'
+        path.write_text("server {}\n")
+        ok = {'success': True, 'stdout': '', 'stderr': '', 'returncode': 0}
+        with mock.patch.object(SystemService, 'run_command', return_value=ok) as run:
+            changed, _ = ConfigReconciler.apply(path, "server { listen 80; }\n")
+        self.assertTrue(changed)
+        self.assertIn(f'"{path}"', run.call_args.args[0])
+
+    def test_concurrent_reloads_share_one_call(self):
+        calls = []
+        results = []
+        barrier = threading.Barrier(5)
+
+        def action():
+            calls.append(1)
+            return {'success': True, 'returncode': 0, 'call': len(calls)}
+
+        def request():
+            barrier.wait()
+            results.append(ConfigReconciler._coalesced('test', action))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([r['call'] for r in results], [1] * 5)
+
+        # A request after the batch ran gets its own call
+        self.assertEqual(ConfigReconciler._coalesced('test', action)['call'], 2)
+
+    def test_failing_action_becomes_a_failed_result(self):
+        def action():
+            raise RuntimeError("nginx: [emerg] bad config")
+
+        res = ConfigReconciler._coalesced('test', action)
+        self.assertFalse(res['success'])
+        self.assertEqual(res['stderr'], "nginx: [emerg] bad config")
+
+
+class ApplyPatchTests(SimpleTestCase):
+    def test_replace_insert_and_delete(self):
+        text = "a\nb\nc\nd"
+        patch = [[0, 0, ["start"]], [1, 1, ["B"]], [3, 1, []]]
+        self.assertEqual(FileService.apply_patch(text, patch), "start\na\nB\nc")
+
+    def test_append_at_end(self):
+        self.assertEqual(FileService.apply_patch("a\nb", [[2, 0, ["c"]]]), "a\nb\nc")
+
+    def test_empty_patch_keeps_text(self):
+        self.assertEqual(FileService.apply_patch("a\nb\n", []), "a\nb\n")
+
+    def test_overlapping_hunks_are_rejected(self):
+        with self.assertRaisesMessage(ValueError, "Patch does not apply."):
+            FileService.apply_patch("a\nb\nc", [[1, 2, []], [2, 0, ["x"]]])
+
+    def test_hunk_past_end_is_rejected(self):
+        with self.assertRaisesMessage(ValueError, "Patch does not apply."):
+            FileService.apply_patch("a\nb", [[1, 5, []]])
+
+    def test_malformed_hunk_is_rejected(self):
+        with self.assertRaisesMessage(ValueError, "Malformed patch."):
+            FileService.apply_patch("a", [["x", 0, []]])
+        with self.assertRaisesMessage(ValueError, "Malformed patch."):
+            FileService.apply_patch("a", [[0]])
+
+
+class ListFilesTests(PanelTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(DeployService, 'BASE_DIR', self.tmp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.project = Project.objects.create(name='app', domain='app.test', repo_url='https://example.com/app.git')
+        root = self.tmp / 'app'
+        (root / 'static').mkdir(parents=True)
+        (root / 'media').mkdir()
+        for i, name in enumerate(['b.py', 'A.txt', 'c.log', 'd.cfg']):
+            path = root / name
+            path.write_text("x" * (10 * (i + 1)))
+            os.utime(path, (1_700_000_000 + i, 1_700_000_000 + i))
+
+    def names(self, page):
+        return [item['name'] for item in page['items']]
+
+    def test_directories_come_first_then_names(self):
+        page, error = FileService.list_files(self.project)
+        self.assertIsNone(error)
+        self.assertEqual(self.names(page), ['media', 'static', 'A.txt', 'b.py', 'c.log', 'd.cfg'])
+        self.assertEqual((page['total'], page['next_offset']), (6, None))
+
+    def test_pages_follow_the_sort_order(self):
+        first, _ = FileService.list_files(self.project, sort='size', desc=True, limit=4)
+        self.assertEqual(self.names(first), ['static', 'media', 'd.cfg', 'c.log'])
+        self.assertEqual(first['next_offset'], 4)
+        second, _ = FileService.list_files(self.project, sort='size', desc=True, offset=4, limit=4)
+        self.assertEqual(self.names(second), ['A.txt', 'b.py'])
+        self.assertIsNone(second['next_offset'])
+
+    def test_sort_by_mtime_and_unknown_sort(self):
+        page, _ = FileService.list_files(self.project, sort='mtime', offset=2)
+        self.assertEqual(self.names(page), ['b.py', 'A.txt', 'c.log', 'd.cfg'])
+        page, _ = FileService.list_files(self.project, sort='owner')
+        self.assertEqual(self.names(page)[2:], ['A.txt', 'b.py', 'c.log', 'd.cfg'])
+
+    def test_subdirectory_paths_are_relative_to_the_project(self):
+        (self.tmp / 'app' / 'static' / 'site.css').write_text("body {}")
+        page, _ = FileService.list_files(self.project, 'static')
+        self.assertEqual([item['path'] for item in page['items']], ['static/site.css'])
+
+    def test_path_outside_project_is_denied(self):
+        with self.assertRaises(ValueError):
+            FileService.list_files(self.project, '../')
+
+    def test_json_endpoint(self):
+        url = reverse('project_files_list', args=[self.project.id])
+        data = self.client.get(url, {'sort': 'name', 'offset': 5}).json()
+        self.assertEqual([item['name'] for item in data['items']], ['d.cfg'])
+        self.assertEqual(self.client.get(url, {'path': 'missing'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'path': '../..'}).status_code, 400)
+
+
+class SaveFileTests(PanelTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(DeployService, 'BASE_DIR', self.tmp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.project = Project.objects.create(name='app', domain='app.test', repo_url='https://example.com/app.git')
+        (self.tmp / 'app').mkdir()
+        self.path = self.tmp / 'app' / 'settings.py'
+        self.path.write_text("DEBUG = True\nALLOWED_HOSTS = []\n")
+        self.version = FileService.version(self.path.read_bytes())
+
+    def test_save_with_current_version(self):
+        ok, error, version = FileService.save_file(self.project, 'settings.py', "DEBUG = False\n", base_version=self.version)
+        self.assertTrue(ok, error)
+        self.assertEqual(self.path.read_text(), "DEBUG = False\n")
+        self.assertEqual(version, FileService.version("DEBUG = False\n"))
+
+    def test_changed_on_disk_is_a_conflict(self):
+        self.path.write_text("DEBUG = True\nALLOWED_HOSTS = ['*']\n")
+        ok, error, version = FileService.save_file(self.project, 'settings.py', "DEBUG = False\n", base_version=self.version)
+        self.assertFalse(ok)
+        self.assertEqual(error, FileService.CONFLICT)
+        self.assertIsNone(version)
+        self.assertEqual(self.path.read_text(), "DEBUG = True\nALLOWED_HOSTS = ['*']\n")
+
+    def test_patch_against_base_version(self):
+        ok, error, version = FileService.save_file(
+            self.project, 'settings.py', base_version=self.version, patch=[[0, 1, ["DEBUG = False"]]]
+        )
+        self.assertTrue(ok, error)
+        self.assertEqual(self.path.read_text(), "DEBUG = False\nALLOWED_HOSTS = []\n")
+        # The old version is stale now
+        ok, error, _ = FileService.save_file(self.project, 'settings.py', base_version=self.version, patch=[])
+        self.assertEqual(error, FileService.CONFLICT)
+
+    def test_patch_that_does_not_apply_leaves_file_alone(self):
+        ok, error, _ = FileService.save_file(self.project, 'settings.py', base_version=self.version, patch=[[10, 1, []]])
+        self.assertFalse(ok)
+        self.assertEqual(error, "Patch does not apply.")
+        self.assertEqual(self.path.read_text(), "DEBUG = True\nALLOWED_HOSTS = []\n")
+
+    def test_path_outside_project_is_denied(self):
+        ok, error, _ = FileService.save_file(self.project, '../escape.py', "x")
+        self.assertFalse(ok)
+        self.assertEqual(error, "Access denied.")
+
+
+class SearchIndexTests(PanelTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(DeployService, 'BASE_DIR', self.tmp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.project = Project.objects.create(name='app', domain='app.test', repo_url='https://example.com/app.git')
+        self.root = self.tmp / 'app'
+        (self.root / 'config').mkdir(parents=True)
+        (self.root / 'config' / 'settings.py').write_text("SECRET_KEY = 'changeme'\nDEBUG = False\n")
+        (self.root / 'README.md').write_text("Deploy with the panel.\n")
+        (self.root / 'logo.png').write_bytes(b"\x89PNG\0\0settings")
+        for skipped in ('.git', 'venv'):
+            (self.root / skipped).mkdir()
+            (self.root / skipped / 'settings.py').write_text("SECRET_KEY = 'vendored'\n")
+
+    def test_filenames_and_contents_are_found(self):
+        self.assertEqual(SearchIndex.update(self.project), {'files': 3, 'updated': 3, 'removed': 0})
+        result = SearchIndex.search(self.project, 'settings')
+        self.assertEqual(result['files'], ['config/settings.py'])
+        self.assertEqual(result['matches'], [])
+
+        result = SearchIndex.search(self.project, 'SECRET_KEY')
+        self.assertEqual([path for path, _ in result['matches']], ['config/settings.py'])
+        self.assertIn("\x02SECRET_KEY\x03", result['matches'][0][1])
+
+    def test_short_queries_only_match_paths(self):
+        SearchIndex.update(self.project)
+        result = SearchIndex.search(self.project, 'py')
+        self.assertEqual(result, {'files': ['config/settings.py'], 'matches': []})
+
+    def test_update_only_reads_changed_files(self):
+        SearchIndex.update(self.project)
+        self.assertEqual(SearchIndex.update(self.project)['updated'], 0)
+
+        settings_file = self.root / 'config' / 'settings.py'
+        settings_file.write_text("SECRET_KEY = 'rotated'\n")
+        os.utime(settings_file, (1_700_000_000, 1_700_000_000))
+        (self.root / 'README.md').unlink()
+        self.assertEqual(SearchIndex.update(self.project), {'files': 2, 'updated': 1, 'removed': 1})
+        self.assertEqual(SearchIndex.search(self.project, 'changeme')['matches'], [])
+        self.assertEqual(len(SearchIndex.search(self.project, 'rotated')['matches']), 1)
+        self.assertEqual(SearchIndex.search(self.project, 'README')['files'], [])
+
+    def test_update_path_reindexes_one_file(self):
+        SearchIndex.update(self.project)
+        (self.root / 'README.md').write_text("Now served by gunicorn.\n")
+        SearchIndex.update_path(self.project, 'README.md')
+        self.assertEqual([path for path, _ in SearchIndex.search(self.project, 'gunicorn')['matches']], ['README.md'])
+
+    def test_search_without_an_index(self):
+        self.assertEqual(SearchIndex.search(self.project, 'settings'), {'files': [], 'matches': []})
+        self.assertIsNone(SearchIndex.stats(self.project))
+
+
+class LineIndexTests(PanelTestMixin, SimpleTestCase):
+    def write(self, name, text):
+        path = self.tmp / name
+        path.write_bytes(text.encode())
+        return path
+
+    def test_reads_from_any_line(self):
+        lines = [f"line {i}" for i in range(3000)]
+        index = LineIndex.get(self.write('big.log', "\n".join(lines) + "\n"))
+        self.assertEqual(index.total_lines, 3000)
+        self.assertEqual(len(index.checkpoints), 3000 // LineIndex.STRIDE + 1)
+        for start in (0, 1023, 1024, 2047, 2998):
+            self.assertEqual(index.read(start, 2, 1024), (lines[start:start + 2], False))
+        self.assertEqual(index.read(3000, 5, 1024), ([], False))
+
+    def test_last_line_without_newline(self):
+        index = LineIndex.get(self.write('partial.txt', "a\nb\nc"))
+        self.assertEqual(index.total_lines, 3)
+        self.assertEqual(index.read(1, 10, 1024), (["b", "c"], False))
+
+    def test_empty_file(self):
+        index = LineIndex.get(self.write('empty.txt', ""))
+        self.assertEqual(index.total_lines, 0)
+        self.assertEqual(index.read(0, 10, 1024), ([], False))
+
+    def test_long_line_is_truncated_at_max_bytes(self):
+        index = LineIndex.get(self.write('long.txt', "short\n" + "x" * 100 + "\nafter\n"))
+        self.assertEqual(index.read(0, 3, 20), (["short", "x" * 14], True))
+
+    def test_appended_lines_extend_the_cached_index(self):
+        path = self.write('grow.log', "one\ntwo\n")
+        first = LineIndex.get(path)
+        with open(path, 'a') as f:
+            f.write("three\n")
+        second = LineIndex.get(path)
+        self.assertIs(first, second)
+        self.assertEqual(second.total_lines, 3)
+        self.assertEqual(second.read(2, 1, 1024), (["three"], False))
+
+    def test_indexing_one_file_does_not_block_others(self):
+        slow, fast = self.write('slow.log', "a\n" * 10), self.write('fast.log', "b\n")
+        scanning, release = threading.Event(), threading.Event()
+        extend = LineIndex._extend
+
+        def slow_extend(index, st):
+            if index.path == slow:
+                scanning.set()
+                release.wait(10)
+            extend(index, st)
+
+        with mock.patch.object(LineIndex, '_extend', slow_extend):
+            worker = threading.Thread(target=LineIndex.get, args=(slow,))
+            worker.start()
+            self.assertTrue(scanning.wait(10))
+            try:
+                lines = []
+                reader = threading.Thread(target=lambda: lines.append(LineIndex.get(fast).total_lines))
+                reader.start()
+                reader.join(5)
+                self.assertEqual(lines, [1])
+            finally:
+                release.set()
+                worker.join(10)
+        self.assertEqual(LineIndex.get(slow).total_lines, 10)
+
+    def test_truncated_file_is_reindexed(self):
+        path = self.write('rotate.log', "one\ntwo\nthree\n")
+        LineIndex.get(path)
+        path.write_text("new\n")
+        index = LineIndex.get(path)
+        self.assertEqual(index.total_lines, 1)
+        self.assertEqual(index.read(0, 5, 1024), (["new"], False))
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    def test_empty(self):
+        self.assertIsNone(LatencyHistogram().percentile(0.5))
+
+    def test_percentiles_are_bucket_upper_bounds(self):
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.add(ms / 100)
+        for q, exact in ((0.5, 0.5), (0.95, 0.95), (0.99, 0.99)):
+            value = histogram.percentile(q)
+            # Within one 25% wide bucket of the exact value, never below it
+            self.assertGreaterEqual(value, exact)
+            self.assertLess(value, exact * 1.25)
+        self.assertLessEqual(histogram.percentile(0.5), histogram.percentile(0.95))
+
+    def test_out_of_range_values(self):
+        histogram = LatencyHistogram()
+        histogram.add(0)
+        histogram.add(1000)
+        self.assertEqual(histogram.percentile(0.5), LatencyHistogram.BOUNDS[0])
+        self.assertEqual(histogram.percentile(1), LatencyHistogram.BOUNDS[-1])
+
+    def test_merge_adds_counts(self):
+        fast, slow = LatencyHistogram(), LatencyHistogram()
+        for _ in range(90):
+            fast.add(0.01)
+        for _ in range(10):
+            slow.add(2.0)
+        merged = LatencyHistogram().merge(fast).merge(slow)
+        self.assertEqual(merged.total, 100)
+        self.assertLess(merged.percentile(0.9), 0.0125)
+        self.assertGreaterEqual(merged.percentile(0.95), 2.0)
+
+
+@override_settings(PANEL_DEPLOY_CONCURRENCY=2)
+class DeploymentQueueTests(PanelTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.projects = self.create_projects(3)
+
+    def pending(self, project):
+        return Deployment.objects.create(project=project, status='pending')
+
+    def test_one_job_per_project(self):
+        first, second = self.pending(self.projects[0]), self.pending(self.projects[0])
+        self.assertTrue(DeploymentQueue.claim(first.id))
+        self.assertFalse(DeploymentQueue.claim(second.id))
+        Deployment.objects.filter(id=first.id).update(status='success')
+        self.assertTrue(DeploymentQueue.claim(second.id))
+
+    def test_global_concurrency_limit(self):
+        jobs = [self.pending(project) for project in self.projects]
+        self.assertTrue(DeploymentQueue.claim(jobs[0].id))
+        self.assertTrue(DeploymentQueue.claim(jobs[1].id))
+        self.assertFalse(DeploymentQueue.claim(jobs[2].id))
+        Deployment.objects.filter(id=jobs[0].id).update(status='failed')
+        self.assertTrue(DeploymentQueue.claim(jobs[2].id))
+
+    def test_claim_only_pending(self):
+        job = self.pending(self.projects[0])
+        self.assertTrue(DeploymentQueue.claim(job.id))
+        self.assertFalse(DeploymentQueue.claim(job.id))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'in_progress')
+        self.assertEqual(job.claimed_by, DeploymentQueue.worker_id())
+        self.assertIsNotNone(job.started_at)
+
+    def test_stale_lease_is_requeued(self):
+        stale, fresh = self.pending(self.projects[0]), self.pending(self.projects[1])
+        self.assertTrue(DeploymentQueue.claim(stale.id))
+        self.assertTrue(DeploymentQueue.claim(fresh.id))
+        expired = timezone.now() - timedelta(seconds=DeploymentQueue.lease_seconds() + 1)
+        Deployment.objects.filter(id=stale.id).update(heartbeat_at=expired, claimed_by='gone:1')
+        with self.assertLogs('panel.services', 'WARNING'):
+            self.assertEqual(DeploymentQueue.recover_abandoned(), 1)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.claimed_by, stale.heartbeat_at), ('pending', '', None))
+        self.assertEqual(Deployment.objects.get(id=fresh.id).status, 'in_progress')
+
+    def test_heartbeat_renews_only_own_jobs(self):
+        mine, other = self.pending(self.projects[0]), self.pending(self.projects[1])
+        DeploymentQueue.claim(mine.id)
+        DeploymentQueue.claim(other.id)
+        expired = timezone.now() - timedelta(hours=1)
+        Deployment.objects.update(heartbeat_at=expired)
+        with mock.patch.object(DeploymentQueue, '_active', {mine.id, other.id}):
+            Deployment.objects.filter(id=other.id).update(claimed_by='elsewhere:1')
+            DeploymentQueue.heartbeat()
+        self.assertGreater(Deployment.objects.get(id=mine.id).heartbeat_at, expired)
+        self.assertEqual(Deployment.objects.get(id=other.id).heartbeat_at, expired)
+
+    def test_enqueue_does_not_dispatch_in_web_process(self):
+        DeploymentQueue.enqueue(self.projects[0])
+        DeploymentQueue.ensure_started.assert_not_called()
+        with self.settings(PANEL_DEPLOY_IN_WEB_PROCESS=True):
+            DeploymentQueue.enqueue(self.projects[1])
+        DeploymentQueue.ensure_started.assert_called_once_with()
+
+    def test_enqueue_keeps_one_pending_deployment(self):
+        first, created = DeploymentQueue.enqueue(self.projects[0])
+        self.assertTrue(created)
+        second, created = DeploymentQueue.enqueue(self.projects[0], force_full=True)
+        self.assertFalse(created)
+        self.assertEqual(first.id, second.id)
+        self.assertTrue(Deployment.objects.get(id=first.id).force_full)
+        self.assertEqual(self.projects[0].deployments.count(), 1)
+
+
+class DeployFingerprintTests(PanelTestMixin, SimpleTestCase):
+    def git(self, *args, cwd=None):
+        subprocess.run(
+            ['git', '-c', 'init.defaultBranch=main', '-c', 'user.name=test', '-c', 'user.email=test@localhost', *args],
+            cwd=cwd or self.src, check=True, capture_output=True,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.src = self.tmp / 'src'
+        files = {
+            'requirements.txt': "Django>=5.1\n",
+            'manage.py': "",
+            'app/settings.py': "DEBUG = False\n",
+            'app/static/app.css': "body { color: red; }\n",
+            'app/migrations/0001_initial.py': "# initial\n",
+        }
+        for name, content in files.items():
+            (self.src / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.src / name).write_text(content)
+        self.git('init', '--quiet', str(self.src), cwd=self.tmp)
+        self.git('add', '-A')
+        self.git('commit', '--quiet', '-m', 'initial')
+
+    def checkout(self, name):
+        path = self.tmp / name
+        self.git('worktree', 'add', '--quiet', '--detach', str(path))
+        return path
+
+    def compute(self, path):
+        return DeployFingerprint.compute(path, '/usr/bin/python3', 'gunicorn')
+
+    def test_fresh_checkouts_of_one_commit_match(self):
+        first = self.checkout('release1')
+        second = self.checkout('release2')
+        # Fresh checkouts never share mtimes
+        past = 1_000_000_000
+        for root, _, files in os.walk(first):
+            for name in files:
+                os.utime(os.path.join(root, name), (past, past))
+        self.assertEqual(set(self.compute(first)), {'dependencies', 'migrations', 'static'})
+        self.assertEqual(self.compute(first), self.compute(second))
+
+    def test_each_input_changes_only_its_step(self):
+        before = self.compute(self.src)
+        (self.src / 'app' / 'static' / 'app.css').write_text("body { color: blue; }\n")
+        after_static = self.compute(self.src)
+        self.assertNotEqual(before['static'], after_static['static'])
+        self.assertEqual(before['migrations'], after_static['migrations'])
+        self.assertEqual(before['dependencies'], after_static['dependencies'])
+
+        (self.src / 'app' / 'migrations' / '0002_more.py').write_text("# more\n")
+        after_migration = self.compute(self.src)
+        self.assertNotEqual(after_static['migrations'], after_migration['migrations'])
+        self.assertEqual(after_static['static'], after_migration['static'])
+
+    def test_dependencies_cover_requirements_and_server_packages(self):
+        before = self.compute(self.src)
+        self.assertNotEqual(
+            before['dependencies'],
+            DeployFingerprint.compute(self.src, '/usr/bin/python3', 'gunicorn uvicorn')['dependencies'],
+        )
+        (self.src / 'requirements.txt').write_text("Django>=5.2\n")
+        after = self.compute(self.src)
+        self.assertNotEqual(before['dependencies'], after['dependencies'])
+        # Installed packages ship static files and migrations too
+        self.assertNotEqual(before['static'], after['static'])
+        self.assertNotEqual(before['migrations'], after['migrations'])
+
+    def test_outside_git_uses_file_contents(self):
+        plain = self.tmp / 'plain'
+        shutil.copytree(self.src, plain, ignore=shutil.ignore_patterns('.git'))
+        self.assertEqual(DeployFingerprint.git_blobs(plain), {})
+        before = self.compute(plain)
+        os.utime(plain / 'app' / 'static' / 'app.css', (1_000_000_000, 1_000_000_000))
+        self.assertEqual(before, self.compute(plain))
+
+    def test_without_requirements(self):
+        (self.src / 'requirements.txt').unlink()
+        self.assertEqual(self.compute(self.src), {})
+
+
+class FleetServiceTests(PanelTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.projects = self.create_projects(6, prefix='site', port=9000)
+
+    def start(self, **kwargs):
+        options = {'canaries': 1, 'parallelism': 2, 'max_failure_rate': 0.2, **kwargs}
+        return FleetService.start(self.projects, 'all', **options)
+
+    def finish(self, rollout, *statuses):
+        """Finishes the rollout's queued deployments in order with `statuses`, then advances it."""
+        queued = rollout.targets.filter(deployment__status='pending').order_by('position')
+        for target, status in zip(list(queued), statuses):
+            Deployment.objects.filter(id=target.deployment_id).update(status=status)
+        FleetService.advance(rollout.id)
+        rollout.refresh_from_db()
+        return FleetService.progress(rollout)['counts']
+
+    def test_canary_goes_first(self):
+        rollout = self.start()
+        counts = FleetService.progress(rollout)['counts']
+        self.assertEqual(counts['pending'], 1)
+        self.assertEqual(counts['waiting'], 5)
+        self.assertTrue(rollout.targets.get(deployment__isnull=False).canary)
+
+        counts = self.finish(rollout, 'success')
+        self.assertEqual((counts['success'], counts['pending'], counts['waiting']), (1, 2, 3))
+
+    def test_failed_canary_halts(self):
+        rollout = self.start()
+        counts = self.finish(rollout, 'failed')
+        self.assertEqual(rollout.status, 'halted')
+        self.assertIn("Canary site0 failed", rollout.reason)
+        self.assertEqual(counts['skipped'], 5)
+
+    def test_failure_rate_halts_and_skips_the_rest(self):
+        rollout = self.start()
+        self.finish(rollout, 'success')
+        counts = self.finish(rollout, 'success', 'failed')
+        # 1 of 3 finished deploys failed: above the 20% limit
+        self.assertEqual(rollout.status, 'halted')
+        self.assertIn("1 of 3", rollout.reason)
+        self.assertEqual((counts['success'], counts['failed'], counts['skipped']), (2, 1, 3))
+        self.assertFalse(Deployment.objects.filter(status='pending').exists())
+
+    def test_failures_within_the_limit_complete(self):
+        rollout = self.start(max_failure_rate=0.5)
+        self.finish(rollout, 'success')
+        self.finish(rollout, 'success', 'failed')
+        self.finish(rollout, 'success', 'success')
+        counts = self.finish(rollout, 'success')
+        self.assertEqual(rollout.status, 'completed')
+        self.assertEqual((counts['success'], counts['failed']), (5, 1))
+        self.assertEqual(rollout.reason, "1 of 6 deploys failed.")
+
+    def test_parallelism_bounds_queued_targets(self):
+        rollout = self.start(canaries=0, parallelism=3)
+        self.assertEqual(FleetService.progress(rollout)['counts']['pending'], 3)
+
+    def test_cancel(self):
+        rollout = self.start()
+        FleetService.cancel(rollout)
+        rollout.refresh_from_db()
+        self.assertEqual(rollout.status, 'cancelled')
+        self.assertEqual(FleetRollout.objects.get(id=rollout.id).targets.filter(skipped=True).count(), 5)
+
+
+class WheelCacheTests(PanelTestMixin, SimpleTestCase):
+    REPORT = {'install': [
+        {'metadata': {'name': 'Django', 'version': '5.2'}, 'download_info': {'url': 'https://files.example/Django-5.2-py3-none-any.whl'}},
+        {'metadata': {'name': 'asgiref', 'version': '3.8'}, 'download_info': {'url': 'file:///wheelhouse/asgiref-3.8-py3-none-any.whl'}},
+        {'metadata': {'name': 'legacy', 'version': '1.0'}, 'download_info': {'url': 'https://files.example/legacy-1.0.tar.gz'}},
+    ]}
+
+    def run_install(self, outcomes):
+        """Runs WheelCache.install with pip stubbed: `outcomes` maps a pip subcommand pattern to success."""
+        commands = []
+
+        def run_step(command, cwd=None, env=None):
+            commands.append(command)
+            report = re.search(r'--report "([^"]+)"', command)
+            ok = next(result for pattern, result in outcomes if re.search(pattern, command))
+            if report and ok:
+                Path(report.group(1)).write_text(json.dumps(self.REPORT))
+            return {'success': ok, 'stdout': '', 'stderr': '', 'returncode': 0 if ok else 1}
+
+        res = WheelCache.install('/venv/bin/pip', '-r requirements.txt', run_step, lambda msg: None)
+        return res, commands
+
+    def test_offline_install(self):
+        res, commands = self.run_install([(r'install --no-index', True)])
+        self.assertTrue(res['success'])
+        self.assertEqual(len(commands), 1)
+
+    def test_fallback_install_feeds_the_wheelhouse(self):
+        res, commands = self.run_install([
+            (r'install --no-index', False), (r' wheel ', False), (r' install ', True),
+        ])
+        self.assertTrue(res['success'])
+        self.assertIn('wheel', commands[-1])
+        self.assertIn('--no-deps "Django==5.2" "legacy==1.0"', commands[-1])
+
+    @skipUnless(os.path.isdir('/proc/self/fd'), "needs /proc")
+    def test_report_files_do_not_leak_descriptors(self):
+        before = len(os.listdir('/proc/self/fd'))
+        for _ in range(5):
+            self.run_install([(r'install --no-index', True)])
+        self.assertEqual(len(os.listdir('/proc/self/fd')), before)
+        self.assertEqual(list(WheelCache.root().glob('pip-report-*')), [])
+
+
+class TerminalHostTests(PanelTestMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(TerminalManager, '_host_lock', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.lock_path = self.tmp / 'cache' / 'terminal.lock'
+        self.lock_path.parent.mkdir(parents=True)
+
+    def test_only_one_process_hosts_terminals(self):
+        with open(self.lock_path, 'a') as other:
+            # Another process (another open file description) holds the lock
+            fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.assertFalse(TerminalManager.is_host())
+            session, error = TerminalManager.open(mock.Mock(id=1), 'someone')
+            self.assertIsNone(session)
+            self.assertEqual(error, TerminalManager.NOT_HOST)
+
+    def test_first_process_keeps_the_lock(self):
+        self.assertTrue(TerminalManager.is_host())
+        self.addCleanup(TerminalManager._host_lock.close)
+        self.assertTrue(TerminalManager.is_host())
+        self.assertEqual(self.lock_path.read_text(), f"{os.getpid()}\n")
+        with open(self.lock_path, 'a') as other, self.assertRaises(OSError):
+            fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+class MetricsStoreTests(PanelTestMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(MetricsStore.forget, 1)
+
+    def test_missing_cpu_is_not_averaged_as_zero(self):
+        start = 1_800_000_000
+        MetricsStore.record(1, start, {'rss_mb': 100, 'tasks': 4, 'restarts': 0})
+        MetricsStore.record(1, start + 1, {'cpu': 50, 'rss_mb': 110, 'tasks': 4, 'restarts': 0})
+        MetricsStore.record(1, start + 2, {'cpu': 30, 'rss_mb': 120, 'tasks': 4, 'restarts': 0})
+
+        seconds = MetricsStore.series(1, '1s', now=start + 2)
+        self.assertEqual(seconds['cpu'], [None, 50, 30])
+        self.assertEqual(seconds['rss_mb'], [100, 110, 120])
+
+        minutes = MetricsStore.series(1, '1m', now=start + 2)
+        self.assertEqual(len(minutes['t']), 1)
+        self.assertEqual(minutes['rss_mb'], [110])
+        self.assertEqual(minutes['cpu'], [40])
+
+    def test_bucket_without_cpu_reports_none(self):
+        MetricsStore.record(1, 1_800_000_000, {'rss_mb': 10, 'restarts': 2})
+        series = MetricsStore.series(1, '1h', now=1_800_000_000)
+        self.assertEqual((series['cpu'], series['rss_mb'], series['restarts']), ([None], [10], [2]))
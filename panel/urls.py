@@ -6,10 +6,25 @@ urlpatterns = [
     path('create/', views.create_project, name='create_project'),
     path('project/<int:project_id>/', views.project_detail, name='project_detail'),
     path('project/<int:project_id>/deploy/', views.deploy_project, name='deploy_project'),
+    path('project/<int:project_id>/rollback/<str:release>/', views.rollback_project, name='rollback_project'),
     path('project/<int:project_id>/delete/', views.delete_project, name='delete_project'),
     path('project/<int:project_id>/files/', views.project_files, name='project_files'),
+    path('project/<int:project_id>/files/list/', views.project_files_list, name='project_files_list'),
+    path('project/<int:project_id>/search/', views.project_search, name='project_search'),
     path('project/<int:project_id>/edit/', views.project_file_edit, name='project_file_edit'),
+    path('project/<int:project_id>/file/range/', views.project_file_range, name='project_file_range'),
     path('project/<int:project_id>/terminal/', views.project_terminal, name='project_terminal'),
+    path('project/<int:project_id>/metrics/', views.project_metrics, name='project_metrics'),
+    path('project/<int:project_id>/traffic/', views.project_traffic, name='project_traffic'),
+    path('project/<int:project_id>/deployments/', views.project_deployments, name='project_deployments'),
+    path('project/<int:project_id>/profile/', views.project_profile, name='project_profile'),
+    path('deployment/<int:deployment_id>/profile/', views.deployment_profile, name='deployment_profile'),
+    path('deployment/<int:deployment_id>/logs/', views.deployment_logs, name='deployment_logs'),
+    path('deployment/<int:deployment_id>/stream/', views.deployment_stream, name='deployment_stream'),
+    path('fleet/', views.fleet, name='fleet'),
+    path('fleet/<int:rollout_id>/', views.fleet_rollout, name='fleet_rollout'),
+    path('fleet/<int:rollout_id>/status/', views.fleet_rollout_status, name='fleet_rollout_status'),
+    path('fleet/<int:rollout_id>/cancel/', views.fleet_rollout_cancel, name='fleet_rollout_cancel'),
     path('update/', views.update_panel, name='update_panel'),
     path('stop-server/', views.stop_server, name='stop_server'),
 ]
@@ -1,9 +1,18 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib import messages
-from .models import Project, Deployment
-from .forms import ProjectForm
-from .services import DeployService
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse, JsonResponse
+from .models import Project, Deployment, DeploymentLogChunk, FleetRollout
+from .forms import FleetDeployForm, ProjectForm
+from .services import DashboardService, DeployProfiler, DeployService, DeploymentQueue, FleetService, GunicornTuning, MetricsStore, ReleaseService, SearchIndex, TrafficMonitor
+from django.utils.html import escape
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
+import asyncio
+from datetime import datetime, timezone as dt_timezone
+import json
 import threading
+import time
 import os
 import sys
 
@@ -24,20 +33,19 @@ def stop_server(request):
 
 
 def dashboard(request):
-    projects = Project.objects.all().order_by('-created_at')
-    return render(request, 'panel/dashboard.html', {'projects': projects})
+    page = DashboardService.page(request.GET.get('page', 1))
+    return render(request, 'panel/dashboard.html', {'projects': page['projects'], 'page': page})
 
 def create_project(request):
     if request.method == 'POST':
         form = ProjectForm(request.POST)
         if form.is_valid():
             project = form.save()
-            messages.success(request, f"Project '{project.name}' created! Deployment started...")
+            DashboardService.invalidate()
+            messages.success(request, f"Project '{project.name}' created! Deployment queued...")
             
-            # Start initial deployment
-            deployment = Deployment.objects.create(project=project, status='pending')
-            thread = threading.Thread(target=DeployService.deploy, args=(project, deployment))
-            thread.start()
+            # Queue initial deployment
+            DeploymentQueue.enqueue(project)
             
             return redirect('project_detail', project_id=project.id)
     else:
@@ -46,19 +54,224 @@ def create_project(request):
 
 def project_detail(request, project_id):
     project = get_object_or_404(Project, id=project_id)
-    deployments = project.deployments.all().order_by('-created_at')[:5]
-    return render(request, 'panel/project_detail.html', {'project': project, 'deployments': deployments})
+    # Logs are not loaded here; the page fetches them when a deployment is expanded
+    deployments = project.deployments.defer('legacy_logs', 'archived_logs', 'fingerprints').order_by('-created_at')[:5]
+
+    # Releases on disk, annotated with the commit that produced them
+    current = ReleaseService.current_release(project)
+    commits = dict(project.deployments.exclude(release='').filter(rollback_to='').values_list('release', 'commit'))
+    releases = [
+        {'name': name, 'commit': commits.get(name, ''), 'is_current': name == current}
+        for name in ReleaseService.list_releases(project)
+    ]
+    return render(request, 'panel/project_detail.html', {
+        'project': project,
+        'deployments': deployments,
+        'deployment_count': project.deployments.count(),
+        'releases': releases,
+        'gunicorn': GunicornTuning.resolve(project),
+        'metric_fields': [('cpu', 'CPU', '%'), ('rss_mb', 'Memory', 'MB'), ('tasks', 'Tasks', ''), ('restarts', 'Restarts', '')],
+        'traffic_windows': [('1m', 'Last minute'), ('5m', 'Last 5 minutes'), ('1h', 'Last hour')],
+    })
+
+def project_deployments(request, project_id):
+    """Full deployment history, paginated."""
+    from django.core.paginator import Paginator
+
+    project = get_object_or_404(Project, id=project_id)
+    history = project.deployments.defer('legacy_logs', 'archived_logs', 'fingerprints').order_by('-created_at')
+    page = Paginator(history, 25).get_page(request.GET.get('page'))
+    return render(request, 'panel/deployment_history.html', {
+        'project': project,
+        'deployments': page.object_list,
+        'page': page,
+    })
+
+def project_metrics(request, project_id):
+    """CPU / memory / task / restart series of the project's Gunicorn unit as JSON."""
+    project = get_object_or_404(Project, id=project_id)
+    try:
+        series = MetricsStore.series(project.id, request.GET.get('resolution', '1s'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(series)
+
+def project_traffic(request, project_id):
+    """Request rate, status codes and latency percentiles from the project's access log."""
+    project = get_object_or_404(Project, id=project_id)
+    return JsonResponse(TrafficMonitor.snapshot(project.id) or {'updated': None})
+
+def deployment_profile(request, deployment_id):
+    """Waterfall of one deployment's step timings."""
+    deployment = get_object_or_404(
+        Deployment.objects.select_related('project').defer('legacy_logs', 'archived_logs', 'fingerprints'),
+        id=deployment_id,
+    )
+    rows, total = DeployProfiler.waterfall(deployment)
+    return render(request, 'panel/deployment_profile.html', {
+        'project': deployment.project,
+        'deployment': deployment,
+        'rows': rows,
+        'total': total,
+    })
+
+def project_profile(request, project_id):
+    """Step durations across the project's recent deployments."""
+    project = get_object_or_404(Project, id=project_id)
+    deployments, rows = DeployProfiler.trends(project)
+    return render(request, 'panel/project_profile.html', {
+        'project': project,
+        'deployments': deployments,
+        'rows': rows,
+    })
+
+def deployment_logs(request, deployment_id):
+    """Plain-text log of one deployment (archived logs are decompressed)."""
+    deployment = get_object_or_404(Deployment.objects.prefetch_related('log_chunks'), id=deployment_id)
+    return HttpResponse(deployment.logs, content_type='text/plain; charset=utf-8')
+
+def _sse_event(event, data, event_id=None):
+    """Formats one Server-Sent Events message."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.extend(f"data: {line}" for line in str(data).split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+async def deployment_stream(request, deployment_id):
+    """
+    Streams new log chunks and status changes of a deployment as SSE.
+
+    The event id is the chunk sequence, so a reconnecting EventSource
+    (Last-Event-ID) or a `?since=<sequence>` poll only receives newer chunks.
+    Runs as an async view so an ASGI worker can serve many watchers at once.
+    """
+    deployment = await aget_object_or_404(Deployment, id=deployment_id)
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        since = int(since)
+    except (TypeError, ValueError):
+        since = -1
+
+    poll_interval = settings.PANEL_LOG_STREAM_POLL_MS / 1000
+    keepalive_interval = 15
+
+    async def events():
+        cursor = since
+        last_status = None
+        last_sent = time.monotonic()
+        if cursor < 0 and deployment.legacy_logs:
+            yield _sse_event('log', deployment.legacy_logs)
+
+        while True:
+            # Read the status before the chunks: the deployer flushes its last
+            # chunk before saving a final status, so nothing can be missed.
+            status = await Deployment.objects.filter(id=deployment_id).values_list('status', flat=True).afirst()
+            chunks = DeploymentLogChunk.objects.filter(
+                deployment_id=deployment_id, sequence__gt=cursor
+            ).order_by('sequence').values_list('sequence', 'content')
+            async for sequence, content in chunks:
+                cursor = sequence
+                last_sent = time.monotonic()
+                yield _sse_event('log', content, event_id=sequence)
+
+            if status != last_status and status is not None:
+                last_status = status
+                last_sent = time.monotonic()
+                yield _sse_event('status', json.dumps({
+                    'status': status,
+                    'label': dict(Deployment.STATUS_CHOICES).get(status, status),
+                }))
+
+            if status is None or status in ('success', 'failed'):
+                yield _sse_event('end', status or 'deleted')
+                return
+
+            if time.monotonic() - last_sent >= keepalive_interval:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+            await asyncio.sleep(poll_interval)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Stop nginx from buffering the stream
+    return response
 
 def deploy_project(request, project_id):
     project = get_object_or_404(Project, id=project_id)
-    deployment = Deployment.objects.create(project=project, status='pending')
+    force_full = request.GET.get('full') == '1'
+    deployment, created = DeploymentQueue.enqueue(project, force_full=force_full)
     
-    thread = threading.Thread(target=DeployService.deploy, args=(project, deployment))
-    thread.start()
+    if created:
+        messages.success(request, f"Manual {'full ' if force_full else ''}deployment queued for {project.name}.")
+    else:
+        messages.info(request, f"A deployment for {project.name} is already queued.")
+    return redirect('project_detail', project_id=project.id)
+
+def rollback_project(request, project_id, release):
+    project = get_object_or_404(Project, id=project_id)
     
-    messages.success(request, f"Manual deployment triggered for {project.name}.")
+    if request.method == 'POST':
+        if release in ReleaseService.list_releases(project):
+            DeploymentQueue.enqueue_rollback(project, release)
+            messages.success(request, f"Rollback to release {release} queued for {project.name}.")
+        else:
+            messages.error(request, f"Release {release} no longer exists.")
+            
     return redirect('project_detail', project_id=project.id)
 
+def fleet(request):
+    """Bulk deploys: start a rollout over many projects, list recent ones."""
+    from django.db.models import Count
+
+    if request.method == 'POST':
+        form = FleetDeployForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            projects, selection, error = FleetService.select(
+                all_projects=data['all_projects'], tag=data['tag'].strip(), match=data['match'].strip(),
+                names=[p.name for p in data['projects']],
+            )
+            if error:
+                form.add_error(None, error)
+            else:
+                rollout = FleetService.start(
+                    projects, selection, canaries=data['canaries'], parallelism=data['parallelism'],
+                    max_failure_rate=data['max_failure_rate'] / 100, full=data['full'],
+                )
+                messages.success(request, f"Rollout started for {len(projects)} project(s).")
+                return redirect('fleet_rollout', rollout_id=rollout.id)
+    else:
+        form = FleetDeployForm(initial={
+            'canaries': FleetService.canaries(),
+            'parallelism': FleetService.parallelism(),
+            'max_failure_rate': round(FleetService.max_failure_rate() * 100),
+        })
+
+    tags = sorted({tag for value in Project.objects.exclude(tags='').values_list('tags', flat=True)
+                   for tag in value.replace(',', ' ').split()})
+    rollouts = FleetRollout.objects.annotate(target_count=Count('targets')).order_by('-created_at')[:20]
+    return render(request, 'panel/fleet.html', {'form': form, 'tags': tags, 'rollouts': rollouts})
+
+def fleet_rollout(request, rollout_id):
+    """Aggregated progress of one rollout."""
+    rollout = get_object_or_404(FleetRollout, id=rollout_id)
+    return render(request, 'panel/fleet_rollout.html', {
+        'rollout': rollout,
+        'progress': FleetService.progress(rollout),
+    })
+
+def fleet_rollout_status(request, rollout_id):
+    rollout = get_object_or_404(FleetRollout, id=rollout_id)
+    return JsonResponse(FleetService.progress(rollout))
+
+def fleet_rollout_cancel(request, rollout_id):
+    rollout = get_object_or_404(FleetRollout, id=rollout_id)
+    if request.method == 'POST':
+        FleetService.cancel(rollout)
+        messages.success(request, "Rollout cancelled; deployments already running will finish.")
+    return redirect('fleet_rollout', rollout_id=rollout.id)
+
 def delete_project(request, project_id):
     project = get_object_or_404(Project, id=project_id)
     
@@ -66,6 +279,7 @@ def delete_project(request, project_id):
         success, msg = DeployService.remove_project(project)
         if success:
             project.delete()
+            DashboardService.invalidate()
             messages.success(request, f"Project '{project.name}' deleted successfully.")
             return redirect('dashboard')
         else:
@@ -73,21 +287,33 @@ def delete_project(request, project_id):
             
     return redirect('project_detail', project_id=project.id)
 
+def _file_listing(project, request):
+    """Runs FileService.list_files with the paging/sort options of the request."""
+    from .services import FileService
+
+    try:
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        offset = 0
+    return FileService.list_files(
+        project,
+        request.GET.get('path', ''),
+        sort=request.GET.get('sort', 'name'),
+        desc=request.GET.get('order') == 'desc',
+        offset=offset,
+    )
+
 def project_files(request, project_id):
     project = get_object_or_404(Project, id=project_id)
     subpath = request.GET.get('path', '')
     
-    # Imports inside view to avoid circular dep if any, though here it's fine
-    from .services import FileService
-    
+    page = None
     try:
-        files, error = FileService.list_files(project, subpath)
+        page, error = _file_listing(project, request)
         if error:
             messages.error(request, error)
-            files = []
     except ValueError:
         messages.error(request, "Invalid path.")
-        files = []
         
     # Breadcrumbs
     breadcrumbs = []
@@ -101,16 +327,62 @@ def project_files(request, project_id):
 
     return render(request, 'panel/file_browser.html', {
         'project': project,
-        'files': files,
+        'files': page['items'] if page else [],
+        'total': page['total'] if page else 0,
+        'next_offset': page['next_offset'] if page else None,
+        'sort': request.GET.get('sort', 'name'),
+        'order': request.GET.get('order', 'asc'),
+        'sort_options': [('name', 'Name'), ('size', 'Size'), ('mtime', 'Modified')],
         'current_path': subpath,
         'breadcrumbs': breadcrumbs
     })
 
-    return render(request, 'panel/file_browser.html', {
+def project_files_list(request, project_id):
+    """JSON page of a directory listing, used by the file browser to load more entries."""
+    project = get_object_or_404(Project, id=project_id)
+    try:
+        page, error = _file_listing(project, request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid path.'}, status=400)
+    if error:
+        return JsonResponse({'error': error}, status=404)
+    return JsonResponse(page)
+
+def project_search(request, project_id):
+    """Filename and content search over the project's indexed tree."""
+    project = get_object_or_404(Project, id=project_id)
+    query = request.GET.get('q', '')
+
+    if request.method == 'POST':
+        SearchIndex.update_async(project)
+        messages.success(request, "Search index refresh started.")
+        return redirect(f"{request.path}?{urlencode({'q': query})}")
+
+    stats = SearchIndex.stats(project)
+    if stats is None:
+        # First visit: build the index in the background
+        SearchIndex.update_async(project)
+    elif stats['updated_at']:
+        stats['updated_at'] = datetime.fromtimestamp(stats['updated_at'], tz=dt_timezone.utc)
+
+    started = time.monotonic()
+    result = SearchIndex.search(project, query)
+    elapsed_ms = (time.monotonic() - started) * 1000
+
+    # Snippets mark hits with \x02 / \x03; escape everything else
+    matches = [
+        (path, mark_safe(escape(snippet).replace('\x02', '<mark>').replace('\x03', '</mark>')))
+        for path, snippet in result['matches']
+    ]
+
+    return render(request, 'panel/search.html', {
         'project': project,
-        'files': files,
-        'current_path': subpath,
-        'breadcrumbs': breadcrumbs
+        'query': query,
+        'files': result['files'],
+        'matches': matches,
+        'stats': stats,
+        'elapsed_ms': elapsed_ms,
+        'min_query': SearchIndex.MIN_QUERY,
     })
 
 def update_panel(request):
@@ -129,8 +401,6 @@ def update_panel(request):
         
     return redirect('dashboard')
 
-from django.http import JsonResponse
-import json
 
 def project_terminal(request, project_id):
     project = get_object_or_404(Project, id=project_id)
@@ -155,10 +425,46 @@ def project_file_edit(request, project_id):
     subpath = request.GET.get('path', '')
     
     from .services import FileService
+
+    info, error = FileService.inspect(project, subpath)
+    if error:
+        messages.error(request, error)
+        return redirect('project_files', project_id=project.id)
+
+    if not info['editable']:
+        # Large or binary: read-only viewer fed by ranged requests
+        return render(request, 'panel/file_viewer.html', {
+            'project': project,
+            'path': subpath,
+            'info': info,
+            'editor_max_bytes': FileService.editor_max_bytes(),
+            'filename': subpath.split('/')[-1]
+        })
     
+    if request.method == 'POST' and request.content_type == 'application/json':
+        # Editor script: {base_version, patch} (or full content), answered with JSON
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid request.'}, status=400)
+        success, error, version = FileService.save_file(
+            project, subpath,
+            content=data.get('content'),
+            base_version=data.get('base_version'),
+            patch=data.get('patch'),
+        )
+        if success:
+            return JsonResponse({'version': version})
+        return JsonResponse(
+            {'error': error, 'conflict': error == FileService.CONFLICT},
+            status=409 if error == FileService.CONFLICT else 400,
+        )
+
     if request.method == 'POST':
         content = request.POST.get('content')
-        success, error = FileService.save_file(project, subpath, content)
+        success, error, _ = FileService.save_file(
+            project, subpath, content, base_version=request.POST.get('base_version')
+        )
         if success:
             messages.success(request, "File saved successfully.")
         else:
@@ -173,5 +479,23 @@ def project_file_edit(request, project_id):
         'project': project,
         'path': subpath,
         'content': content,
+        'version': FileService.version(content),
         'filename': subpath.split('/')[-1]
     })
+
+def project_file_range(request, project_id):
+    """JSON window of lines (?start=&count=) or, with ?follow=, what was appended since an offset."""
+    project = get_object_or_404(Project, id=project_id)
+    subpath = request.GET.get('path', '')
+
+    from .services import FileService
+
+    if 'follow' in request.GET:
+        data, error = FileService.tail(project, subpath, request.GET.get('follow') or None)
+    else:
+        data, error = FileService.read_lines(
+            project, subpath, request.GET.get('start', 0), request.GET.get('count', 500)
+        )
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    return JsonResponse(data)
@@ -0,0 +1,154 @@
+"""
+WebSocket endpoints, served next to Django by config/asgi.py.
+
+/ws/project/<id>/terminal/[?session=<id>] attaches to (or starts) a
+persistent PTY shell for the project. Messages are JSON text frames:
+
+  client -> server  {"type": "input", "data": "..."}
+                    {"type": "resize", "cols": 80, "rows": 24}
+                    {"type": "close"}
+  server -> client  {"type": "session", "id": "..."}
+                    {"type": "output", "data": "..."}
+                    {"type": "exit", "code": 0}
+                    {"type": "error", "message": "..."}
+"""
+import asyncio
+import codecs
+import json
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+TERMINAL_PATH = re.compile(r'^/ws/project/(?P<project_id>\d+)/terminal/$')
+
+
+def _headers(scope):
+    return {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope.get('headers', [])}
+
+
+def _same_origin(headers):
+    """Browsers always send Origin on WebSockets; refuse pages from other sites."""
+    origin = headers.get('origin')
+    return origin is None or urlsplit(origin).netloc == headers.get('host')
+
+
+@sync_to_async
+def _resolve(scope, headers, project_id):
+    """Returns (project or None, owner key used for the per-user session cap)."""
+    from django.contrib.auth import SESSION_KEY
+    from .models import Project
+
+    project = Project.objects.filter(id=project_id).first()
+    owner = None
+    cookie = SimpleCookie()
+    cookie.load(headers.get('cookie', ''))
+    if settings.SESSION_COOKIE_NAME in cookie:
+        store = import_module(settings.SESSION_ENGINE).SessionStore(cookie[settings.SESSION_COOKIE_NAME].value)
+        user_id = store.get(SESSION_KEY)
+        if user_id:
+            owner = f"user:{user_id}"
+    if owner is None:
+        client = scope.get('client')
+        owner = f"addr:{client[0]}" if client else "anonymous"
+    return project, owner
+
+
+async def _send_json(send, payload):
+    await send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+
+async def _reject(send, message, code):
+    # Accept first so the browser gets to see why
+    await send({'type': 'websocket.accept'})
+    await _send_json(send, {'type': 'error', 'message': message})
+    await send({'type': 'websocket.close', 'code': code})
+
+
+async def terminal(session, receive, send):
+    """Bridges one WebSocket to a TerminalSession until either side goes away."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def listener(data):
+        loop.call_soon_threadsafe(queue.put_nowait, data)
+
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    backlog = session.attach(listener)
+    await _send_json(send, {'type': 'session', 'id': session.id})
+    if backlog:
+        await _send_json(send, {'type': 'output', 'data': decoder.decode(backlog)})
+
+    async def forward_output():
+        exited = False
+        while not exited:
+            chunks = [await queue.get()]
+            # Batch whatever else is already waiting into one frame
+            while not queue.empty():
+                chunks.append(queue.get_nowait())
+            if None in chunks:
+                chunks = chunks[:chunks.index(None)]
+                exited = True
+            if chunks:
+                await _send_json(send, {'type': 'output', 'data': decoder.decode(b''.join(chunks))})
+        await _send_json(send, {'type': 'exit', 'code': session.exit_code})
+        await send({'type': 'websocket.close', 'code': 1000})
+
+    output = asyncio.create_task(forward_output())
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            try:
+                payload = json.loads(message.get('text') or '{}')
+            except ValueError:
+                continue
+            kind = payload.get('type')
+            if kind == 'input':
+                # A full PTY input buffer would block, keep it off the event loop
+                await asyncio.to_thread(session.write, str(payload.get('data', '')))
+            elif kind == 'resize':
+                try:
+                    session.resize(int(payload['cols']), int(payload['rows']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            elif kind == 'close':
+                session.terminate()
+    finally:
+        session.detach(listener)
+        output.cancel()
+
+
+async def websocket_application(scope, receive, send):
+    from .services import TerminalManager
+
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    headers = _headers(scope)
+    match = TERMINAL_PATH.match(scope['path'])
+    if not match:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    if not _same_origin(headers):
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    project, owner = await _resolve(scope, headers, int(match['project_id']))
+    if project is None:
+        await _reject(send, "Project not found.", 4404)
+        return
+
+    session_id = parse_qs(scope.get('query_string', b'').decode()).get('session', [None])[0]
+    session, error = await sync_to_async(TerminalManager.open)(project, owner, session_id)
+    if error:
+        await _reject(send, error, 4429)
+        return
+
+    await send({'type': 'websocket.accept'})
+    await terminal(session, receive, send)